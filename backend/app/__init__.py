@@ -9,6 +9,7 @@ from .routes.contacts import contacts as contacts_bp
 from .config.config import Config
 from .config.logging import setup_logging
 from .config.security import configure_security
+from .services.resilience import set_request_deadline
 import os
 import logging
 
@@ -44,6 +45,15 @@ def create_app():
     app.register_blueprint(calendar_bp)
     app.register_blueprint(contacts_bp)
     
+    # Every Baikal call made for one API request, retries and fan-out included, shares one time budget
+    @app.before_request
+    def start_upstream_deadline():
+        set_request_deadline(Config.UPSTREAM_REQUEST_DEADLINE)
+    
+    @app.teardown_request
+    def end_upstream_deadline(error=None):
+        set_request_deadline(None)
+    
     # Serve frontend
     @app.route('/', defaults={'path': ''})
     @app.route('/<path:path>')
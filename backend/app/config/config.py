@@ -11,6 +11,81 @@ class Config:
     DEFAULT_MODE = os.getenv('DEFAULT_MODE', 'light')
     ENCRYPTION_KEY_PATH = os.getenv('ENCRYPTION_KEY_PATH', '/data/encryption.key')
 
+    # Verified Baikal clients kept per worker (idle timeout in seconds)
+    CLIENT_CACHE_SIZE = int(os.getenv('CLIENT_CACHE_SIZE', '64'))
+    CLIENT_IDLE_TTL = int(os.getenv('CLIENT_IDLE_TTL', '900'))
+
+    # Cached connection test results (seconds); failures are kept for a shorter time
+    VERIFY_CACHE_TTL = int(os.getenv('VERIFY_CACHE_TTL', '300'))
+    VERIFY_CACHE_FAILURE_TTL = int(os.getenv('VERIFY_CACHE_FAILURE_TTL', '30'))
+
+    # Local copies of calendars / address books kept per worker (idle timeout in seconds)
+    STORE_MAX_COLLECTIONS = int(os.getenv('STORE_MAX_COLLECTIONS', '32'))
+    STORE_IDLE_TTL = int(os.getenv('STORE_IDLE_TTL', '3600'))
+
+    # Parsed events shared by all requests of a worker (entries and approximate bytes)
+    EVENT_CACHE_SIZE = int(os.getenv('EVENT_CACHE_SIZE', '20000'))
+    EVENT_CACHE_MAX_BYTES = int(os.getenv('EVENT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+
+    # Expanded recurring event instances per (event, date range)
+    OCCURRENCE_CACHE_SIZE = int(os.getenv('OCCURRENCE_CACHE_SIZE', '2048'))
+    OCCURRENCE_CACHE_TTL = int(os.getenv('OCCURRENCE_CACHE_TTL', '3600'))
+
+    # Event ranges served or prefetched per user and calendar, reused for any range inside them
+    WINDOW_CACHE_TTL = int(os.getenv('WINDOW_CACHE_TTL', '60'))
+    WINDOW_CACHE_WINDOWS = int(os.getenv('WINDOW_CACHE_WINDOWS', '6'))
+    WINDOW_CACHE_SIZE = int(os.getenv('WINDOW_CACHE_SIZE', '256'))
+
+    # Background prefetch of the previous/next range (running tasks per user and per worker)
+    PREFETCH_PER_USER = int(os.getenv('PREFETCH_PER_USER', '2'))
+    PREFETCH_MAX_CONCURRENT = int(os.getenv('PREFETCH_MAX_CONCURRENT', '4'))
+
+    # Bulk event changes: operations accepted per request and parallel upstream writes
+    BATCH_MAX_OPERATIONS = int(os.getenv('BATCH_MAX_OPERATIONS', '500'))
+    BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', '4'))
+
+    # Calendar and contact imports: parallel uploads per import
+    IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '4'))
+
+    # Objects downloaded per calendar-multiget / addressbook-multiget REPORT (syncs, exports)
+    MULTIGET_BATCH_SIZE = int(os.getenv('MULTIGET_BATCH_SIZE', '100'))
+
+    # Background jobs (imports): jobs running at once per worker, seconds a finished job
+    # can still be queried, and errors kept per job
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+    JOB_TTL = int(os.getenv('JOB_TTL', '86400'))
+    JOB_MAX_ERRORS = int(os.getenv('JOB_MAX_ERRORS', '50'))
+    JOB_SAVE_INTERVAL = float(os.getenv('JOB_SAVE_INTERVAL', '1'))
+
+    # Calendar discovery (seconds a calendar list is trusted when the server has no home CTag)
+    # and parallel queries across calendars (threads per worker, seconds to wait for a calendar)
+    CALENDAR_LIST_TTL = int(os.getenv('CALENDAR_LIST_TTL', '300'))
+    FANOUT_WORKERS = int(os.getenv('FANOUT_WORKERS', '8'))
+    FANOUT_TIMEOUT = float(os.getenv('FANOUT_TIMEOUT', '20'))
+
+    # Merged free/busy answers per user and time window
+    FREEBUSY_CACHE_SIZE = int(os.getenv('FREEBUSY_CACHE_SIZE', '1024'))
+    FREEBUSY_CACHE_TTL = int(os.getenv('FREEBUSY_CACHE_TTL', '60'))
+
+    # Contacts API paging: contacts per page when no limit is given, and the largest limit accepted
+    CONTACTS_PAGE_SIZE = int(os.getenv('CONTACTS_PAGE_SIZE', '100'))
+    CONTACTS_MAX_PAGE_SIZE = int(os.getenv('CONTACTS_MAX_PAGE_SIZE', '1000'))
+
+    # Keep-alive connection pool towards Baikal (per worker, per upstream host)
+    HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', '8'))
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'false').lower() in ('1', 'true', 'yes')
+
+    # Upstream timeouts, retries and circuit breaker (seconds)
+    UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '5'))
+    UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '30'))
+    UPSTREAM_DEADLINE = float(os.getenv('UPSTREAM_DEADLINE', '45'))
+    UPSTREAM_REQUEST_DEADLINE = float(os.getenv('UPSTREAM_REQUEST_DEADLINE', '60'))
+    UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '2'))
+    UPSTREAM_BACKOFF = float(os.getenv('UPSTREAM_BACKOFF', '0.5'))
+    BREAKER_FAILURES = int(os.getenv('BREAKER_FAILURES', '5'))
+    BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', '30'))
+
     @classmethod
     def get_path(cls, *paths):
         """Get a path within the data directory"""
@@ -1,7 +1,10 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 from ..utils.auth import login_required
 from ..utils.settings import get_user_data, log_error
 from ..services.calendar import CalendarService
+from ..services.baikal_client import PreconditionFailedError
+from ..services.jobs import get_job_registry
+from ..utils.http_cache import etag_matches, not_modified, with_etag
 import logging
 
 # Configure logging
@@ -33,7 +36,7 @@ def get_calendars():
             
         calendars = calendar_service.get_calendars(user_data)
         logger.debug(f"Calendars retrieved for user {session.get('user_id')}: {calendars}")
-        return jsonify(calendars)
+        return jsonify({'calendars': calendars})
     except Exception as e:
         logger.error(f"Failed to get calendars for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -50,19 +53,53 @@ def get_events():
     try:
         start = request.args.get('start')
         end = request.args.get('end')
-        calendar_id = request.args.get('calendarId')
+        # calendarId may be repeated; without it every calendar is queried
+        calendar_ids = request.args.getlist('calendarId') or None
         
         if not start or not end:
             logger.warning(f"Missing date range parameters for user {session.get('user_id')}")
             raise ValueError('Missing date range parameters')
             
-        events = calendar_service.get_events(user_data, start, end, calendar_id)
-        logger.debug(f"Events retrieved for user {session.get('user_id')}: {events}")
-        return jsonify(events)
+        # Unchanged calendars are answered from their CTags, without listing or serialising events
+        etag = calendar_service.events_etag(user_data, start, end, calendar_ids)
+        if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+            logger.debug(f"Events not modified for user {session.get('user_id')}")
+            return not_modified(etag)
+            
+        result = calendar_service.get_events(user_data, start, end, calendar_ids)
+        logger.debug(f"Events retrieved for user {session.get('user_id')}: {len(result['events'])} events, "
+                     f"{len(result['errors'])} calendar errors")
+        # A partial answer must not be revalidated into a complete one
+        return with_etag(jsonify(result), None if result['errors'] else etag)
     except Exception as e:
         logger.error(f"Failed to get events for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/freebusy', methods=['GET'])
+@login_required
+def get_freebusy():
+    """Busy intervals for a date range, without event details"""
+    logger.debug(f"Free/busy request received for user {session.get('user_id')}")
+    if not (user_data := get_user_data()):
+        logger.warning(f"No user data found for user {session.get('user_id')}")
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        start = request.args.get('start')
+        end = request.args.get('end')
+        calendar_ids = request.args.getlist('calendarId') or None
+        
+        if not start or not end:
+            logger.warning(f"Missing date range parameters for user {session.get('user_id')}")
+            return jsonify({'error': 'Missing date range parameters'}), 400
+            
+        result = calendar_service.get_freebusy(user_data, start, end, calendar_ids)
+        logger.debug(f"Free/busy for user {session.get('user_id')}: {len(result['busy'])} busy intervals")
+        return jsonify(result)
+    except Exception as e:
+        logger.error(f"Failed to get free/busy for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/events', methods=['POST'])
 @login_required
 def create_event():
@@ -87,6 +124,39 @@ def create_event():
         logger.error(f"Failed to create event for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@bp.route('/events/batch', methods=['POST'])
+@login_required
+def batch_events():
+    """Create, update and delete several events in one request"""
+    logger.debug(f"Batch events request received for user {session.get('user_id')}")
+    if not (user_data := get_user_data()):
+        logger.warning(f"No user data found for user {session.get('user_id')}")
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    try:
+        payload = request.get_json(silent=True)
+        if payload is None:
+            payload = {}
+        if not isinstance(payload, dict):
+            logger.warning(f"Batch body is not a JSON object for user {session.get('user_id')}")
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        calendar_id = request.args.get('calendarId') or payload.get('calendarId')
+        operations = payload.get('operations')
+        
+        if not calendar_id or not operations:
+            logger.warning(f"Missing required parameters for user {session.get('user_id')}")
+            return jsonify({'error': 'Missing required parameters'}), 400
+        if not isinstance(operations, list):
+            logger.warning(f"Batch operations are not a list for user {session.get('user_id')}")
+            return jsonify({'error': 'operations must be a list'}), 400
+            
+        results = calendar_service.batch_events(user_data, calendar_id, operations)
+        logger.debug(f"Batch of {len(results)} event operations processed for user {session.get('user_id')}")
+        return jsonify({'results': results})
+    except Exception as e:
+        logger.error(f"Failed to process event batch for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @bp.route('/events/<event_id>', methods=['PUT'])
 @login_required
 def update_event(event_id):
@@ -107,6 +177,9 @@ def update_event(event_id):
         event = calendar_service.update_event(user_data, calendar_id, event_id, event_data)
         logger.debug(f"Event updated for user {session.get('user_id')}: {event}")
         return jsonify(event)
+    except PreconditionFailedError as e:
+        logger.warning(f"Edit conflict updating event for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Failed to update event for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -124,6 +197,78 @@ def delete_event(event_id):
         result = calendar_service.delete_event(get_user_data(), event_id, request.args['calendar'])
         logger.debug(f"Event deleted for user {session.get('user_id')}")
         return jsonify(result)
+    except PreconditionFailedError as e:
+        logger.warning(f"Edit conflict deleting event for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Failed to delete event for user {session.get('user_id')}: {str(e)}")
-        return jsonify({'error': str(e)}), 400 if isinstance(e, ValueError) else 500 
\ No newline at end of file
+        return jsonify({'error': str(e)}), 400 if isinstance(e, ValueError) else 500 
+
+@bp.route('/import', methods=['POST'])
+@login_required
+def import_events():
+    """Start importing events from an iCalendar file"""
+    logger.debug(f"Import events request received for user {session.get('user_id')}")
+    if 'file' not in request.files:
+        logger.warning(f"No file provided for user {session.get('user_id')}")
+        return jsonify({'error': 'No file provided'}), 400
+        
+    try:
+        user_data = get_user_data()
+        if not user_data:
+            logger.warning(f"No user data found for user {session.get('user_id')}")
+            return jsonify({'error': 'Not authenticated'}), 401
+            
+        calendar_id = request.form.get('calendarId') or request.args.get('calendarId')
+        if not calendar_id:
+            logger.warning(f"Missing calendar ID for user {session.get('user_id')}")
+            return jsonify({'error': 'Calendar ID is required'}), 400
+            
+        file = request.files['file']
+        if not file.filename.lower().endswith(('.ics', '.ical', '.ifb', '.icalendar')):
+            logger.warning(f"Invalid file type for user {session.get('user_id')}")
+            return jsonify({'error': 'Invalid file type. Only .ics files are supported'}), 400
+            
+        job = get_job_registry().start_upload('calendar-import', session.get('user_id'), file,
+                                              lambda job, path: calendar_service.import_events(user_data, calendar_id, path, job))
+        logger.debug(f"Calendar import job {job.id} started for user {session.get('user_id')}")
+        return jsonify({'jobId': job.id, 'status': job.status}), 202
+    except Exception as e:
+        logger.error(f"Failed to import events for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@bp.route('/import/<job_id>', methods=['GET'])
+@login_required
+def import_status(job_id):
+    """Progress of a calendar import"""
+    job = get_job_registry().get(job_id, session.get('user_id'))
+    if not job or job['kind'] != 'calendar-import':
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(job)
+
+@bp.route('/export', methods=['GET'])
+@login_required
+def export_events():
+    """Export a calendar to an iCalendar file"""
+    logger.debug(f"Export events request received for user {session.get('user_id')}")
+    try:
+        user_data = get_user_data()
+        if not user_data:
+            logger.warning(f"No user data found for user {session.get('user_id')}")
+            return jsonify({'error': 'Not authenticated'}), 401
+            
+        calendar_id = request.args.get('calendarId')
+        if not calendar_id:
+            logger.warning(f"Missing calendar ID for user {session.get('user_id')}")
+            return jsonify({'error': 'Calendar ID is required'}), 400
+            
+        # Written to the client while it is being downloaded from Baikal
+        chunks = calendar_service.export_events(user_data, calendar_id)
+        return Response(
+            stream_with_context(chunks),
+            mimetype='text/calendar',
+            headers={'Content-Disposition': 'attachment; filename=calendar.ics'}
+        )
+    except Exception as e:
+        logger.error(f"Failed to export events for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 500
@@ -1,8 +1,11 @@
-from flask import Blueprint, request, jsonify, session, Response
+from flask import Blueprint, request, jsonify, session, Response, stream_with_context
 import vobject
 from ..utils.auth import login_required
 from ..utils.settings import get_user_data, log_error
-from ..services.addressbook import AddressBookService
+from ..services.addressbook import AddressBookService, InvalidContactQueryError
+from ..services.baikal_client import PreconditionFailedError
+from ..services.jobs import get_job_registry
+from ..utils.http_cache import etag_matches, not_modified, with_etag
 import logging
 
 # Configure logging
@@ -21,6 +24,13 @@ if not logger.handlers:
 contacts = Blueprint('contacts', __name__, url_prefix='/api/contacts')
 addressbook_service = AddressBookService()
 
+# Export formats and their content types
+EXPORT_MIMETYPES = {
+    'vcf': 'text/vcard',
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
 def contact_to_json(vcard) -> dict:
     return {
         'id': getattr(vcard, 'uid', uuid.uuid4()).value,
@@ -97,9 +107,27 @@ def get_contacts():
             logger.warning(f"Missing address book ID for user {session.get('user_id')}")
             return jsonify({'error': 'Address book ID is required'}), 400
             
-        contacts = addressbook_service.get_contacts(user_data, book_id)
-        logger.debug(f"Contacts retrieved for user {session.get('user_id')}: {contacts}")
-        return jsonify(contacts)
+        # Paging, sorting and search; the first page costs the same whatever the size of the book.
+        # Search terms under 3 characters match the start of a word ("an" finds "Anna", not "Joanna")
+        query = {name: request.args[name] for name in ('limit', 'cursor', 'sort', 'q') if request.args.get(name)}
+        try:
+            limit = int(query['limit']) if 'limit' in query else None
+        except ValueError:
+            return jsonify({'error': 'limit must be a number'}), 400
+            
+        # An unchanged address book is answered from its CTag, without listing or serialising contacts
+        etag = addressbook_service.contacts_etag(user_data, book_id, query)
+        if etag and etag_matches(request.headers.get('If-None-Match'), etag):
+            logger.debug(f"Contacts not modified for user {session.get('user_id')}")
+            return not_modified(etag)
+            
+        page = addressbook_service.get_contacts(user_data, book_id, limit, query.get('cursor'),
+                                                query.get('sort'), query.get('q'))
+        logger.debug(f"Contacts retrieved for user {session.get('user_id')}: {len(page['contacts'])} of {page['total']}")
+        return with_etag(jsonify(page), etag)
+    except InvalidContactQueryError as e:
+        logger.warning(f"Invalid contacts query for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logger.error(f"Failed to get contacts for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -125,9 +153,9 @@ def create_contact():
             logger.warning(f"Missing address book ID for user {session.get('user_id')}")
             return jsonify({'error': 'Address book ID is required'}), 400
             
-        contact = addressbook_service.create_contact(user_data, book_id, data)
+        contact, etag = addressbook_service.create_contact(user_data, book_id, data)
         logger.debug(f"Contact created for user {session.get('user_id')}: {contact}")
-        return jsonify(contact)
+        return with_etag(jsonify(contact), etag)
     except Exception as e:
         logger.error(f"Failed to create contact for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -154,9 +182,13 @@ def update_contact(contact_id):
             return jsonify({'error': 'Address book ID is required'}), 400
             
         data['id'] = contact_id
-        contact = addressbook_service.update_contact(user_data, book_id, data)
+        # If-Match: the version the client edited, so a change made elsewhere is not overwritten
+        contact, etag = addressbook_service.update_contact(user_data, book_id, data, request.headers.get('If-Match'))
         logger.debug(f"Contact updated for user {session.get('user_id')}: {contact}")
-        return jsonify(contact)
+        return with_etag(jsonify(contact), etag)
+    except PreconditionFailedError as e:
+        logger.warning(f"Edit conflict updating contact for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Failed to update contact for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -180,6 +212,9 @@ def delete_contact(contact_id):
         addressbook_service.delete_contact(user_data, book_id, contact_id)
         logger.debug(f"Contact deleted for user {session.get('user_id')}")
         return jsonify({'message': 'Contact deleted'})
+    except PreconditionFailedError as e:
+        logger.warning(f"Edit conflict deleting contact for user {session.get('user_id')}: {str(e)}")
+        return jsonify({'error': str(e)}), 409
     except Exception as e:
         logger.error(f"Failed to delete contact for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -187,7 +222,7 @@ def delete_contact(contact_id):
 @contacts.route('/contacts/import', methods=['POST'])
 @login_required
 def import_contacts():
-    """Import contacts from a vCard file"""
+    """Start importing contacts from a vCard file"""
     logger.debug(f"Import contacts request received for user {session.get('user_id')}")
     if 'file' not in request.files:
         logger.warning(f"No file provided for user {session.get('user_id')}")
@@ -205,17 +240,27 @@ def import_contacts():
             return jsonify({'error': 'Address book ID is required'}), 400
             
         file = request.files['file']
-        if not file.filename.endswith('.vcf'):
+        if not file.filename.lower().endswith(('.vcf', '.vcard')):
             logger.warning(f"Invalid file type for user {session.get('user_id')}")
             return jsonify({'error': 'Invalid file type. Only .vcf files are supported'}), 400
             
-        contacts = addressbook_service.import_contacts(user_data, book_id, file)
-        logger.debug(f"Contacts imported for user {session.get('user_id')}: {contacts}")
-        return jsonify({'message': f'Successfully imported {len(contacts)} contacts'})
+        job = get_job_registry().start_upload('contact-import', session.get('user_id'), file,
+                                              lambda job, path: addressbook_service.import_contacts(user_data, book_id, path, job))
+        logger.debug(f"Contact import job {job.id} started for user {session.get('user_id')}")
+        return jsonify({'jobId': job.id, 'status': job.status}), 202
     except Exception as e:
         logger.error(f"Failed to import contacts for user {session.get('user_id')}: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@contacts.route('/import/<job_id>', methods=['GET'])
+@login_required
+def import_status(job_id):
+    """Progress of a contact import"""
+    job = get_job_registry().get(job_id, session.get('user_id'))
+    if not job or job['kind'] != 'contact-import':
+        return jsonify({'error': 'Import not found'}), 404
+    return jsonify(job)
+
 @contacts.route('/contacts/export', methods=['GET'])
 @login_required
 def export_contacts():
@@ -232,12 +277,19 @@ def export_contacts():
             logger.warning(f"Missing address book ID for user {session.get('user_id')}")
             return jsonify({'error': 'Address book ID is required'}), 400
             
-        vcard_data = addressbook_service.export_contacts(user_data, book_id)
-        logger.debug(f"Contacts exported for user {session.get('user_id')}")
+        # format=jsonl / csv exports the contact JSON for bulk tooling instead of the vCards
+        export_format = request.args.get('format', 'vcf').lower()
+        if export_format not in EXPORT_MIMETYPES:
+            logger.warning(f"Unsupported export format for user {session.get('user_id')}")
+            return jsonify({'error': 'Unsupported export format'}), 400
+            
+        # Written to the client a chunk of cards at a time
+        chunks = addressbook_service.export_contacts(user_data, book_id, export_format)
+        logger.debug(f"Contacts export started for user {session.get('user_id')}")
         return Response(
-            vcard_data,
-            mimetype='text/vcard',
-            headers={'Content-Disposition': 'attachment; filename=contacts.vcf'}
+            stream_with_context(chunks),
+            mimetype=EXPORT_MIMETYPES[export_format],
+            headers={'Content-Disposition': f'attachment; filename=contacts.{export_format}'}
         )
     except Exception as e:
         logger.error(f"Failed to export contacts for user {session.get('user_id')}: {str(e)}")
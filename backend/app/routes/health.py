@@ -1,8 +1,38 @@
 from flask import Blueprint, jsonify
+from ..utils.auth import login_required
+from ..services.baikal_client import get_client_registry, get_verification_cache
+from ..services.calendar import event_cache_stats
+from ..services.dav_store import store_stats
+from ..services.http_pool import get_http_pool
+from ..services.jobs import get_job_registry
+from ..services.prefetch import prefetch_stats
+from ..services.recurrence import occurrence_cache_stats
+from ..services.resilience import breaker_states
 
 health_bp = Blueprint('health', __name__)
 
 @health_bp.route('/health')
 def health_check():
     """Simple health check endpoint for container monitoring"""
-    return jsonify({'status': 'healthy'}), 200 
\ No newline at end of file
+    return jsonify({'status': 'healthy'}), 200
+
+@health_bp.route('/health/stats')
+@login_required
+def health_stats():
+    """Connection pool and cache counters, used to size the performance settings"""
+    return jsonify({
+        'httpPool': get_http_pool().stats(),
+        'clients': get_client_registry().stats(),
+        'verification': get_verification_cache().stats(),
+        'stores': store_stats(),
+        'eventParse': event_cache_stats(),
+        'occurrences': occurrence_cache_stats(),
+        'prefetch': prefetch_stats(),
+        'jobs': get_job_registry().stats()
+    }), 200
+
+@health_bp.route('/health/upstreams')
+@login_required
+def upstream_health():
+    """Circuit breaker state for every Baikal host this worker talks to"""
+    return jsonify(breaker_states()), 200
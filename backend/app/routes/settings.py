@@ -1,7 +1,7 @@
 from flask import Blueprint, request, jsonify, session
 from ..utils.user_store import get_user_store
 from ..config.config import Config
-from ..services.baikal_client import BaikalClient
+from ..services.baikal_client import BaikalClient, get_verification_cache
 import caldav
 import json
 from datetime import datetime, timedelta
@@ -68,7 +68,7 @@ def save_baikal_settings():
     settings_data = data.copy()
     
     # Verify connection before saving
-    success, error_message = baikal_client.verify_connection(settings_data)
+    success, error_message = baikal_client.verify_connection_cached(settings_data)
     if not success:
         return jsonify({
             'error': 'Connection verification failed',
@@ -78,6 +78,8 @@ def save_baikal_settings():
     try:
         # Save settings only if connection verification passed
         get_user_store().update_user(user_id, {'baikal_credentials': settings_data})
+        # Saved settings must be tested again next time
+        get_verification_cache().clear()
         logger.debug(f"Settings saved successfully for user {user_id}")
         return jsonify({
             'message': 'Settings saved successfully',
@@ -116,7 +118,7 @@ def verify_baikal_connection():
         }), 400
     
     try:
-        success, error_message = baikal_client.verify_connection(data)
+        success, error_message = baikal_client.verify_connection_cached(data)
         logger.debug(f"Verification result - Success: {success}, Error: {error_message}")
         
         if success:
@@ -149,7 +151,7 @@ def test_baikal_connection():
         return jsonify({'error': 'Missing required fields'}), 400
     
     try:
-        success, error_message = baikal_client.verify_connection(data)
+        success, error_message = baikal_client.verify_connection_cached(data)
         if success:
             return jsonify({'message': 'Connected'})
         else:
@@ -210,6 +212,8 @@ def save_settings():
             updates['app_settings'] = data['app']
             
         get_user_store().update_user(user_id, updates)
+        if 'baikal_credentials' in updates:
+            get_verification_cache().clear()
         return jsonify({'message': 'Settings saved successfully'})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
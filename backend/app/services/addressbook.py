@@ -1,18 +1,182 @@
-from typing import List, Dict
+from typing import Callable, Iterator, List, Dict, Optional, Set, Tuple
+import base64
+import bisect
+import csv
+import io
+import json
+import re
+import threading
 import vobject
 from .vcard import VCardService
 from urllib.parse import urljoin
 import caldav
-from .baikal_client import BaikalClient
+from .baikal_client import (
+    PreconditionFailedError, addressbook_multiget, addressbook_query, credentials_hash, delete_object,
+    get_client_registry, get_collection_state, object_name, put_object
+)
+from .dav_store import get_collection_store
+from .jobs import run_bounded
+from ..config.config import Config
+from ..utils.http_cache import make_etag
+from ..utils.settings import log_error
 import uuid
 from datetime import datetime
 
+# Export formats: the vCards themselves, or the contact JSON for bulk tooling
+EXPORT_FORMATS = {'vcf', 'jsonl', 'csv'}
+CSV_FIELDS = ['id', 'displayName', 'firstName', 'lastName', 'organization', 'email', 'phone', 'address', 'notes']
+
+# Contact fields matched by search (q) and the ones a page can be sorted by
+SEARCH_FIELDS = ('displayName', 'firstName', 'lastName', 'email', 'phone', 'organization')
+SORT_FIELDS = ('displayName', 'firstName', 'lastName', 'email', 'organization')
+
+WORD_PATTERN = re.compile(r'\w+')
+
+# vCard properties behind SEARCH_FIELDS, for searches the server runs (addressbook-query)
+SEARCH_PROPERTIES = ('FN', 'N', 'EMAIL', 'TEL', 'ORG')
+
+def _search_text(record: Dict) -> str:
+    return ' '.join(str(record.get(field) or '') for field in SEARCH_FIELDS).casefold()
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def _sort_key(record: Dict, url: str, field: str) -> Tuple[bool, str, str]:
+    """Empty values last, then case-insensitive; the URL keeps keys unique for cursors"""
+    value = str(record.get(field) or '').casefold()
+    return (not value, value, url)
+
+def _cold_search(store, q: Optional[str]) -> bool:
+    """A search on a store that has never been synced is answered by the server (addressbook-query)"""
+    return bool(q and q.strip()) and not store.loaded
+
+class InvalidContactQueryError(ValueError):
+    """Paging, sort or search parameters the contacts API cannot handle"""
+
+def _encode_cursor(sort: str, key: Tuple[bool, str, str]) -> str:
+    """Opaque cursor: the sort order and the key of the last contact served"""
+    payload = json.dumps([sort, *key], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+def _decode_cursor(cursor: str, sort: str) -> Tuple[bool, str, str]:
+    try:
+        cursor_sort, empty, value, url = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        if not (isinstance(empty, bool) and isinstance(value, str) and isinstance(url, str)):
+            raise ValueError('Malformed cursor')
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidContactQueryError('Invalid cursor')
+    if cursor_sort != sort:
+        raise InvalidContactQueryError('The cursor belongs to a different sort order')
+    return (empty, value, url)
+
+class ContactIndex:
+    """
+    Lookups over the contacts of one address book store, maintained as sync applies changes:
+    UID -> vCard URLs, a trigram and word-prefix index for search, and sorted keys per sort field.
+    """
+    
+    def __init__(self):
+        # Older versions of this app wrote a new object on every save, so a UID may have several
+        self.urls: Dict[str, Dict[str, None]] = {}
+        self.uids: Dict[str, str] = {}
+        self.records: Dict[str, Dict] = {}
+        self.texts: Dict[str, str] = {}
+        self.trigrams: Dict[str, Set[str]] = {}
+        self.words: List[Tuple[str, str]] = []  # sorted (word, url), for queries shorter than a trigram
+        self.sorted: Dict[str, List[Tuple[bool, str, str]]] = {field: [] for field in SORT_FIELDS}
+        self._lock = threading.Lock()
+    
+    def add(self, url: str, record: Dict) -> None:
+        with self._lock:
+            self._discard(url)
+            uid = str(record['id'])
+            self.urls.setdefault(uid, {})[url] = None
+            self.uids[url] = uid
+            self.records[url] = record
+            self.texts[url] = text = _search_text(record)
+            for gram in _trigrams(text):
+                self.trigrams.setdefault(gram, set()).add(url)
+            for word in set(WORD_PATTERN.findall(text)):
+                bisect.insort(self.words, (word, url))
+            for field, keys in self.sorted.items():
+                bisect.insort(keys, _sort_key(record, url, field))
+    
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self._discard(url)
+    
+    def _discard(self, url: str) -> None:
+        if (uid := self.uids.pop(url, None)) is not None:
+            self.urls[uid].pop(url, None)
+            if not self.urls[uid]:
+                del self.urls[uid]
+        if (record := self.records.pop(url, None)) is None:
+            return
+        text = self.texts.pop(url)
+        for gram in _trigrams(text):
+            self.trigrams[gram].discard(url)
+            if not self.trigrams[gram]:
+                del self.trigrams[gram]
+        for word in set(WORD_PATTERN.findall(text)):
+            position = bisect.bisect_left(self.words, (word, url))
+            del self.words[position]
+        for field, keys in self.sorted.items():
+            position = bisect.bisect_left(keys, _sort_key(record, url, field))
+            del keys[position]
+    
+    def lookup(self, uid: str) -> List[str]:
+        with self._lock:
+            return list(self.urls.get(str(uid), ()))
+    
+    def _matches(self, query: str) -> Set[str]:
+        """
+        URLs of contacts matching every term of query; caller holds the lock.
+        Terms shorter than a trigram match word prefixes, not substrings (see get_contacts).
+        """
+        matches = None
+        for term in query.casefold().split():
+            if len(term) >= 3:
+                # Candidates share every trigram of the term, the text check rules out scattered ones
+                postings = sorted((self.trigrams.get(gram, set()) for gram in _trigrams(term)), key=len)
+                found = {url for url in postings[0].intersection(*postings[1:]) if term in self.texts[url]}
+            else:
+                found = set()
+                position = bisect.bisect_left(self.words, (term,))
+                while position < len(self.words) and self.words[position][0].startswith(term):
+                    found.add(self.words[position][1])
+                    position += 1
+            matches = found if matches is None else matches & found
+            if not matches:
+                break
+        return matches if matches is not None else set(self.records)
+    
+    def page(self, query: Optional[str], sort: str, descending: bool, after: Optional[Tuple],
+             limit: int) -> Tuple[List[Dict], Optional[Tuple], int]:
+        """
+        Up to limit records in sort order following the key after (from a cursor).
+        Returns (records, key to continue after or None, number of matches).
+        """
+        with self._lock:
+            if query and query.strip():
+                keys = sorted(_sort_key(self.records[url], url, sort) for url in self._matches(query))
+            else:
+                keys = self.sorted[sort]  # Already sorted, a page costs a bisect and a slice
+            if descending:
+                end = bisect.bisect_left(keys, after) if after else len(keys)
+                window = keys[max(0, end - limit):end][::-1]
+                more = end - limit > 0
+            else:
+                start = bisect.bisect_right(keys, after) if after else 0
+                window = keys[start:start + limit]
+                more = start + limit < len(keys)
+            return [self.records[key[2]] for key in window], (window[-1] if more and window else None), len(keys)
+
 class AddressBookService:
     """Service for handling address book operations"""
     
     def __init__(self):
         self.vcard = VCardService()
-        self.baikal_client = BaikalClient()
+        self.clients = get_client_registry()
     
     def _get_client(self, user_data: Dict) -> caldav.DAVClient:
         if not user_data:
@@ -23,46 +187,11 @@ class AddressBookService:
             raise ValueError('Missing Baikal credentials')
             
         try:
-            success, client_or_error = self.baikal_client.verify_connection(creds)
-            if not success:
-                raise ValueError(f'Connection failed: {client_or_error}')
-                
-            success, client_or_error = self.baikal_client.get_client()
-            if not success:
-                raise ValueError(f'Failed to get client: {client_or_error}')
-                
-            return client_or_error
+            # Reuses a verified client; full verification only runs for new credentials
+            return self.clients.get_client(creds)
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"DAV connection error: {str(e)}")
     
-    def _get_book(self, user_data: Dict, book_id: str = None) -> object:
-        if not user_data:
-            raise ValueError('User data required')
-        client = self._get_client(user_data)
-        try:
-            # Get address book path from user settings
-            creds = user_data.get('baikal_credentials', {})
-            book_path = creds.get('addressBookPath', '/addressbooks/test/default/')
-            
-            # Log the path we're trying to access
-            from ..utils.settings import log_error
-            log_error(user_data.get('user_id', 'unknown'), f"Attempting to access address book at path: {book_path}")
-            
-            # Get the address book directly using the URL
-            book_url = urljoin(creds.get('serverUrl', ''), book_path)
-            book = client.addressbook(url=book_url)
-            
-            if not book:
-                raise ValueError('Address book not found')
-            
-            # Log successful access
-            log_error(user_data.get('user_id', 'unknown'), f"Successfully accessed address book at path: {book_path}")
-            return book
-        except caldav.lib.error.DAVError as e:
-            from ..utils.settings import log_error
-            log_error(user_data.get('user_id', 'unknown'), f"Failed to access address book: {str(e)}")
-            raise ValueError(f"Failed to access address book: {str(e)}")
-    
     def get_books(self, user_data: Dict) -> List[Dict]:
         """Get list of available address books"""
         client = self._get_client(user_data)
@@ -102,142 +231,297 @@ class AddressBookService:
         except Exception as e:
             raise ValueError(f"Unexpected error fetching address book: {str(e)}")
     
-    def get_contacts(self, user_data: Dict, book_id: str = None) -> List[Dict]:
-        """Get all contacts from an address book"""
-        book = self._get_book(user_data, book_id)
-        contacts = []
+    def _book_url(self, user_data: Dict) -> str:
+        """The address book configured in the Baikal settings"""
+        creds = user_data.get('baikal_credentials', {})
+        book_path = creds.get('addressBookPath', '/addressbooks/test/default/')
+        return urljoin(creds.get('serverUrl', ''), book_path)
+    
+    def _get_store(self, user_data: Dict, book_url: str):
+        """Local copy of an address book for this user"""
+        return get_collection_store(user_data['baikal_credentials'], book_url,
+                                    self._contact_parser(book_url), ContactIndex, addressbook_multiget)
+    
+    def _locate(self, client: caldav.DAVClient, store, contact_id: str) -> List[Tuple[str, str]]:
+        """
+        (URL, ETag) of every vCard with this UID, from the store's index.
+        The store is only synced again when the UID is not in it.
+        """
+        if not store.index.lookup(contact_id):
+            store.sync(client)
+        located = [(url, stored.etag) for url in store.index.lookup(contact_id)
+                   if (stored := store.get(url)) is not None]
+        if not located:
+            raise ValueError('Contact not found')
+        return located
+    
+    def _contact_parser(self, book_url: str) -> Callable[[str, str], Optional[Dict]]:
+        """Build the contact JSON kept in the local address book store for each vCard"""
+        def parse(card_url: str, data: str) -> Optional[Dict]:
+            vcard = vobject.readOne(data)
+            # Skip invalid vCards
+            if not hasattr(vcard, 'fn'):
+                return None
+            contact = self.vcard.to_json(vcard)
+            contact['addressBookId'] = book_url
+            return contact
+        return parse
+    
+    def get_contacts(self, user_data: Dict, book_id: str = None, limit: Optional[int] = None,
+                     cursor: Optional[str] = None, sort: Optional[str] = None, q: Optional[str] = None) -> Dict:
+        """
+        One page of contacts from an address book, sorted by sort ('-' prefix for descending)
+        and optionally filtered by the search terms in q. Pass nextCursor back as cursor for the next page.
+        A contact matches q when it matches every term. Terms of three or more characters match
+        anywhere in the searched fields; shorter ones only match the start of a word, so "an"
+        finds "Anna" and "Ann Smith" but not "Joanna".
+        """
+        sort = sort or SORT_FIELDS[0]
+        descending = sort.startswith('-')
+        field = sort.lstrip('-')
+        if field not in SORT_FIELDS:
+            raise InvalidContactQueryError(f"Unsupported sort field: {field}")
+        limit = min(max(1, limit or Config.CONTACTS_PAGE_SIZE), Config.CONTACTS_MAX_PAGE_SIZE)
+        after = _decode_cursor(cursor, sort) if cursor else None
+        
+        client = self._get_client(user_data)
+        book_url = self._book_url(user_data)
         try:
             # Log that we're fetching contacts
-            from ..utils.settings import log_error
             log_error(user_data.get('user_id', 'unknown'), "Starting to fetch contacts")
             
-            for obj in book.objects():
-                try:
-                    vcard = vobject.readOne(obj.data)
-                    # Skip invalid vCards
-                    if not hasattr(vcard, 'fn'):
-                        log_error(user_data.get('user_id', 'unknown'), "Skipping contact without FN field")
-                        continue
-                    contact_data = self.vcard.to_json(vcard)
-                    contact_data['addressBookId'] = str(book.url)
-                    contacts.append(contact_data)
-                except Exception as e:
-                    from ..utils.settings import log_error
-                    log_error(user_data.get('user_id', 'unknown'), f"Failed to parse contact: {str(e)}")
+            # Only cards changed since the last sync are downloaded and parsed again
+            store = self._get_store(user_data, book_url)
+            if not (_cold_search(store, q) and self._search_upstream(user_data, client, store, q)):
+                store.sync(client)
+            contacts, last, total = store.index.page(q, field, descending, after, limit)
             
             # Log the number of contacts found
-            log_error(user_data.get('user_id', 'unknown'), f"Found {len(contacts)} contacts")
-            return contacts
+            log_error(user_data.get('user_id', 'unknown'), f"Found {total} contacts, returning {len(contacts)}")
+            return {
+                'contacts': contacts,
+                'total': total,
+                'nextCursor': _encode_cursor(sort, last) if last else None
+            }
         except caldav.lib.error.DAVError as e:
-            from ..utils.settings import log_error
             log_error(user_data.get('user_id', 'unknown'), f"Failed to fetch contacts: {str(e)}")
             raise ValueError(f"Failed to fetch contacts: {str(e)}")
     
-    def _save_contact(self, book: object, contact_data: Dict) -> Dict:
+    def _search_upstream(self, user_data: Dict, client: caldav.DAVClient, store, q: str) -> bool:
+        """
+        Cold start search: Baikal filters the book with an addressbook-query REPORT and only
+        the matching cards are downloaded, merged into the store as they arrive.
+        Returns False when the server cannot run the query, so the caller syncs instead.
+        """
+        # The server matches one term in any property; the index then applies every term.
+        # The longest term is the most selective one to send.
+        term = max(q.split(), key=len)
         try:
-            vcard = self.vcard.from_json(contact_data)
-            # Ensure UID exists
-            if not hasattr(vcard, 'uid'):
-                vcard.add('uid')
-                vcard.uid.value = str(uuid.uuid4())
-            # Ensure proper vCard version for Baikal
-            vcard.version.value = '3.0'
-            # Add required fields for Baikal
-            if not hasattr(vcard, 'rev'):
-                vcard.add('rev')
-            vcard.rev.value = datetime.now().strftime('%Y%m%dT%H%M%SZ')
-            
-            try:
-                book.add_vcard(vcard.serialize())
-                return self.vcard.to_json(vcard)
-            except caldav.lib.error.DAVError as e:
-                raise ValueError(f"Failed to save contact to server: {str(e)}")
-        except Exception as e:
-            raise ValueError(f"Failed to process contact data: {str(e)}")
+            merged = store.merge(addressbook_query(client, store.url, term, SEARCH_PROPERTIES))
+        except caldav.lib.error.AuthorizationError:
+            raise
+        except caldav.lib.error.DAVError as e:
+            log_error(user_data.get('user_id', 'unknown'),
+                      f"addressbook-query on {store.url} failed ({str(e)}), syncing the whole book")
+            return False
+        log_error(user_data.get('user_id', 'unknown'), f"addressbook-query for {term!r} returned {merged} cards")
+        return True
     
-    def create_contact(self, user_data: Dict, book_id: str, contact_data: Dict) -> Dict:
-        """Create a new contact"""
-        book = self._get_book(user_data, book_id)
-        return self._save_contact(book, contact_data)
+    def contacts_etag(self, user_data: Dict, book_id: str = None, query: Optional[Dict] = None) -> Optional[str]:
+        """
+        Validator for a get_contacts page from the address book's CTag / sync-token and the query, or None.
+        A cold search is answered from the cards the server matched, not from the whole book,
+        so it gets a validator of its own that a later answer from the synced store never matches.
+        """
+        client = self._get_client(user_data)
+        creds = user_data.get('baikal_credentials', {})
+        book_url = self._book_url(user_data)
+        try:
+            state = get_collection_state(client, book_url)
+        except caldav.lib.error.DAVError:
+            return None
+        if not state['ctag'] and not state['syncToken']:
+            return None
+        query = query or {}
+        source = 'search' if _cold_search(self._get_store(user_data, book_url), query.get('q')) else 'store'
+        return make_etag('contacts', credentials_hash(creds), book_url, state['ctag'], state['syncToken'],
+                         source, *sorted(query.items()))
     
-    def update_contact(self, user_data: Dict, book_id: str, contact_data: Dict) -> Dict:
-        """Update an existing contact"""
-        book = self._get_book(user_data, book_id)
-        return self._save_contact(book, contact_data)
+    def _build_vcard(self, contact_data: Dict) -> vobject.vCard:
+        return self._normalise_vcard(self.vcard.from_json(contact_data))
     
-    def delete_contact(self, user_data: Dict, book_id: str, contact_id: str) -> None:
-        """Delete a contact"""
-        book = self._get_book(user_data, book_id)
+    def _normalise_vcard(self, vcard: vobject.vCard) -> vobject.vCard:
+        # Ensure UID exists
+        if not hasattr(vcard, 'uid'):
+            vcard.add('uid')
+        if not vcard.uid.value:
+            vcard.uid.value = str(uuid.uuid4())
+        # Ensure proper vCard version for Baikal
+        if not hasattr(vcard, 'version'):
+            vcard.add('version')
+        vcard.version.value = '3.0'
+        # Add required fields for Baikal
+        if not hasattr(vcard, 'rev'):
+            vcard.add('rev')
+        vcard.rev.value = datetime.now().strftime('%Y%m%dT%H%M%SZ')
+        return vcard
+    
+    def create_contact(self, user_data: Dict, book_id: str, contact_data: Dict) -> Tuple[Dict, str]:
+        """Create a new contact; returns its JSON and ETag"""
+        client = self._get_client(user_data)
+        book_url = self._book_url(user_data)
+        store = self._get_store(user_data, book_url)
         try:
-            # First try to find the contact
-            contact = None
-            for obj in book.objects():
-                try:
-                    vcard = vobject.readOne(obj.data)
-                    if hasattr(vcard, 'uid') and str(vcard.uid.value) == str(contact_id):
-                        contact = obj
-                        break
-                except Exception as e:
-                    from ..utils.settings import log_error
-                    log_error(user_data.get('user_id', 'unknown'), f"Failed to parse contact during deletion: {str(e)}")
-                    continue
+            vcard = self._build_vcard(contact_data)
+            data = vcard.serialize()
+        except Exception as e:
+            raise ValueError(f"Failed to process contact data: {str(e)}")
+        
+        card_url = urljoin(book_url.rstrip('/') + '/', object_name(str(vcard.uid.value), 'vcf'))
+        try:
+            # Never overwrite an existing card that happens to have the same name
+            etag = put_object(client, card_url, data, 'text/vcard', create=True)
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to save contact to server: {str(e)}")
+        return store.put(card_url, etag, data), etag
+    
+    def update_contact(self, user_data: Dict, book_id: str, contact_data: Dict,
+                       etag: Optional[str] = None) -> Tuple[Dict, str]:
+        """
+        Update an existing contact in place: only the edited properties of the stored vCard
+        change, and it is PUT back to its own URL guarded by its ETag (or the one the caller saw).
+        Returns the contact JSON and the new ETag.
+        """
+        client = self._get_client(user_data)
+        book_url = self._book_url(user_data)
+        store = self._get_store(user_data, book_url)
+        try:
+            card_url, current_etag = self._locate(client, store, contact_data.get('id'))[0]
+            stored = store.get(card_url)
+            try:
+                vcard = vobject.readOne(stored.data)
+                if not self.vcard.apply_json(vcard, contact_data):
+                    return stored.record, current_etag  # Nothing was edited
+                data = vcard.serialize()
+            except Exception as e:
+                raise ValueError(f"Failed to process contact data: {str(e)}")
             
-            if not contact:
-                raise ValueError('Contact not found')
-                
-            # Then try to delete it
+            # Only overwrite the version we know about; a concurrent change gives a 412
             try:
-                contact.delete()
-            except caldav.lib.error.DAVError as e:
-                raise ValueError(f"Failed to delete contact from server: {str(e)}")
-                
+                new_etag = put_object(client, card_url, data, 'text/vcard', etag=etag or current_etag)
+            except PreconditionFailedError:
+                store.remove(card_url)
+                raise
+            return store.put(card_url, new_etag, data), new_etag
         except caldav.lib.error.DAVError as e:
-            raise ValueError(f"Failed to access contacts: {str(e)}")
+            raise ValueError(f"Failed to save contact to server: {str(e)}")
     
-    def import_contacts(self, user_data: Dict, book_id: str, vcard_data: str) -> int:
-        """Import contacts from vCard data"""
-        book = self._get_book(user_data, book_id)
-        imported = 0
+    def delete_contact(self, user_data: Dict, book_id: str, contact_id: str) -> None:
+        """Delete a contact (and any duplicates left with its UID)"""
+        client = self._get_client(user_data)
+        book_url = self._book_url(user_data)
+        store = self._get_store(user_data, book_url)
         try:
-            for vcard in self.vcard.parse_vcards(vcard_data):
+            for card_url, etag in self._locate(client, store, contact_id):
                 try:
-                    # Ensure proper vCard version and required fields
-                    vcard.version.value = '3.0'
-                    if not hasattr(vcard, 'uid'):
-                        vcard.add('uid')
-                        vcard.uid.value = str(uuid.uuid4())
-                    if not hasattr(vcard, 'rev'):
-                        vcard.add('rev')
-                    vcard.rev.value = datetime.now().strftime('%Y%m%dT%H%M%SZ')
-                    
-                    # Ensure required fields
-                    if not hasattr(vcard, 'fn'):
-                        vcard.add('fn').value = 'Unknown Contact'
-                    
-                    book.add_vcard(vcard.serialize())
-                    imported += 1
-                except Exception as e:
-                    from ..utils.settings import log_error
-                    log_error(user_data.get('user_id', 'unknown'), f"Import failed: {str(e)}")
-            return imported
+                    delete_object(client, card_url, etag=etag)
+                except PreconditionFailedError:
+                    store.remove(card_url)
+                    raise
+                except ValueError:
+                    pass  # Already gone upstream
+                store.remove(card_url)
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to delete contact from server: {str(e)}")
+    
+    def import_contacts(self, user_data: Dict, book_id: str, path: str, job) -> Dict:
+        """
+        Import an uploaded .vcf file as a background job.
+        The file is read one card at a time and uploaded through a bounded pool,
+        so memory use does not depend on the size of the file.
+        """
+        client = self._get_client(user_data)
+        book_url = self._book_url(user_data)
+        store = self._get_store(user_data, book_url)
+        
+        with open(path, 'rb') as f:
+            job.add_total(self.vcard.count_vcards(f))
+        
+        try:
+            # Cards whose UID is already in the book are skipped through the store's index
+            store.sync(client)
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"Failed to import contacts: {str(e)}")
+        
+        with open(path, 'rb') as f:
+            run_bounded(job, enumerate(self.vcard.iter_vcards(f), 1),
+                        lambda card: self._import_card(client, store, book_url, job, *card))
+        
+        log_error(user_data.get('user_id', 'unknown'),
+                  f"Contact import finished: {job.succeeded} imported, {job.skipped} skipped, {job.failed} failed")
+        return {'imported': job.succeeded, 'skipped': job.skipped, 'failed': job.failed}
     
-    def export_contacts(self, user_data: Dict, book_id: str) -> str:
-        """Export contacts to vCard format"""
-        book = self._get_book(user_data, book_id)
+    def _import_card(self, client: caldav.DAVClient, store, book_url: str, job, position: int, data: str) -> None:
+        """Upload one imported card; cards with a UID already in the book are left alone"""
+        item = f"Card {position}"
         try:
-            valid_vcards = []
-            for obj in book.objects():
-                try:
-                    # Validate each vCard before including it
-                    vcard = vobject.readOne(obj.data)
-                    if hasattr(vcard, 'fn'):  # Only export valid vCards
-                        valid_vcards.append(obj.data)
-                except Exception as e:
-                    from ..utils.settings import log_error
-                    log_error(user_data.get('user_id', 'unknown'), f"Failed to parse contact during export: {str(e)}")
-                    continue
-            return '\n'.join(valid_vcards)
+            vcard = vobject.readOne(data)
+            if hasattr(vcard, 'uid') and vcard.uid.value:
+                item = str(vcard.uid.value)
+                if store.index.lookup(item):
+                    job.record(skipped=1)
+                    return
+            self._normalise_vcard(vcard)
+            # Ensure required fields
+            if not hasattr(vcard, 'fn'):
+                vcard.add('fn').value = 'Unknown Contact'
+            data = vcard.serialize()
+            
+            card_url = urljoin(book_url.rstrip('/') + '/', object_name(str(vcard.uid.value), 'vcf'))
+            etag = put_object(client, card_url, data, 'text/vcard', create=True)
+            store.put(card_url, etag, data)
+            job.record(succeeded=1)
+        except PreconditionFailedError:
+            job.record(skipped=1)
+        except Exception as e:
+            job.record(failed=1, item=item, error=str(e))
+    
+    def export_contacts(self, user_data: Dict, book_id: str, export_format: str = 'vcf') -> Iterator[str]:
+        """
+        Stream the address book as a .vcf file, or as JSON lines / CSV of the contact JSON.
+        Cards come from the synced local store, whose records double as validity flags
+        (cards without FN or that fail to parse have none), so nothing is parsed again.
+        """
+        if export_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unsupported export format: {export_format}")
+        client = self._get_client(user_data)
+        store = self._get_store(user_data, self._book_url(user_data))
+        try:
+            store.sync(client)
         except caldav.lib.error.DAVError as e:
-            raise ValueError(f"Failed to export contacts: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to export contacts: {str(e)}")
+        objects = store.snapshot()
+        
+        def generate() -> Iterator[str]:
+            if export_format == 'csv':
+                yield self._csv_row(CSV_FIELDS)
+            for offset in range(0, len(objects), Config.MULTIGET_BATCH_SIZE):
+                parts = []
+                for obj in objects[offset:offset + Config.MULTIGET_BATCH_SIZE]:
+                    if obj.record is None:
+                        continue  # Only export valid vCards
+                    if export_format == 'vcf':
+                        # Multiget data has its line endings normalised to LF by the XML parser
+                        parts.append(obj.data.replace('\r\n', '\n').rstrip('\n').replace('\n', '\r\n') + '\r\n')
+                    elif export_format == 'jsonl':
+                        parts.append(json.dumps(obj.record, ensure_ascii=False) + '\n')
+                    else:
+                        parts.append(self._csv_row([obj.record.get(field, '') for field in CSV_FIELDS]))
+                yield ''.join(parts)
+        
+        return generate()
+    
+    def _csv_row(self, values: List) -> str:
+        row = io.StringIO()
+        csv.writer(row).writerow(values)
+        return row.getvalue()
@@ -1,11 +1,17 @@
-from typing import Dict, Tuple, Optional, Union
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+from datetime import datetime, timedelta, timezone
+import hashlib
+import json
 import logging
+import re
 import threading
-import time
-from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import urlparse, urljoin
+from xml.etree import ElementTree
+from xml.sax.saxutils import escape
 
 import caldav
+import icalendar
 from caldav.davclient import DAVClient
 import requests
 from requests.auth import HTTPDigestAuth, HTTPBasicAuth
@@ -13,6 +19,11 @@ from requests.exceptions import ConnectionError, Timeout, SSLError
 from caldav.objects import Principal
 from urllib.parse import unquote
 from pathlib import Path
+from ..config.config import Config
+from ..utils.cache import TTLCache
+from .http_pool import get_http_pool
+from .ical_stream import unfold_lines
+from .resilience import bind_deadline
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -38,44 +49,72 @@ def normalize_url_path(path: str) -> str:
     parts = path.split('/')
     return '/' + '/'.join(filter(None, parts))
 
-def retry_on_connection_error(max_retries=3, delay=1):
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_error = None
-            for attempt in range(max_retries):
-                try:
-                    success, error_msg = func(*args, **kwargs)
-                    # Don't retry on validation errors, auth failures, or missing resources
-                    if success or any(x in str(error_msg) for x in [
-                        "Invalid server URL format",
-                        "Missing required fields",
-                        "Authentication failed",
-                        "not found",
-                        "path mismatch",
-                        "No calendars found"
-                    ]):
-                        return success, error_msg
-                    # Only retry on connection/timeout issues
-                    last_error = error_msg
-                    if attempt < max_retries - 1:
-                        error_msg += f". Retrying in {delay} seconds..."
-                        logger.error(error_msg)
-                        time.sleep(delay)
-                        continue
-                    break
-                except (ConnectionError, Timeout, SSLError, requests.exceptions.RequestException) as e:
-                    last_error = str(e)
-                    error_msg = f"Attempt {attempt + 1}/{max_retries} failed: {last_error}"
-                    if attempt < max_retries - 1:
-                        error_msg += f". Retrying in {delay} seconds..."
-                        logger.error(error_msg)
-                        time.sleep(delay)
-                        continue
-                    break
-            return False, f"All attempts failed. Last error: {last_error}"
-        return wrapper
-    return decorator
+# Only ask for cheap properties so the server never renders the collection contents
+COLLECTION_CHECK_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:" xmlns:cs="http://calendarserver.org/ns/">
+  <d:prop>
+    <d:resourcetype/>
+    <cs:getctag/>
+  </d:prop>
+</d:propfind>"""
+
+def check_collection(url: str, auth, verify_ssl) -> int:
+    """Check that a collection exists with a Depth-0 PROPFIND and return the HTTP status"""
+    response = get_http_pool().session_for(url).request(
+        'PROPFIND',
+        url,
+        data=COLLECTION_CHECK_BODY,
+        headers={'Depth': '0', 'Content-Type': 'application/xml; charset=utf-8'},
+        auth=auth,
+        verify=verify_ssl
+    )
+    return response.status_code
+
+def credentials_hash(settings: Dict) -> str:
+    """Stable hash of a baikal_credentials dict, used as a cache key"""
+    payload = json.dumps(settings or {}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def object_name(uid: str, extension: str) -> str:
+    """Resource name for an object, derived from its UID like most DAV clients do"""
+    if re.fullmatch(r'[A-Za-z0-9@._-]{1,200}', uid):
+        return f"{uid}.{extension}"
+    return f"{hashlib.sha1(uid.encode('utf-8')).hexdigest()}.{extension}"
+
+# Status of the last response this thread received over a pooled session. caldav raises
+# AuthorizationError for 401 and 403 alike, and only a 401 means the credentials are wrong.
+_last_status = threading.local()
+
+def _remember_status(response, *args, **kwargs):
+    _last_status.code = response.status_code
+
+class BaikalDAVClient(caldav.DAVClient):
+    """DAVClient that uses the shared connection pool and reports upstream authentication failures"""
+
+    # Called with no arguments when the server rejects our credentials
+    on_auth_error = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Share keep-alive connections with every other client talking to this host
+        self.session = get_http_pool().session_for(self.url)
+        if _remember_status not in self.session.hooks['response']:
+            self.session.hooks['response'].append(_remember_status)
+
+    def close(self):
+        # The pooled session outlives this client, so there is nothing to close
+        pass
+
+    def request(self, url, method="GET", body="", headers={}):
+        _last_status.code = None
+        try:
+            return super().request(url, method, body, headers)
+        except caldav.lib.error.AuthorizationError as e:
+            if _last_status.code == 403:
+                raise PermissionDeniedError(url=e.url, reason=e.reason) from e
+            if self.on_auth_error:
+                self.on_auth_error()
+            raise
 
 class BaikalClient:
     def __init__(self):
@@ -131,7 +170,7 @@ class BaikalClient:
                 auth = HTTPDigestAuth(settings['username'], settings['password'])
                 
             # Create a single client for verification and use
-            self.client = caldav.DAVClient(
+            self.client = BaikalDAVClient(
                 url=settings['serverUrl'],
                 auth=auth,
                 ssl_verify_cert=verify_ssl
@@ -142,86 +181,53 @@ class BaikalClient:
             principal = self.client.principal()
             logger.debug("Principal connection successful")
             
-            # Verify address book path first (simpler check)
-            logger.debug(f"Verifying address book path: {settings['addressBookPath']}")
-            abook_path = normalize_url_path(settings['addressBookPath'])
-            
-            # Use principal to get the root URL and verify paths
+            # Use principal to get the root URL and build both collection URLs
             root_url = str(principal.url)
             logger.debug(f"Principal root URL: {root_url}")
-            
-            # Verify addressbook path exists
-            try:
-                # Build the full URL properly based on the principal URL
-                principal_path = urlparse(root_url).path
-                base_path = principal_path.split('/principals/')[0]  # Get the base DAV path
-                abook_url = urljoin(settings['serverUrl'], base_path + abook_path)
-                
-                logger.debug(f"Checking address book URL: {abook_url}")
-                response = requests.get(abook_url, auth=auth, verify=verify_ssl)
-                
-                if response.status_code == 404:
-                    msg = f"Address book not found at: {settings['addressBookPath']}"
-                    logger.error(msg)
-                    self.client = None
-                    return False, msg
-                elif response.status_code == 401:
-                    msg = "Authentication failed for address book access"
-                    logger.error(msg)
-                    self.client = None
-                    return False, msg
-                elif response.status_code >= 400:
-                    msg = f"Error accessing address book: HTTP {response.status_code}"
+            principal_path = urlparse(root_url).path
+            base_path = principal_path.split('/principals/')[0]  # Get the base DAV path
+
+            abook_url = urljoin(settings['serverUrl'], base_path + normalize_url_path(settings['addressBookPath']))
+            calendar_url = urljoin(settings['serverUrl'], base_path + normalize_url_path(settings['calendarPath']))
+
+            # Check both paths at the same time; address book errors are still reported first
+            checks = [
+                ('address book', abook_url, settings['addressBookPath']),
+                ('calendar', calendar_url, settings['calendarPath'])
+            ]
+            with ThreadPoolExecutor(max_workers=len(checks)) as executor:
+                futures = [executor.submit(bind_deadline(check_collection), url, auth, verify_ssl) for _, url, _ in checks]
+
+            for (label, url, path), future in zip(checks, futures):
+                logger.debug(f"Checking {label} URL: {url}")
+                try:
+                    status = future.result()
+                except Exception as e:
+                    msg = f"Error accessing {label}: {str(e)}"
                     logger.error(msg)
                     self.client = None
                     return False, msg
-                    
-                logger.debug("Address book access verified")
-                
-            except Exception as e:
-                msg = f"Error accessing address book: {str(e)}"
-                logger.error(msg)
-                self.client = None
-                return False, msg
-            
-            # Now verify calendar path
-            logger.debug(f"Verifying calendar path: {settings['calendarPath']}")
-            calendar_path = normalize_url_path(settings['calendarPath'])
-            
-            # Use the same approach that worked for address books
-            try:
-                # Build the calendar URL using the same base path
-                calendar_url = urljoin(settings['serverUrl'], base_path + calendar_path)
-                
-                logger.debug(f"Checking calendar URL: {calendar_url}")
-                response = requests.get(calendar_url, auth=auth, verify=verify_ssl)
-                
-                if response.status_code == 404:
-                    msg = f"Calendar not found at: {settings['calendarPath']}"
+
+                if status == 404:
+                    msg = f"{label.capitalize()} not found at: {path}"
                     logger.error(msg)
                     self.client = None
                     return False, msg
-                elif response.status_code == 401:
-                    msg = "Authentication failed for calendar access"
+                elif status == 401:
+                    msg = f"Authentication failed for {label} access"
                     logger.error(msg)
                     self.client = None
                     return False, msg
-                elif response.status_code >= 400:
-                    msg = f"Error accessing calendar: HTTP {response.status_code}"
+                elif status >= 400:
+                    msg = f"Error accessing {label}: HTTP {status}"
                     logger.error(msg)
                     self.client = None
                     return False, msg
-                    
-                logger.debug("Calendar access verified")
-                logger.debug("All paths verified successfully")
-                
-                return True, None
-                
-            except Exception as e:
-                msg = f"Error accessing calendar: {str(e)}"
-                logger.error(msg)
-                self.client = None
-                return False, msg
+
+                logger.debug(f"{label.capitalize()} access verified")
+
+            logger.debug("All paths verified successfully")
+            return True, None
                 
         except caldav.lib.error.AuthorizationError as e:
             msg = f"Authentication failed: {str(e)}"
@@ -249,8 +255,554 @@ class BaikalClient:
             self.client = None
             return False, msg
             
+    def verify_connection_cached(self, settings: Dict) -> Tuple[bool, Optional[str]]:
+        """
+        verify_connection backed by the shared verification result cache.
+        A cached result does not initialize self.client.
+        """
+        cache = get_verification_cache()
+        if (result := cache.get(settings)) is not None:
+            logger.debug("Using cached connection verification result")
+            return result
+
+        result = self.verify_connection(settings)
+        cache.set(settings, result)
+        return result
+
     def get_client(self) -> Tuple[bool, Union[caldav.DAVClient, str]]:
         """Get the current client or create a new one"""
         if self.client:
             return True, self.client
-        return False, "Client not initialized" 
\ No newline at end of file
+        return False, "Client not initialized" 
+
+# XML namespaces used in WebDAV / CalDAV / CardDAV bodies
+DAV_NS = 'DAV:'
+CALDAV_NS = 'urn:ietf:params:xml:ns:caldav'
+CARDDAV_NS = 'urn:ietf:params:xml:ns:carddav'
+CS_NS = 'http://calendarserver.org/ns/'
+ICAL_NS = 'http://apple.com/ns/ical/'
+
+COLLECTION_STATE_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:" xmlns:cs="http://calendarserver.org/ns/">
+  <d:prop>
+    <cs:getctag/>
+    <d:sync-token/>
+  </d:prop>
+</d:propfind>"""
+
+COLLECTION_LISTING_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:">
+  <d:prop>
+    <d:resourcetype/>
+    <d:getetag/>
+  </d:prop>
+</d:propfind>"""
+
+SYNC_COLLECTION_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:sync-collection xmlns:d="DAV:">
+  <d:sync-token>{token}</d:sync-token>
+  <d:sync-level>1</d:sync-level>
+  <d:prop>
+    <d:getetag/>
+  </d:prop>
+</d:sync-collection>"""
+
+PRINCIPAL_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">
+  <d:prop>
+    <d:current-user-principal/>
+    <c:calendar-home-set/>
+  </d:prop>
+</d:propfind>"""
+
+CALENDAR_LIST_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<d:propfind xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav"
+            xmlns:cs="http://calendarserver.org/ns/" xmlns:ic="http://apple.com/ns/ical/">
+  <d:prop>
+    <d:resourcetype/>
+    <d:displayname/>
+    <cs:getctag/>
+    <ic:calendar-color/>
+    <c:supported-calendar-component-set/>
+  </d:prop>
+</d:propfind>"""
+
+FREE_BUSY_QUERY_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<c:free-busy-query xmlns:c="urn:ietf:params:xml:ns:caldav">
+  <c:time-range start="{start}" end="{end}"/>
+</c:free-busy-query>"""
+
+CALENDAR_MULTIGET_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<c:calendar-multiget xmlns:d="DAV:" xmlns:c="urn:ietf:params:xml:ns:caldav">
+  <d:prop>
+    <d:getetag/>
+    <c:calendar-data/>
+  </d:prop>
+  {hrefs}
+</c:calendar-multiget>"""
+
+ADDRESSBOOK_MULTIGET_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<card:addressbook-multiget xmlns:d="DAV:" xmlns:card="urn:ietf:params:xml:ns:carddav">
+  <d:prop>
+    <d:getetag/>
+    <card:address-data/>
+  </d:prop>
+  {hrefs}
+</card:addressbook-multiget>"""
+
+ADDRESSBOOK_QUERY_BODY = """<?xml version="1.0" encoding="utf-8"?>
+<card:addressbook-query xmlns:d="DAV:" xmlns:card="urn:ietf:params:xml:ns:carddav">
+  <d:prop>
+    <d:getetag/>
+    <card:address-data/>
+  </d:prop>
+  <card:filter test="anyof">
+    {filters}
+  </card:filter>
+</card:addressbook-query>"""
+
+TEXT_MATCH_FILTER = """<card:prop-filter name="{name}">
+      <card:text-match collation="i;unicode-casemap" match-type="contains">{text}</card:text-match>
+    </card:prop-filter>"""
+
+# REPORT body and the property holding the object data, per collection type
+MULTIGET_REPORTS = {
+    'calendar': (CALENDAR_MULTIGET_BODY, f'{{{CALDAV_NS}}}calendar-data'),
+    'addressbook': (ADDRESSBOOK_MULTIGET_BODY, f'{{{CARDDAV_NS}}}address-data')
+}
+
+class FreeBusyNotSupportedError(Exception):
+    """The server does not answer free-busy-query REPORTs for this calendar"""
+
+class InvalidSyncTokenError(Exception):
+    """The server no longer accepts our sync-token, a full listing is needed"""
+
+class PreconditionFailedError(ValueError):
+    """A conditional write failed because the object changed on the server (HTTP 412)"""
+
+class PermissionDeniedError(caldav.lib.error.DAVError):
+    """The server accepted our credentials but refused this request (HTTP 403)"""
+
+class DavItem(NamedTuple):
+    """One <response> of a multistatus body"""
+    url: str
+    status: int
+    props: Dict
+
+def _status_code(status_line: Optional[str]) -> int:
+    """Turn 'HTTP/1.1 404 Not Found' into 404"""
+    try:
+        return int(status_line.split()[1])
+    except (AttributeError, IndexError, ValueError):
+        return 0
+
+def dav_request(client: caldav.DAVClient, method: str, url: str, body: Optional[Union[str, bytes]] = None,
+                depth: Optional[int] = None, headers: Optional[Dict] = None) -> requests.Response:
+    """Send a raw WebDAV request with the client's pooled session and credentials"""
+    request_headers = {'Content-Type': 'application/xml; charset=utf-8'} if body else {}
+    if depth is not None:
+        request_headers['Depth'] = str(depth)
+    request_headers.update(headers or {})
+
+    response = client.session.request(
+        method,
+        str(url),
+        data=body.encode('utf-8') if isinstance(body, str) else body,
+        headers=request_headers,
+        auth=client.auth,
+        timeout=client.timeout,
+        verify=client.ssl_verify_cert,
+        cert=client.ssl_cert,
+        stream=True
+    )
+    # Only rejected credentials make the client unusable; a 403 is about this resource,
+    # and on REPORT usually means an expired sync-token, which the caller handles
+    if response.status_code == 401:
+        response.close()
+        if getattr(client, 'on_auth_error', None):
+            client.on_auth_error()
+        raise caldav.lib.error.AuthorizationError(url=str(url), reason=response.reason)
+    if response.status_code == 403 and method != 'REPORT':
+        response.close()
+        raise PermissionDeniedError(url=str(url), reason=response.reason)
+    return response
+
+class MultiStatus:
+    """Incremental parser for a 207 Multi-Status response; yields one DavItem per <response>"""
+
+    def __init__(self, response: requests.Response, base_url: str):
+        self.response = response
+        self.base_url = str(base_url)
+        self.sync_token = None
+
+    def __iter__(self) -> Iterator[DavItem]:
+        self.response.raw.decode_content = True
+        try:
+            depth = 0
+            for event, element in ElementTree.iterparse(self.response.raw, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    continue
+                depth -= 1
+                if element.tag == f'{{{DAV_NS}}}response':
+                    yield self._parse_response(element)
+                    # Free the parsed subtree, memory stays flat for huge listings
+                    element.clear()
+                elif element.tag == f'{{{DAV_NS}}}sync-token' and depth == 1:
+                    self.sync_token = (element.text or '').strip()
+        finally:
+            self.response.close()
+
+    def _parse_response(self, element) -> DavItem:
+        href = element.findtext(f'{{{DAV_NS}}}href', '').strip()
+        url = urljoin(self.base_url, href)
+        status = _status_code(element.findtext(f'{{{DAV_NS}}}status'))
+        props = {}
+        for propstat in element.findall(f'{{{DAV_NS}}}propstat'):
+            if _status_code(propstat.findtext(f'{{{DAV_NS}}}status')) != 200:
+                continue
+            status = status or 200
+            prop_element = propstat.find(f'{{{DAV_NS}}}prop')
+            for prop in (prop_element if prop_element is not None else []):
+                # Simple properties become text, structured ones keep their children
+                props[prop.tag] = list(prop) if len(prop) else (prop.text or '')
+        return DavItem(url, status, props)
+
+def _multistatus(client: caldav.DAVClient, method: str, url: str, body: str, depth: Optional[int],
+                 sync: bool = False) -> MultiStatus:
+    response = dav_request(client, method, url, body, depth=depth)
+    if response.status_code != 207:
+        response.close()
+        if sync and response.status_code in (403, 409, 412):
+            raise InvalidSyncTokenError(f"HTTP {response.status_code}")
+        raise caldav.lib.error.DAVError(f"{method} {url} failed: HTTP {response.status_code}")
+    return MultiStatus(response, url)
+
+def get_collection_state(client: caldav.DAVClient, url: str) -> Dict:
+    """Fetch getctag and sync-token of a collection with a single Depth-0 PROPFIND"""
+    for item in _multistatus(client, 'PROPFIND', url, COLLECTION_STATE_BODY, depth=0):
+        return {
+            'ctag': item.props.get(f'{{{CS_NS}}}getctag') or None,
+            'syncToken': item.props.get(f'{{{DAV_NS}}}sync-token') or None
+        }
+    return {'ctag': None, 'syncToken': None}
+
+def list_collection(client: caldav.DAVClient, url: str) -> Dict[str, str]:
+    """Map every member URL of a collection to its ETag"""
+    members = {}
+    collection_path = normalize_url_path(urlparse(str(url)).path)
+    for item in _multistatus(client, 'PROPFIND', url, COLLECTION_LISTING_BODY, depth=1):
+        if normalize_url_path(urlparse(item.url).path) == collection_path:
+            continue
+        if item.status == 200 and not item.props.get(f'{{{DAV_NS}}}resourcetype'):
+            members[item.url] = item.props.get(f'{{{DAV_NS}}}getetag', '')
+    return members
+
+def sync_collection(client: caldav.DAVClient, url: str, token: str) -> Tuple[Dict[str, str], List[str], Optional[str]]:
+    """
+    RFC 6578 sync-collection REPORT.
+    Returns (changed member URL -> ETag, deleted member URLs, new sync-token)
+    """
+    changed, deleted = {}, []
+    status = _multistatus(client, 'REPORT', url, SYNC_COLLECTION_BODY.format(token=escape(token or '')), depth=0,
+                          sync=True)
+    for item in status:
+        if item.status == 404:
+            deleted.append(item.url)
+        elif item.status == 200 and not item.props.get(f'{{{DAV_NS}}}resourcetype'):
+            changed[item.url] = item.props.get(f'{{{DAV_NS}}}getetag', '')
+    return changed, deleted, status.sync_token
+
+def fetch_objects(client: caldav.DAVClient, urls: List[str]) -> Iterator[Tuple[str, str, str]]:
+    """Download objects one by one, yielding (url, etag, data)"""
+    for url in urls:
+        response = dav_request(client, 'GET', url)
+        try:
+            if response.status_code == 404:
+                continue
+            if response.status_code >= 400:
+                raise caldav.lib.error.DAVError(f"GET {url} failed: HTTP {response.status_code}")
+            yield url, response.headers.get('ETag', ''), response.text
+        finally:
+            response.close()
+
+def _href_prop(item: DavItem, name: str) -> Optional[str]:
+    """Absolute URL of the first <href> inside a property such as current-user-principal"""
+    value = item.props.get(name)
+    if isinstance(value, list):
+        for child in value:
+            if child.tag == f'{{{DAV_NS}}}href' and (child.text or '').strip():
+                return urljoin(item.url, child.text.strip())
+    return None
+
+def find_calendar_home(client: caldav.DAVClient, url: str) -> Optional[str]:
+    """RFC 4791 discovery: calendar-home-set of the current user principal, starting from any URL we can read"""
+    for item in _multistatus(client, 'PROPFIND', url, PRINCIPAL_BODY, depth=0):
+        if home := _href_prop(item, f'{{{CALDAV_NS}}}calendar-home-set'):
+            return home
+        principal = _href_prop(item, f'{{{DAV_NS}}}current-user-principal')
+        if principal and normalize_url_path(urlparse(principal).path) != normalize_url_path(urlparse(str(url)).path):
+            return find_calendar_home(client, principal)
+    return None
+
+def list_calendars(client: caldav.DAVClient, home_url: str) -> List[Dict]:
+    """Calendars holding events directly below a calendar home"""
+    calendars = []
+    for item in _multistatus(client, 'PROPFIND', home_url, CALENDAR_LIST_BODY, depth=1):
+        resource_types = item.props.get(f'{{{DAV_NS}}}resourcetype')
+        if item.status != 200 or not isinstance(resource_types, list):
+            continue
+        if not any(child.tag == f'{{{CALDAV_NS}}}calendar' for child in resource_types):
+            continue
+        # Task-only calendars are left out; no component set means everything is supported
+        components = item.props.get(f'{{{CALDAV_NS}}}supported-calendar-component-set')
+        if isinstance(components, list) and components and \
+                not any(child.get('name', '').upper() == 'VEVENT' for child in components):
+            continue
+        calendars.append({
+            'url': item.url,
+            'name': item.props.get(f'{{{DAV_NS}}}displayname') or None,
+            'color': (item.props.get(f'{{{ICAL_NS}}}calendar-color') or '')[:7] or None,
+            'ctag': item.props.get(f'{{{CS_NS}}}getctag') or None
+        })
+    return calendars
+
+def free_busy_query(client: caldav.DAVClient, url: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """
+    RFC 4791 free-busy-query REPORT on one calendar.
+    Returns the busy periods (any FBTYPE except FREE) as UTC (start, end) pairs.
+    """
+    utc = lambda value: value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    body = FREE_BUSY_QUERY_BODY.format(start=utc(start), end=utc(end))
+    response = dav_request(client, 'REPORT', url, body, depth=1)
+    try:
+        content_type = response.headers.get('Content-Type', '')
+        if response.status_code != 200 or 'calendar' not in content_type:
+            raise FreeBusyNotSupportedError(f"HTTP {response.status_code}")
+        data = response.text
+    finally:
+        response.close()
+
+    periods = []
+    for line in unfold_lines(data.splitlines()):
+        name, _, value = line.partition(':')
+        params = name.upper().split(';')
+        if params[0] != 'FREEBUSY' or 'FBTYPE=FREE' in params:
+            continue
+        for period in value.split(','):
+            period_start, period_end = icalendar.prop.vPeriod.from_ical(period.strip())
+            if isinstance(period_end, timedelta):
+                period_end = period_start + period_end
+            periods.append((period_start.astimezone(timezone.utc), period_end.astimezone(timezone.utc)))
+    return periods
+
+def multiget(client: caldav.DAVClient, url: str, urls: List[str], report: str,
+             batch_size: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+    """
+    Download objects with calendar-multiget / addressbook-multiget REPORTs of at most
+    batch_size hrefs each, yielding (url, etag, data) while each response is parsed.
+    A batch the server refuses is downloaded object by object instead.
+    """
+    body, data_prop = MULTIGET_REPORTS[report]
+    batch_size = max(1, batch_size or Config.MULTIGET_BATCH_SIZE)
+    for offset in range(0, len(urls), batch_size):
+        batch = urls[offset:offset + batch_size]
+        hrefs = ''.join(f"<d:href>{escape(urlparse(str(member)).path)}</d:href>" for member in batch)
+        try:
+            status = _multistatus(client, 'REPORT', url, body.format(hrefs=hrefs), depth=1)
+        except caldav.lib.error.AuthorizationError:
+            raise
+        except caldav.lib.error.DAVError as e:
+            logger.warning(f"{report}-multiget on {url} failed ({str(e)}), fetching {len(batch)} objects one by one")
+            yield from fetch_objects(client, batch)
+            continue
+        for item in status:
+            data = item.props.get(data_prop)
+            if item.status == 200 and isinstance(data, str) and data:
+                yield item.url, item.props.get(f'{{{DAV_NS}}}getetag', ''), data
+
+def calendar_multiget(client: caldav.DAVClient, url: str, urls: List[str],
+                      batch_size: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+    """Download calendar objects in calendar-multiget batches, yielding (url, etag, data)"""
+    return multiget(client, url, urls, 'calendar', batch_size)
+
+def addressbook_multiget(client: caldav.DAVClient, url: str, urls: List[str],
+                         batch_size: Optional[int] = None) -> Iterator[Tuple[str, str, str]]:
+    """Download vCards in addressbook-multiget batches, yielding (url, etag, data)"""
+    return multiget(client, url, urls, 'addressbook', batch_size)
+
+def addressbook_query(client: caldav.DAVClient, url: str, text: str,
+                      properties: Iterable[str]) -> Iterator[Tuple[str, str, str]]:
+    """
+    RFC 6352 addressbook-query REPORT: the vCards where any of the properties contains text
+    (case-insensitive), filtered by the server and yielded as (url, etag, data) while parsed.
+    """
+    filters = ''.join(TEXT_MATCH_FILTER.format(name=escape(name), text=escape(text)) for name in properties)
+    data_prop = MULTIGET_REPORTS['addressbook'][1]
+    for item in _multistatus(client, 'REPORT', url, ADDRESSBOOK_QUERY_BODY.format(filters=filters), depth=1):
+        data = item.props.get(data_prop)
+        if item.status == 200 and isinstance(data, str) and data:
+            yield item.url, item.props.get(f'{{{DAV_NS}}}getetag', ''), data
+
+def get_object(client: caldav.DAVClient, url: str) -> Optional[Tuple[str, str]]:
+    """GET a single object, returning (etag, data) or None when it does not exist"""
+    response = dav_request(client, 'GET', url)
+    try:
+        if response.status_code == 404:
+            return None
+        if response.status_code >= 400:
+            raise caldav.lib.error.DAVError(f"GET {url} failed: HTTP {response.status_code}")
+        return response.headers.get('ETag', ''), response.text
+    finally:
+        response.close()
+
+def put_object(client: caldav.DAVClient, url: str, data: Union[str, bytes], content_type: str,
+               etag: Optional[str] = None, create: bool = False) -> str:
+    """
+    PUT an object, only overwriting the version we know about when etag is given,
+    or only if nothing exists at url yet when create is set; returns the new ETag
+    """
+    headers = {'Content-Type': f'{content_type}; charset=utf-8'}
+    if etag:
+        headers['If-Match'] = etag
+    elif create:
+        headers['If-None-Match'] = '*'
+    response = dav_request(client, 'PUT', url, data, headers=headers)
+    response.close()
+    if response.status_code == 412:
+        if create and not etag:
+            raise PreconditionFailedError('An object with this name already exists')
+        raise PreconditionFailedError('The object was changed on the server, reload and try again')
+    if response.status_code == 404:
+        raise ValueError('Object not found')
+    if response.status_code >= 400:
+        raise caldav.lib.error.DAVError(f"PUT {url} failed: HTTP {response.status_code}")
+    # Servers may omit the ETag when they rewrote the data; the next sync picks it up
+    return response.headers.get('ETag', '')
+
+def delete_object(client: caldav.DAVClient, url: str, etag: Optional[str] = None) -> None:
+    """DELETE an object, only if it still has the given ETag"""
+    response = dav_request(client, 'DELETE', url, headers={'If-Match': etag} if etag else None)
+    response.close()
+    if response.status_code == 412:
+        raise PreconditionFailedError('The object was changed on the server, reload and try again')
+    if response.status_code == 404:
+        raise ValueError('Object not found')
+    if response.status_code >= 400:
+        raise caldav.lib.error.DAVError(f"DELETE {url} failed: HTTP {response.status_code}")
+
+class VerificationCache:
+    """Recent verify_connection results; failures are kept for a shorter time than successes"""
+
+    def __init__(self, success_ttl: int = Config.VERIFY_CACHE_TTL,
+                 failure_ttl: int = Config.VERIFY_CACHE_FAILURE_TTL, max_size: int = 256):
+        self.success_ttl = success_ttl
+        self.failure_ttl = failure_ttl
+        self._results = TTLCache(max_size=max_size, ttl=success_ttl)
+
+    @staticmethod
+    def _key(settings: Dict) -> Tuple:
+        return (
+            settings.get('serverUrl'),
+            settings.get('username'),
+            credentials_hash(settings),
+            settings.get('addressBookPath'),
+            settings.get('calendarPath')
+        )
+
+    def get(self, settings: Dict) -> Optional[Tuple[bool, Optional[str]]]:
+        return self._results.get(self._key(settings))
+
+    def set(self, settings: Dict, result: Tuple[bool, Optional[str]]) -> None:
+        success, _ = result
+        self._results.set(self._key(settings), result, ttl=self.success_ttl if success else self.failure_ttl)
+
+    def clear(self) -> None:
+        self._results.clear()
+
+    def stats(self) -> Dict:
+        return self._results.stats()
+
+_verification_cache = None
+_verification_cache_lock = threading.Lock()
+
+def get_verification_cache() -> VerificationCache:
+    global _verification_cache
+    with _verification_cache_lock:
+        if _verification_cache is None:
+            _verification_cache = VerificationCache()
+        return _verification_cache
+
+class ClientRegistry:
+    """Per-user cache of verified DAV clients, keyed by a hash of the credentials"""
+
+    def __init__(self, max_size: int = Config.CLIENT_CACHE_SIZE, idle_ttl: int = Config.CLIENT_IDLE_TTL):
+        # Entries expire after idle_ttl seconds without use and are evicted LRU first
+        self._clients = TTLCache(max_size=max_size, ttl=idle_ttl, sliding=True)
+        # credentials hash -> [lock, requests holding or waiting for it]; only kept while a
+        # verification is in flight, so it stays as small as the number of concurrent logins
+        self._locks: Dict[str, list] = {}
+        self._locks_lock = threading.Lock()
+
+    def _acquire(self, key: str) -> None:
+        """One lock per credentials hash so a user is only verified once at a time"""
+        with self._locks_lock:
+            entry = self._locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        entry[0].acquire()
+
+    def _release(self, key: str) -> None:
+        with self._locks_lock:
+            entry = self._locks[key]
+            entry[0].release()
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    def get_client(self, settings: Dict) -> caldav.DAVClient:
+        """Return a verified client, running full verification only for new entries"""
+        key = credentials_hash(settings)
+        if (client := self._clients.get(key)) is not None:
+            return client
+
+        self._acquire(key)
+        try:
+            # Another request may have verified the same credentials meanwhile
+            if (client := self._clients.get(key)) is not None:
+                return client
+
+            logger.debug("No cached client for these credentials, verifying connection")
+            # Use a dedicated BaikalClient so concurrent verifications never share state
+            verifier = BaikalClient()
+            success, error_message = verifier.verify_connection(settings)
+            if not success:
+                raise ValueError(f'Connection failed: {error_message}')
+
+            success, client_or_error = verifier.get_client()
+            if not success:
+                raise ValueError(f'Failed to get client: {client_or_error}')
+
+            # Drop the entry as soon as the server rejects these credentials, unless it has
+            # already been replaced by a client verified since
+            client_or_error.on_auth_error = lambda: self._clients.pop_if(key, client_or_error)
+            self._clients.set(key, client_or_error)
+            return client_or_error
+        finally:
+            self._release(key)
+
+    def invalidate(self, settings: Dict) -> None:
+        """Forget the client for these credentials so the next call verifies again"""
+        self._clients.pop(credentials_hash(settings))
+
+    def stats(self) -> Dict:
+        return self._clients.stats()
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_client_registry() -> ClientRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ClientRegistry()
+        return _registry
@@ -1,18 +1,137 @@
-from typing import List, Dict, Optional
+from typing import Any, Callable, Iterator, List, Dict, Optional, Tuple, Union
 from datetime import datetime
+import hashlib
+import heapq
+import re
+import threading
 import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
 import icalendar
 import pytz
 import caldav
-from urllib.parse import urljoin
-from .baikal_client import BaikalClient
+from urllib.parse import unquote, urljoin, urlparse
+from .baikal_client import (
+    FreeBusyNotSupportedError, PreconditionFailedError, calendar_multiget, credentials_hash, delete_object,
+    find_calendar_home, free_busy_query, get_client_registry, get_collection_state, get_object, list_calendars,
+    list_collection, normalize_url_path, object_name, put_object
+)
+from .dav_store import get_collection_store
+from .jobs import run_bounded
+from .ical_stream import (
+    CalendarSplitter, PRODID, blocks_of, count_uids, fold_line, parse_event_fields, tzid_of, unfold_lines
+)
+from .prefetch import get_prefetcher, get_window_cache
+from .recurrence import expand_cached
+from .resilience import bind_deadline
+from ..config.config import Config
+from ..utils.cache import TTLCache
+from ..utils.http_cache import make_etag
+from ..utils.interval_index import IntervalIndex
+from ..utils.time_range import overlaps, to_utc
 from ..utils.settings import log_error
 
+# Properties that make an object recurring (expanded locally before range filtering)
+RECURRENCE_PATTERN = re.compile(r'^(RRULE|RDATE|RECURRENCE-ID)[;:]', re.MULTILINE)
+
+# Events that do not block time (free/busy), matched against the lines of one component
+TRANSPARENT_PATTERN = re.compile(r'^(TRANSP:TRANSPARENT|STATUS:CANCELLED)\s*$', re.MULTILINE)
+OVERRIDE_PATTERN = re.compile(r'^RECURRENCE-ID[;:]')
+
+def _master_transparent(data: str) -> bool:
+    """
+    Transparency of the master VEVENT (the first one when there are only overrides).
+    Overrides decide for their own instances during expansion, so a cancelled
+    instance does not free up the rest of the series.
+    """
+    vevents = [block for kind, block in blocks_of(data) if kind == 'VEVENT']
+    master = next((block for block in vevents if not any(OVERRIDE_PATTERN.match(line) for line in block)),
+                  vevents[0] if vevents else [])
+    return bool(TRANSPARENT_PATTERN.search('\n'.join(master)))
+
+def _event_weight(event: Dict) -> int:
+    """Approximate memory used by a cached event dict"""
+    return 64 * len(event) + sum(len(str(value)) for value in event.values())
+
+# Parsed events shared by every request in this worker; objects are immutable per
+# (URL, content) so entries never expire, they are only evicted LRU within the budget
+_event_cache = TTLCache(max_size=Config.EVENT_CACHE_SIZE, ttl=float('inf'),
+                        max_weight=Config.EVENT_CACHE_MAX_BYTES, weigher=_event_weight)
+
+def event_cache_stats() -> Dict:
+    return _event_cache.stats()
+
+# Calendars found in each user's calendar home: credentials hash -> {home, ctag, calendars}
+_calendar_lists = TTLCache(max_size=Config.CLIENT_CACHE_SIZE, ttl=Config.CALENDAR_LIST_TTL)
+
+# Merged busy intervals per (credentials, calendars, window), and which calendars answer free-busy-query
+_freebusy_cache = TTLCache(max_size=Config.FREEBUSY_CACHE_SIZE, ttl=Config.FREEBUSY_CACHE_TTL)
+_freebusy_support = TTLCache(max_size=Config.STORE_MAX_COLLECTIONS, ttl=3600)
+
+# Shared by every request, so a calendar that hangs cannot make a request wait for the pool to shut down
+_fanout_executor = ThreadPoolExecutor(max_workers=Config.FANOUT_WORKERS, thread_name_prefix='calendar-fanout')
+
+def _parse_range(start: str, end: str) -> Tuple[datetime, datetime]:
+    """Parse an ISO date range from the API into aware UTC datetimes"""
+    if not start or not end:
+        raise ValueError('Missing date range parameters')
+    try:
+        start_dt = datetime.fromisoformat(start)
+        end_dt = datetime.fromisoformat(end)
+    except ValueError as e:
+        raise ValueError(f"Invalid date format: {str(e)}")
+    # Convert to UTC if they have timezone info
+    start_dt = start_dt.astimezone(pytz.UTC) if start_dt.tzinfo else pytz.UTC.localize(start_dt)
+    end_dt = end_dt.astimezone(pytz.UTC) if end_dt.tzinfo else pytz.UTC.localize(end_dt)
+    return start_dt, end_dt
+
+def _merge_intervals(periods: List[Tuple[datetime, datetime]], start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Clip periods to [start, end) and merge the ones that overlap or touch"""
+    merged = []
+    for period_start, period_end in sorted(periods):
+        period_start, period_end = max(period_start, start), min(period_end, end)
+        if period_end <= period_start:
+            continue
+        if merged and period_start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], period_end))
+        else:
+            merged.append((period_start, period_end))
+    return merged
+
+class EventIndex:
+    """Range index over the records of one calendar store, maintained as sync applies changes"""
+
+    def __init__(self):
+        self.intervals = IntervalIndex()
+        # A recurring master's own DTSTART/DTEND say nothing about later instances
+        self.recurring: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def add(self, url: str, record: Dict) -> None:
+        with self._lock:
+            if record['recurring']:
+                self.intervals.discard(url)
+                self.recurring[url] = record
+            else:
+                self.recurring.pop(url, None)
+                self.intervals.add(url, record['start'], record['end'], record)
+
+    def discard(self, url: str) -> None:
+        with self._lock:
+            self.intervals.discard(url)
+            self.recurring.pop(url, None)
+
+    def query(self, start: datetime, end: datetime) -> Tuple[List[Dict], List[Dict]]:
+        """Single events overlapping [start, end) and every recurring record"""
+        with self._lock:
+            return self.intervals.search(start, end), list(self.recurring.values())
+
 class CalendarService:
     """Service for handling calendar operations"""
     
     def __init__(self):
-        self.baikal_client = BaikalClient()
+        self.clients = get_client_registry()
+        self.windows = get_window_cache()
+        self.prefetcher = get_prefetcher()
     
     def _get_client(self, user_data: Dict) -> caldav.DAVClient:
         if not user_data:
@@ -23,15 +142,8 @@ class CalendarService:
             raise ValueError('Missing Baikal credentials')
             
         try:
-            success, client_or_error = self.baikal_client.verify_connection(creds)
-            if not success:
-                raise ValueError(f'Connection failed: {client_or_error}')
-                
-            success, client_or_error = self.baikal_client.get_client()
-            if not success:
-                raise ValueError(f'Failed to get client: {client_or_error}')
-                
-            return client_or_error
+            # Reuses a verified client; full verification only runs for new credentials
+            return self.clients.get_client(creds)
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"DAV connection error: {str(e)}")
     
@@ -40,48 +152,85 @@ class CalendarService:
             raise ValueError('User data required')
         client = self._get_client(user_data)
         try:
-            # Get calendar path from user settings
-            creds = user_data.get('baikal_credentials', {})
-            calendar_path = creds.get('calendarPath', '/calendars/test/default/')
+            # Any discovered calendar can be addressed by its id, the configured one is the default
+            calendars = self._discover_calendars(user_data, client)
+            calendar_url = self._calendar_url(user_data, calendars, calendar_id)
             
             # Log the path we're trying to access
-            log_error(user_data.get('user_id', 'unknown'), f"Attempting to access calendar at path: {calendar_path}")
+            log_error(user_data.get('user_id', 'unknown'), f"Attempting to access calendar at: {calendar_url}")
             
             # Get the calendar directly using the URL
-            calendar_url = urljoin(creds.get('serverUrl', ''), calendar_path)
             calendar = client.calendar(url=calendar_url)
             
             if not calendar:
                 raise ValueError('Calendar not found')
             
-            # Log successful access
-            log_error(user_data.get('user_id', 'unknown'), f"Successfully accessed calendar at path: {calendar_path}")
             return calendar
         except caldav.lib.error.DAVError as e:
             log_error(user_data.get('user_id', 'unknown'), f"Failed to access calendar: {str(e)}")
             raise ValueError(f"Failed to access calendar: {str(e)}")
     
+    def _default_calendar_url(self, user_data: Dict) -> str:
+        """The calendar configured in the Baikal settings"""
+        creds = user_data.get('baikal_credentials', {})
+        calendar_path = creds.get('calendarPath', '/calendars/test/default/')
+        return urljoin(creds.get('serverUrl', ''), calendar_path)
+    
+    def _calendar_url(self, user_data: Dict, calendars: List[Dict], calendar_id: Optional[str]) -> str:
+        """URL of the requested calendar; unknown ids fall back to the configured calendar"""
+        if calendar_id:
+            wanted = normalize_url_path(unquote(urlparse(calendar_id).path))
+            for calendar in calendars:
+                if normalize_url_path(unquote(urlparse(calendar['url']).path)) == wanted:
+                    return calendar['url']
+        return self._default_calendar_url(user_data)
+    
+    def _discover_calendars(self, user_data: Dict, client: caldav.DAVClient) -> List[Dict]:
+        """
+        Every event calendar in the user's calendar home.
+        The list is cached and only fetched again when the home's CTag changes (or,
+        for servers without one, when CALENDAR_LIST_TTL runs out).
+        """
+        key = credentials_hash(user_data['baikal_credentials'])
+        cached = _calendar_lists.get(key)
+        if cached and not cached['ctag']:
+            return cached['calendars']
+        
+        default_url = self._default_calendar_url(user_data)
+        try:
+            home = cached['home'] if cached else find_calendar_home(client, default_url)
+            if not home:
+                raise ValueError('Server did not report a calendar home')
+            ctag = get_collection_state(client, home)['ctag']
+            if cached and ctag == cached['ctag']:
+                return cached['calendars']
+            calendars = list_calendars(client, home)
+            ttl = None
+        except (caldav.lib.error.DAVError, ValueError) as e:
+            # Discovery is optional; the configured calendar always works
+            log_error(user_data.get('user_id', 'unknown'), f"Calendar discovery failed: {str(e)}")
+            home, ctag, calendars = None, None, []
+            ttl = min(60, Config.CALENDAR_LIST_TTL)
+        
+        # The configured calendar is always offered, even if it lives outside the home
+        default_path = normalize_url_path(unquote(urlparse(default_url).path))
+        if not any(normalize_url_path(unquote(urlparse(c['url']).path)) == default_path for c in calendars):
+            calendars.insert(0, {'url': default_url, 'name': None, 'color': None, 'ctag': None})
+        
+        _calendar_lists.set(key, {'home': home, 'ctag': ctag, 'calendars': calendars}, ttl=ttl)
+        return calendars
+    
     def get_calendars(self, user_data: Dict) -> List[Dict]:
         """Get list of available calendars"""
         client = self._get_client(user_data)
         try:
-            # Get calendar path from user settings
-            creds = user_data.get('baikal_credentials', {})
-            calendar_path = creds.get('calendarPath', '/calendars/test/default/')
-            
-            # Get the calendar directly using the URL
-            calendar_url = urljoin(creds.get('serverUrl', ''), calendar_path)
-            calendar = client.calendar(url=calendar_url)
-            
-            if not calendar:
-                raise ValueError('Calendar not found')
-            
-            # Even if the calendar has no events, it's still a valid calendar
+            # Even if a calendar has no events, it's still a valid calendar
             return [{
-                'id': str(calendar.url),
-                'name': calendar.name or 'Calendar',
-                'url': str(calendar.url)
-            }]
+                'id': calendar['url'],
+                'name': calendar['name'] or 'Calendar',
+                'url': calendar['url'],
+                'color': calendar['color']
+            } for calendar in self._discover_calendars(user_data, client)]
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"Failed to fetch calendar: {str(e)}")
         except Exception as e:
@@ -118,58 +267,247 @@ class CalendarService:
         event.add_component(vevent)
         return event.to_ical()
     
-    def get_events(self, user_data: Dict, start: str, end: str, calendar_id: str = None) -> List[Dict]:
-        """Get events for a date range"""
-        if not start or not end:
-            raise ValueError('Missing date range parameters')
+    def get_events(self, user_data: Dict, start: str, end: str,
+                   calendar_id: Union[str, List[str], None] = None) -> Dict:
+        """
+        Get events for a date range from one, several or (by default) all calendars.
+        Calendars are queried in parallel; one that fails or is too slow is reported
+        in 'errors' while the events of the others are still returned.
+        """
+        start_dt, end_dt = _parse_range(start, end)
         
-        calendar = self._get_calendar(user_data, calendar_id)
-        if not calendar:
-            return []
-            
+        # Log the date range we're querying
+        log_error(user_data.get('user_id', 'unknown'), f"Fetching events from {start_dt} to {end_dt}")
+        
+        client = self._get_client(user_data)
+        urls = self._selected_calendars(user_data, client, calendar_id)
+        per_calendar, errors = self._fan_out(user_data, client, urls, self._calendar_events, start_dt, end_dt)
+        if errors and not per_calendar:
+            raise ValueError(f"Failed to fetch events: {errors[0]['error']}")
+        
+        # Every calendar's list is already sorted, so a merge keeps start-time order
+        results = list(heapq.merge(*per_calendar, key=lambda event: to_utc(event['start'])))
+        
+        # Log the number of events found
+        log_error(user_data.get('user_id', 'unknown'), f"Found {len(results)} events in {len(urls)} calendars")
+        return {'events': results, 'errors': errors}
+    
+    def events_etag(self, user_data: Dict, start: str, end: str,
+                    calendar_id: Union[str, List[str], None] = None) -> Optional[str]:
+        """
+        Validator for get_events, built from the CTag / sync-token of every selected calendar.
+        Costs one Depth-0 PROPFIND per calendar and no listing; None when a calendar has neither.
+        Call it before get_events: get_events syncs every store, so its body is never older than this state.
+        """
+        start_dt, end_dt = _parse_range(start, end)
+        client = self._get_client(user_data)
+        urls = self._selected_calendars(user_data, client, calendar_id)
+        futures = [_fanout_executor.submit(bind_deadline(get_collection_state), client, url) for url in urls]
+        done, _ = wait(futures, timeout=Config.FANOUT_TIMEOUT)
+        
+        parts = ['events', credentials_hash(user_data['baikal_credentials']), start_dt.isoformat(), end_dt.isoformat()]
+        for url, future in sorted(zip(urls, futures), key=lambda pair: pair[0]):
+            if future not in done or future.exception():
+                return None
+            state = future.result()
+            if not state['ctag'] and not state['syncToken']:
+                return None
+            parts.extend((url, state['ctag'], state['syncToken']))
+        return make_etag(*parts)
+    
+    def _selected_calendars(self, user_data: Dict, client: caldav.DAVClient,
+                            calendar_id: Union[str, List[str], None]) -> List[str]:
+        """URLs of the requested calendars, or of every discovered calendar"""
         try:
-            # Parse dates and ensure they're in UTC
-            start_dt = datetime.fromisoformat(start)
-            end_dt = datetime.fromisoformat(end)
-            
-            # Convert to UTC if they have timezone info
-            if start_dt.tzinfo:
-                start_dt = start_dt.astimezone(pytz.UTC)
-            else:
-                start_dt = pytz.UTC.localize(start_dt)
-                
-            if end_dt.tzinfo:
-                end_dt = end_dt.astimezone(pytz.UTC)
+            calendars = self._discover_calendars(user_data, client)
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to fetch calendars: {str(e)}")
+        ids = [calendar_id] if isinstance(calendar_id, str) else list(calendar_id or [])
+        if not ids:
+            return [calendar['url'] for calendar in calendars]
+        return list(dict.fromkeys(self._calendar_url(user_data, calendars, i) for i in ids))
+    
+    def _fan_out(self, user_data: Dict, client: caldav.DAVClient, urls: List[str],
+                 query: Callable, start_dt: datetime, end_dt: datetime) -> Tuple[List, List[Dict]]:
+        """
+        Run query(user_data, calendar, start, end) for every calendar in parallel.
+        The wait is bounded by the slowest calendar or FANOUT_TIMEOUT; returns (results, errors).
+        """
+        futures = {
+            _fanout_executor.submit(bind_deadline(query), user_data, client.calendar(url=url), start_dt, end_dt): url
+            for url in urls
+        }
+        done, _ = wait(futures, timeout=Config.FANOUT_TIMEOUT)
+        
+        results, errors = [], []
+        for future, url in futures.items():
+            if future not in done:
+                errors.append({'calendarId': url, 'error': 'The calendar did not answer in time'})
+            elif error := future.exception():
+                log_error(user_data.get('user_id', 'unknown'), f"Failed to query {url}: {str(error)}")
+                errors.append({'calendarId': url, 'error': str(error)})
             else:
-                end_dt = pytz.UTC.localize(end_dt)
-            
-            # Log the date range we're querying
-            log_error(user_data.get('user_id', 'unknown'), f"Fetching events from {start_dt} to {end_dt}")
+                results.append(future.result())
+        return results, errors
+    
+    def get_freebusy(self, user_data: Dict, start: str, end: str,
+                     calendar_id: Union[str, List[str], None] = None) -> Dict:
+        """
+        Merged busy intervals of one, several or all calendars, without any event details.
+        Uses the server's free-busy-query where available, the local event index otherwise.
+        """
+        start_dt, end_dt = _parse_range(start, end)
+        if end_dt <= start_dt:
+            raise ValueError('The end of the range must be after its start')
+        
+        client = self._get_client(user_data)
+        urls = self._selected_calendars(user_data, client, calendar_id)
+        key = (credentials_hash(user_data['baikal_credentials']), tuple(urls), start_dt, end_dt)
+        if (cached := _freebusy_cache.get(key)) is not None:
+            return cached
+        
+        per_calendar, errors = self._fan_out(user_data, client, urls, self._calendar_busy, start_dt, end_dt)
+        if errors and not per_calendar:
+            raise ValueError(f"Failed to fetch free/busy information: {errors[0]['error']}")
+        
+        busy = _merge_intervals([period for periods in per_calendar for period in periods], start_dt, end_dt)
+        result = {
+            'start': start_dt.isoformat(),
+            'end': end_dt.isoformat(),
+            'busy': [[period_start.isoformat(), period_end.isoformat()] for period_start, period_end in busy],
+            'errors': errors
+        }
+        # Partial answers are not cached, the failing calendar may answer on the next try
+        if not errors:
+            _freebusy_cache.set(key, result)
+        return result
+    
+    def _calendar_busy(self, user_data: Dict, calendar: caldav.Calendar, start_dt: datetime, end_dt: datetime) -> List[Tuple[datetime, datetime]]:
+        """Busy periods of one calendar, from the server when it supports free-busy-query"""
+        url = str(calendar.url)
+        if _freebusy_support.get(url) is not False:
+            try:
+                periods = free_busy_query(calendar.client, url, start_dt, end_dt)
+                _freebusy_support.set(url, True)
+                return periods
+            except FreeBusyNotSupportedError as e:
+                log_error(user_data.get('user_id', 'unknown'), f"No free-busy-query on {url} ({str(e)}), using local events")
+                _freebusy_support.set(url, False)
+        
+        # Computed from the local store and its interval index
+        store = self._get_store(user_data, calendar)
+        try:
+            store.sync(calendar.client)
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to fetch events: {str(e)}")
+        return self._store_busy(user_data, calendar, store, start_dt, end_dt)
+    
+    def _store_busy(self, user_data: Dict, calendar: caldav.Calendar, store, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        """Busy periods of [start, end) from the local store; transparency is decided per instance"""
+        singles, recurring = store.index.query(start, end)
+        periods = [(record['start'], record['end']) for record in singles if not record['transparent']]
+        try:
+            for record in recurring:
+                periods.extend((to_utc(occurrence.start), to_utc(occurrence.end))
+                               for occurrence in expand_cached(record['event']['id'], record['data'], start, end)
+                               if not occurrence.transparent)
+            return periods
+        except Exception as e:
+            # Server-expanded instances come back one per object, each with its own TRANSP / STATUS
+            log_error(user_data.get('user_id', 'unknown'), f"Local recurrence expansion failed, using server: {str(e)}")
+            periods = []
+            for event in calendar.date_search(start=start, end=end, expand=True, compfilter="VEVENT"):
+                if not _master_transparent(event.data):
+                    event_json = self._event_to_json(event)
+                    periods.append((to_utc(event_json['start']), to_utc(event_json['end'])))
+            return periods
+    
+    def _calendar_events(self, user_data: Dict, calendar: caldav.Calendar, start_dt: datetime, end_dt: datetime) -> List[Dict]:
+        """Events of one calendar for [start_dt, end_dt), sorted by start"""
+        try:
+            # Bring the local copy up to date first; only changed objects are downloaded and an
+            # unchanged calendar costs one PROPFIND. A change bumps the store generation, so a
+            # window read before it is never served under the ETag of the newer state.
+            store = self._get_store(user_data, calendar)
+            store.sync(calendar.client)
             
+            # Ranges served or prefetched moments ago are reused without querying the index again
+            owner = (credentials_hash(user_data['baikal_credentials']), str(calendar.url))
+            if (window := self.windows.get(owner, store.generation, start_dt, end_dt)) is not None:
+                results = [event for event in window
+                           if overlaps(to_utc(event['start']), to_utc(event['end']), start_dt, end_dt)]
+            else:
+                results = self._query_store(user_data, calendar, store, start_dt, end_dt)
+                self.windows.put(owner, store.generation, start_dt, end_dt, results)
+            self._prefetch_adjacent(user_data, calendar, store, owner, start_dt, end_dt)
+            return results
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to fetch events: {str(e)}")
+    
+    def _query_store(self, user_data: Dict, calendar: caldav.Calendar, store, start: datetime, end: datetime) -> List[Dict]:
+        """Events of [start, end) from the local store, sorted by start"""
+        singles, recurring = store.index.query(start, end)
+        try:
+            matches = [record['event'] for record in singles]
+            for record in recurring:
+                # Recurring events are expanded locally from the cached master
+                matches.extend(self._expand_record(record, start, end))
+            return sorted(matches, key=lambda event: to_utc(event['start']))
+        except Exception as e:
+            # Let the server expand anything we cannot handle locally
+            log_error(user_data.get('user_id', 'unknown'), f"Local recurrence expansion failed, using server: {str(e)}")
             events = calendar.date_search(
-                start=start_dt,
-                end=end_dt,
+                start=start,
+                end=end,
                 expand=True,
-                comp_filter="VEVENT"  # Explicitly request only events
+                compfilter="VEVENT"  # Explicitly request only events
             )
+            return [self._event_to_json(event) for event in events]
+    
+    def _prefetch_adjacent(self, user_data: Dict, calendar: caldav.Calendar, store, owner, start: datetime, end: datetime) -> None:
+        """Warm the window cache with the previous and next range while the user looks at this one"""
+        # Slightly wider than the current range, so a following month that is a day longer still fits
+        span = (end - start) * 1.25
+        for window_start, window_end in ((start - span, start), (end, end + span)):
+            if self.windows.covers(owner, store.generation, window_start, window_end):
+                continue
             
-            # Log the number of events found
-            log_error(user_data.get('user_id', 'unknown'), f"Found {len(events)} events")
+            def task(window_start=window_start, window_end=window_end):
+                # The store was synced by the request that scheduled us; a change made since
+                # bumps its generation and the window is simply not reused
+                generation = store.generation
+                events = self._query_store(user_data, calendar, store, window_start, window_end)
+                self.windows.put(owner, generation, window_start, window_end, events)
             
-            return [self._event_to_json(event) for event in events]
-        except caldav.lib.error.DAVError as e:
-            log_error(user_data.get('user_id', 'unknown'), f"Failed to fetch events: {str(e)}")
-            raise ValueError(f"Failed to fetch events: {str(e)}")
-        except ValueError as e:
-            raise ValueError(f"Invalid date format: {str(e)}")
+            self.prefetcher.submit(owner[0], (owner, window_start, window_end), task)
     
     def _event_to_json(self, event: caldav.Event) -> Dict:
+        return self._ical_to_json(event.data, str(event.url), str(event.parent.url))
+    
+    def _ical_to_json(self, data: str, event_url: str, calendar_url: str) -> Dict:
+        # Unchanged objects are never parsed twice
+        raw = data.encode('utf-8') if isinstance(data, str) else data
+        key = (event_url, calendar_url, hashlib.sha1(raw).hexdigest())
+        if (cached := _event_cache.get(key)) is not None:
+            return dict(cached)
+        
+        event = self._parse_event(data, event_url, calendar_url)
+        _event_cache.set(key, event)
+        return dict(event)
+    
+    def _parse_event(self, data: str, event_url: str, calendar_url: str) -> Dict:
         try:
-            vcal = icalendar.Calendar.from_ical(event.data)
-            vevent = next(comp for comp in vcal.walk() if comp.name == 'VEVENT')
-            
-            start = vevent.get('dtstart').dt
-            end = vevent.get('dtend', vevent.get('dtstart')).dt
+            # Plain events are read line by line; anything unusual goes through icalendar
+            text = data.decode('utf-8') if isinstance(data, bytes) else data
+            if (fields := parse_event_fields(text)) is not None:
+                start, end = fields['start'], fields['end']
+                vevent = fields
+            else:
+                vcal = icalendar.Calendar.from_ical(data)
+                vevent = next(comp for comp in vcal.walk() if comp.name == 'VEVENT')
+                
+                start = vevent.get('dtstart').dt
+                end = vevent.get('dtend', vevent.get('dtstart')).dt
             
             # Handle both datetime and date objects
             if isinstance(start, datetime):
@@ -180,18 +518,67 @@ class CalendarService:
                 all_day = True
             
             return {
-                'id': str(event.url),
+                'id': event_url,
                 'title': str(vevent.get('summary', '')),
                 'description': str(vevent.get('description', '')),
                 'start': start.isoformat(),
                 'end': end.isoformat(),
                 'allDay': all_day,
                 'color': str(vevent.get('color', 'blue')),
-                'calendarId': str(event.calendar.url)
+                'calendarId': calendar_url
             }
         except Exception as e:
             raise ValueError(f"Failed to parse event data: {str(e)}")
     
+    def _expand_record(self, record: Dict, start: datetime, end: datetime) -> List[Dict]:
+        """Instances of a stored recurring object inside [start, end), as event JSON"""
+        events = []
+        for occurrence in expand_cached(record['event']['id'], record['data'], start, end):
+            component = occurrence.component
+            event = dict(record['event'])
+            event.update({
+                'title': str(component.get('summary', '')),
+                'description': str(component.get('description', '')),
+                'start': occurrence.start.isoformat(),
+                'end': occurrence.end.isoformat(),
+                'allDay': occurrence.all_day,
+                'color': str(component.get('color', 'blue'))
+            })
+            events.append(event)
+        return events
+    
+    def _get_store(self, user_data: Dict, calendar: caldav.Calendar):
+        """Local copy of a calendar for this user"""
+        return get_collection_store(user_data['baikal_credentials'], str(calendar.url),
+                                    self._event_parser(str(calendar.url)), EventIndex, calendar_multiget)
+    
+    def _event_url(self, calendar: caldav.Calendar, event_id: str) -> str:
+        """Event ids are object URLs; only accept ones inside the user's calendar"""
+        event_url, calendar_url = urlparse(event_id or ''), urlparse(str(calendar.url))
+        calendar_path = unquote(calendar_url.path).rstrip('/') + '/'
+        if event_url.netloc != calendar_url.netloc or not unquote(event_url.path).startswith(calendar_path):
+            raise ValueError('Event not found')
+        return event_id
+    
+    def _event_parser(self, calendar_url: str) -> Callable[[str, str], Any]:
+        """Build the record kept in the local calendar store for each object"""
+        def parse(event_url: str, data: str) -> Optional[Dict]:
+            if 'BEGIN:VEVENT' not in data:
+                return None  # Tasks, journals ...
+            event = self._ical_to_json(data, event_url, calendar_url)
+            recurring = bool(RECURRENCE_PATTERN.search(data))
+            return {
+                'event': event,
+                # Transparent events do not make the user busy
+                'transparent': _master_transparent(data),
+                'start': to_utc(event['start']),
+                'end': to_utc(event['end']),
+                'recurring': recurring,
+                # Recurring objects keep their source for local expansion
+                'data': data if recurring else None
+            }
+        return parse
+    
     def create_event(self, user_data: Dict, calendar_id: str, event_data: Dict) -> Dict:
         """Create a new calendar event"""
         calendar = self._get_calendar(user_data, calendar_id)
@@ -199,20 +586,10 @@ class CalendarService:
             raise ValueError('Calendar not found')
             
         try:
-            start = datetime.fromisoformat(event_data['start'])
-            end = datetime.fromisoformat(event_data['end'])
-            
-            event = calendar.add_event(
-                ical=self._make_event(
-                    title=event_data.get('title', ''),
-                    start=start,
-                    end=end,
-                    description=event_data.get('description', ''),
-                    all_day=event_data.get('allDay', False),
-                    color=event_data.get('color', 'blue')
-                )
-            )
-            return self._event_to_json(event)
+            event, _ = self._create(calendar, self._get_store(user_data, calendar), event_data)
+            return event
+        except PreconditionFailedError:
+            raise
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"Failed to create event: {str(e)}")
         except Exception as e:
@@ -225,29 +602,10 @@ class CalendarService:
             raise ValueError('Calendar not found')
             
         try:
-            for event in calendar.events():
-                if str(event.url) == event_id:
-                    # Get existing event data to preserve UID
-                    existing_vcal = icalendar.Calendar.from_ical(event.data)
-                    existing_vevent = next(comp for comp in existing_vcal.walk() if comp.name == 'VEVENT')
-                    existing_uid = str(existing_vevent.get('uid'))
-                    
-                    start = datetime.fromisoformat(event_data['start'])
-                    end = datetime.fromisoformat(event_data['end'])
-                    
-                    event.data = self._make_event(
-                        title=event_data.get('title', ''),
-                        start=start,
-                        end=end,
-                        description=event_data.get('description', ''),
-                        all_day=event_data.get('allDay', False),
-                        color=event_data.get('color', 'blue'),
-                        uid=existing_uid
-                    )
-                    event.save()
-                    return self._event_to_json(event)
-                    
-            raise ValueError('Event not found')
+            event, _ = self._update(calendar, self._get_store(user_data, calendar), event_id, event_data)
+            return event
+        except PreconditionFailedError:
+            raise
         except caldav.lib.error.DAVError as e:
             raise ValueError(f"Failed to update event: {str(e)}")
         except Exception as e:
@@ -260,18 +618,211 @@ class CalendarService:
             raise ValueError('Calendar not found')
             
         try:
-            # Find the event
-            event = None
-            for obj in calendar.objects():
-                if str(obj.url) == event_id:
-                    event = obj
-                    break
-                    
-            if not event:
-                raise ValueError('Event not found')
-            
-            # Delete the event
-            event.delete()
+            self._delete(calendar, self._get_store(user_data, calendar), event_id)
             return {'message': 'Event deleted'}
         except caldav.lib.error.DAVError as e:
-            raise ValueError(f"Failed to delete event: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"Failed to delete event: {str(e)}")
+    
+    def batch_events(self, user_data: Dict, calendar_id: str, operations: List[Dict]) -> List[Dict]:
+        """
+        Apply a list of create/update/delete operations to one calendar.
+        Writes run in parallel, except that operations on the same event keep their order.
+        Every operation gets its own result; one failing does not stop the others.
+        """
+        if not isinstance(operations, list) or not operations:
+            raise ValueError('No operations given')
+        if len(operations) > Config.BATCH_MAX_OPERATIONS:
+            raise ValueError(f"Too many operations (at most {Config.BATCH_MAX_OPERATIONS} per batch)")
+        
+        # Resolve the calendar and its store once for the whole batch
+        calendar = self._get_calendar(user_data, calendar_id)
+        if not calendar:
+            raise ValueError('Calendar not found')
+        store = self._get_store(user_data, calendar)
+        
+        groups: Dict[Any, List[int]] = {}
+        for position, operation in enumerate(operations):
+            target = operation.get('id') if isinstance(operation, dict) else None
+            groups.setdefault(target or position, []).append(position)
+        
+        results: List[Optional[Dict]] = [None] * len(operations)
+        def run(positions: List[int]) -> None:
+            for position in positions:
+                results[position] = self._apply_operation(calendar, store, position, operations[position])
+        
+        workers = max(1, min(Config.BATCH_WORKERS, len(groups)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(bind_deadline(run), groups.values()))
+        
+        failed = sum(1 for result in results if result['status'] >= 400)
+        log_error(user_data.get('user_id', 'unknown'), f"Batch of {len(operations)} event operations, {failed} failed")
+        return results
+    
+    def _apply_operation(self, calendar: caldav.Calendar, store, position: int, operation: Dict) -> Dict:
+        """Run one batch operation and describe its outcome"""
+        op = operation.get('op') if isinstance(operation, dict) else None
+        result = {'index': position, 'op': op}
+        try:
+            if op == 'create':
+                event, etag = self._create(calendar, store, operation.get('event') or {})
+                result.update({'status': 201, 'id': event['id'], 'etag': etag, 'event': event})
+            elif op == 'update':
+                event, etag = self._update(calendar, store, operation.get('id'), operation.get('event') or {},
+                                           operation.get('etag'))
+                result.update({'status': 200, 'id': event['id'], 'etag': etag, 'event': event})
+            elif op == 'delete':
+                self._delete(calendar, store, operation.get('id'), operation.get('etag'))
+                result.update({'status': 200, 'id': operation.get('id')})
+            else:
+                raise ValueError("Operation must be 'create', 'update' or 'delete'")
+        except PreconditionFailedError as e:
+            result.update({'status': 409, 'id': operation.get('id'), 'error': str(e)})
+        except (KeyError, ValueError) as e:
+            status = 404 if str(e) == 'Event not found' else 400
+            result.update({'status': status, 'id': operation.get('id') if op else None,
+                           'error': f"Missing field {e}" if isinstance(e, KeyError) else str(e)})
+        except Exception as e:
+            result.update({'status': 500, 'id': operation.get('id') if op else None, 'error': str(e)})
+        return result
+    
+    def import_events(self, user_data: Dict, calendar_id: str, path: str, job) -> Dict:
+        """
+        Import an uploaded .ics file as a background job.
+        The file is read one UID at a time and uploaded through a bounded pool. Memory use is
+        O(distinct UIDs) for the per-UID component counts, plus the component groups not yet
+        complete: the largest group when each UID is contiguous, more when UIDs interleave.
+        """
+        calendar = self._get_calendar(user_data, calendar_id)
+        if not calendar:
+            raise ValueError('Calendar not found')
+        store = self._get_store(user_data, calendar)
+        
+        # A first pass finds how many components share each UID, wherever they are in the file
+        with open(path, 'rb') as f:
+            uid_counts = count_uids(f)
+        job.add_total(sum(uid_counts.values()))
+        
+        with open(path, 'rb') as f:
+            run_bounded(job, CalendarSplitter(unfold_lines(f), uid_counts),
+                        lambda group: self._import_object(calendar, store, job, *group))
+        
+        log_error(user_data.get('user_id', 'unknown'),
+                  f"Calendar import finished: {job.succeeded} imported, {job.skipped} skipped, {job.failed} failed")
+        return {'imported': job.succeeded, 'skipped': job.skipped, 'failed': job.failed}
+    
+    def _import_object(self, calendar: caldav.Calendar, store, job, uid: str, data: str, components: int) -> None:
+        """Upload one imported object; existing objects with the same UID are left alone"""
+        event_url = urljoin(str(calendar.url).rstrip('/') + '/', object_name(uid, 'ics'))
+        try:
+            etag = put_object(calendar.client, event_url, data, 'text/calendar', create=True)
+            store.put(event_url, etag, data)
+            job.record(succeeded=components)
+        except PreconditionFailedError:
+            job.record(skipped=components)
+        except Exception as e:
+            job.record(failed=components, item=uid, error=str(e))
+    
+    def export_events(self, user_data: Dict, calendar_id: str) -> Iterator[str]:
+        """
+        Stream a calendar as one .ics file.
+        Objects are downloaded in calendar-multiget chunks, so only one chunk is in memory at a time.
+        """
+        calendar = self._get_calendar(user_data, calendar_id)
+        if not calendar:
+            raise ValueError('Calendar not found')
+        try:
+            members = list(list_collection(calendar.client, str(calendar.url)))
+        except caldav.lib.error.DAVError as e:
+            raise ValueError(f"Failed to export calendar: {str(e)}")
+        
+        def generate() -> Iterator[str]:
+            yield f"BEGIN:VCALENDAR\r\nVERSION:2.0\r\nPRODID:{PRODID}\r\nCALSCALE:GREGORIAN\r\n"
+            timezones = set()
+            for offset in range(0, len(members), Config.MULTIGET_BATCH_SIZE):
+                chunk = members[offset:offset + Config.MULTIGET_BATCH_SIZE]
+                parts = []
+                for _, _, data in calendar_multiget(calendar.client, str(calendar.url), chunk):
+                    for kind, block in blocks_of(data):
+                        if kind == 'VTIMEZONE':
+                            # Every timezone definition is written once
+                            if (tzid := tzid_of(block)) in timezones:
+                                continue
+                            timezones.add(tzid)
+                        parts.extend(fold_line(line) for line in block)
+                yield ''.join(parts)
+            yield "END:VCALENDAR\r\n"
+        
+        return generate()
+    
+    def _create(self, calendar: caldav.Calendar, store, event_data: Dict) -> Tuple[Dict, str]:
+        """PUT a new event into the calendar; returns its JSON and ETag"""
+        uid = str(uuid.uuid4())
+        data = self._make_event(
+            title=event_data.get('title', ''),
+            start=datetime.fromisoformat(event_data['start']),
+            end=datetime.fromisoformat(event_data['end']),
+            description=event_data.get('description', ''),
+            all_day=event_data.get('allDay', False),
+            color=event_data.get('color', 'blue'),
+            uid=uid
+        ).decode('utf-8')
+        
+        event_url = urljoin(str(calendar.url).rstrip('/') + '/', f"{uid}.ics")
+        # Never overwrite an existing object by accident
+        etag = put_object(calendar.client, event_url, data, 'text/calendar', create=True)
+        store.put(event_url, etag, data)
+        return self._ical_to_json(data, event_url, str(calendar.url)), etag
+    
+    def _update(self, calendar: caldav.Calendar, store, event_id: str, event_data: Dict,
+                etag: Optional[str] = None) -> Tuple[Dict, str]:
+        """PUT new data over an event, guarded by its ETag; returns the event JSON and new ETag"""
+        event_url = self._event_url(calendar, event_id)
+        
+        # Use the cached copy when we have one, otherwise fetch just this event
+        if stored := store.get(event_url):
+            current_etag, data = stored.etag, stored.data
+        elif fetched := get_object(calendar.client, event_url):
+            current_etag, data = fetched
+        else:
+            raise ValueError('Event not found')
+        
+        # Get existing event data to preserve UID
+        existing_vcal = icalendar.Calendar.from_ical(data)
+        existing_vevent = next(comp for comp in existing_vcal.walk() if comp.name == 'VEVENT')
+        existing_uid = str(existing_vevent.get('uid'))
+        
+        start = datetime.fromisoformat(event_data['start'])
+        end = datetime.fromisoformat(event_data['end'])
+        
+        new_data = self._make_event(
+            title=event_data.get('title', ''),
+            start=start,
+            end=end,
+            description=event_data.get('description', ''),
+            all_day=event_data.get('allDay', False),
+            color=event_data.get('color', 'blue'),
+            uid=existing_uid
+        ).decode('utf-8')
+        
+        # Only overwrite the version we read (or the caller saw); a concurrent change gives a 412
+        try:
+            new_etag = put_object(calendar.client, event_url, new_data, 'text/calendar', etag=etag or current_etag)
+        except PreconditionFailedError:
+            store.remove(event_url)
+            raise
+        store.put(event_url, new_etag, new_data)
+        return self._ical_to_json(new_data, event_url, str(calendar.url)), new_etag
+    
+    def _delete(self, calendar: caldav.Calendar, store, event_id: str, etag: Optional[str] = None) -> None:
+        """DELETE an event, guarded by the ETag we (or the caller) know about"""
+        event_url = self._event_url(calendar, event_id)
+        stored = store.get(event_url)
+        
+        try:
+            delete_object(calendar.client, event_url, etag=etag or (stored.etag if stored else None))
+        except PreconditionFailedError:
+            store.remove(event_url)
+            raise
+        except ValueError:
+            raise ValueError('Event not found')
+        store.remove(event_url)
@@ -0,0 +1,170 @@
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+import threading
+import caldav
+from ..config.config import Config
+from ..utils.cache import TTLCache
+from .baikal_client import (
+    InvalidSyncTokenError, credentials_hash, fetch_objects, get_collection_state,
+    list_collection, sync_collection
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class StoredObject(NamedTuple):
+    """Raw upstream data of one collection member plus what we derived from it"""
+    etag: str
+    data: str
+    record: Any
+
+class CollectionStore:
+    """Local copy of one DAV collection, kept current with getctag and sync-collection"""
+
+    def __init__(self, url: str, parse: Callable[[str, str], Any], index: Any = None,
+                 multiget: Optional[Callable] = None):
+        # parse(url, data) builds the record served from the store, or None to skip the object
+        # index: optional secondary index with add(url, record) / discard(url), kept in step with the store
+        # multiget(client, url, urls): batched download of changed members (calendar_multiget ...),
+        # without it they are fetched one GET at a time
+        self.url = url
+        self.parse = parse
+        self.index = index
+        self.multiget = multiget
+        self.ctag = None
+        self.sync_token = None
+        self.loaded = False
+        self.generation = 0  # bumped on every change, so derived caches can tell they are stale
+        self.objects: Dict[str, StoredObject] = {}
+        self._lock = threading.RLock()
+        self.syncs = 0
+        self.unchanged = 0
+        self.fetched = 0
+
+    def sync(self, client: caldav.DAVClient) -> bool:
+        """Bring the store up to date; returns True when anything changed upstream"""
+        with self._lock:
+            self.syncs += 1
+            state = get_collection_state(client, self.url)
+            if self.loaded and state['ctag'] and state['ctag'] == self.ctag:
+                self.unchanged += 1
+                return False
+
+            changed, deleted, sync_token = self._changes(client, state)
+            if self.multiget:
+                objects = self.multiget(client, self.url, list(changed))
+            else:
+                objects = fetch_objects(client, list(changed))
+            # Applied as the response is parsed, so a large download never sits in memory twice
+            for url, etag, data in objects:
+                self.put(url, etag or changed.get(url, ''), data)
+                self.fetched += 1
+            for url in deleted:
+                self.remove(url)
+
+            # Only move the markers forward once every change has been applied
+            self.ctag = state['ctag']
+            self.sync_token = sync_token
+            self.loaded = True
+            logger.debug(f"Synced {self.url}: {len(changed)} changed, {len(deleted)} deleted")
+            return bool(changed or deleted)
+
+    def _changes(self, client: caldav.DAVClient, state: Dict) -> Tuple[Dict[str, str], List[str], Optional[str]]:
+        """Work out which members changed, incrementally when the server supports sync-collection"""
+        if self.loaded and self.sync_token and state['syncToken']:
+            try:
+                changed, deleted, token = sync_collection(client, self.url, self.sync_token)
+                changed = {url: etag for url, etag in changed.items() if not self._is_current(url, etag)}
+                return changed, deleted, token or state['syncToken']
+            except InvalidSyncTokenError as e:
+                logger.warning(f"Sync token for {self.url} rejected ({str(e)}), falling back to a full listing")
+
+        # First load, no sync support or expired token: compare ETags of a full listing
+        members = list_collection(client, self.url)
+        deleted = [url for url in self.objects if url not in members]
+        changed = {url: etag for url, etag in members.items() if not self._is_current(url, etag)}
+        return changed, deleted, state['syncToken']
+
+    def _is_current(self, url: str, etag: str) -> bool:
+        stored = self.objects.get(url)
+        return bool(stored and etag and stored.etag == etag)
+
+    def put(self, url: str, etag: str, data: str) -> Any:
+        """Store (or replace) one member, e.g. after we wrote it ourselves"""
+        with self._lock:
+            try:
+                record = self.parse(url, data)
+            except Exception as e:
+                logger.error(f"Failed to parse {url}: {str(e)}")
+                record = None
+            # Unparseable objects are kept too, so they are not downloaded again
+            self.objects[url] = StoredObject(etag, data, record)
+            self.generation += 1
+            if self.index is not None:
+                if record is None:
+                    self.index.discard(url)
+                else:
+                    self.index.add(url, record)
+            return record
+
+    def merge(self, objects: Iterable[Tuple[str, str, str]]) -> int:
+        """
+        Apply (url, etag, data) members fetched outside sync, e.g. query results, as they arrive.
+        The sync markers are left alone so the next sync still checks every member,
+        but what was merged here is not downloaded again while its ETag is unchanged.
+        Returns the number of members seen.
+        """
+        merged = 0
+        for url, etag, data in objects:
+            if not self._is_current(url, etag):
+                self.put(url, etag, data)
+                self.fetched += 1
+            merged += 1
+        return merged
+
+    def remove(self, url: str) -> None:
+        with self._lock:
+            if self.objects.pop(url, None) is not None:
+                self.generation += 1
+            if self.index is not None:
+                self.index.discard(url)
+
+    def get(self, url: str) -> Optional[StoredObject]:
+        with self._lock:
+            return self.objects.get(url)
+
+    def records(self) -> List:
+        """Snapshot of every parsed record"""
+        with self._lock:
+            return [obj.record for obj in self.objects.values() if obj.record is not None]
+
+    def snapshot(self) -> List[StoredObject]:
+        """Every stored member as it is now, for reading outside the lock"""
+        with self._lock:
+            return list(self.objects.values())
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'objects': len(self.objects),
+                'syncs': self.syncs,
+                'unchanged': self.unchanged,
+                'fetched': self.fetched
+            }
+
+_stores = TTLCache(max_size=Config.STORE_MAX_COLLECTIONS, ttl=Config.STORE_IDLE_TTL, sliding=True)
+_stores_lock = threading.Lock()
+
+def get_collection_store(settings: Dict, url: str, parse: Callable[[str, str], Any],
+                         index_factory: Optional[Callable[[], Any]] = None,
+                         multiget: Optional[Callable] = None) -> CollectionStore:
+    """Get the store for a collection as seen with these credentials"""
+    key = (credentials_hash(settings), str(url))
+    with _stores_lock:
+        if (store := _stores.get(key)) is None:
+            store = CollectionStore(str(url), parse, index_factory() if index_factory else None, multiget)
+            _stores.set(key, store)
+        return store
+
+def store_stats() -> Dict:
+    return _stores.stats()
@@ -0,0 +1,132 @@
+from typing import Dict
+import logging
+import socket
+import threading
+from collections import OrderedDict
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from ..config.config import Config
+from .resilience import call_with_retry, get_breaker, is_idempotent
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter with TCP keep-alive, retries and a circuit breaker that counts how its pool is used"""
+
+    def __init__(self, host: str, max_connections: int, block: bool):
+        self.breaker = get_breaker(host)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self.requests = 0
+        self.waits = 0
+        # One upstream host per adapter, so a single urllib3 pool is enough
+        super().__init__(pool_connections=1, pool_maxsize=max_connections, pool_block=block)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        # Keep idle sockets alive so the pool does not get silently dropped by NAT/firewalls
+        pool_kwargs.setdefault('socket_options', HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ])
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def send(self, request, **kwargs):
+        with self._stats_lock:
+            self.requests += 1
+            # Every connection is busy: this request waits (or opens an extra one)
+            if self._in_flight >= self._pool_maxsize:
+                self.waits += 1
+            self._in_flight += 1
+        try:
+            return call_with_retry(self.breaker, request.method, lambda remaining: super(PooledAdapter, self).send(
+                request, **dict(kwargs, timeout=self._attempt_timeout(kwargs.get('timeout'), remaining))
+            ), idempotent=is_idempotent(request.method, request.headers))
+        finally:
+            with self._stats_lock:
+                self._in_flight -= 1
+
+    @staticmethod
+    def _attempt_timeout(timeout, remaining: float):
+        """Default (connect, read) timeouts, never longer than what is left of the deadline"""
+        if timeout is None:
+            timeout = (Config.UPSTREAM_CONNECT_TIMEOUT, Config.UPSTREAM_READ_TIMEOUT)
+        elif not isinstance(timeout, tuple):
+            timeout = (timeout, timeout)
+        remaining = max(remaining, 0.1)
+        return tuple(remaining if t is None else min(t, remaining) for t in timeout)
+
+    def stats(self) -> Dict:
+        """Requests served, connections opened and requests that found the pool busy"""
+        new_connections = 0
+        pooled_requests = 0
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            if (pool := pools.get(key)) is not None:
+                new_connections += pool.num_connections
+                pooled_requests += pool.num_requests
+        with self._stats_lock:
+            return {
+                'requests': self.requests,
+                'newConnections': new_connections,
+                'hits': max(pooled_requests - new_connections, 0),
+                'waits': self.waits,
+                'inFlight': self._in_flight,
+                'maxConnections': self._pool_maxsize
+            }
+
+class HttpPool:
+    """One keep-alive requests.Session per upstream host, shared by every Baikal caller in this worker"""
+
+    def __init__(self, max_connections: int = Config.HTTP_POOL_CONNECTIONS,
+                 max_hosts: int = Config.HTTP_POOL_HOSTS, block: bool = Config.HTTP_POOL_BLOCK):
+        self.max_connections = max_connections
+        self.max_hosts = max_hosts
+        self.block = block
+        self._sessions = OrderedDict()  # "scheme://host:port" -> (session, adapter)
+        self._lock = threading.Lock()
+
+    def _make_session(self, host: str):
+        session = requests.Session()
+        # The session is shared between users, so never keep cookies
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+        adapter = PooledAdapter(host, self.max_connections, self.block)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session, adapter
+
+    def session_for(self, url: str) -> requests.Session:
+        """Get the pooled session for the host of url"""
+        parsed = urlparse(str(url))
+        host = f"{parsed.scheme}://{parsed.netloc}".lower()
+        with self._lock:
+            if host in self._sessions:
+                self._sessions.move_to_end(host)
+                return self._sessions[host][0]
+
+            logger.debug(f"Creating connection pool for {host}")
+            self._sessions[host] = self._make_session(host)
+            # Close the least recently used host pool once we track too many hosts
+            while len(self._sessions) > self.max_hosts:
+                old_host, (old_session, _) = self._sessions.popitem(last=False)
+                logger.debug(f"Closing connection pool for {old_host}")
+                old_session.close()
+            return self._sessions[host][0]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            adapters = {host: adapter for host, (_, adapter) in self._sessions.items()}
+        return {host: adapter.stats() for host, adapter in adapters.items()}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_http_pool() -> HttpPool:
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = HttpPool()
+        return _pool
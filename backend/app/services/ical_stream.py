@@ -0,0 +1,269 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from datetime import date, datetime
+import re
+import uuid
+import pytz
+
+# Components that become one calendar object each (grouped with their RECURRENCE-ID overrides)
+OBJECT_COMPONENTS = {'VEVENT', 'VTODO', 'VJOURNAL'}
+
+TZID_PATTERN = re.compile(r'TZID=("[^"]*"|[^;:]*)')
+
+PRODID = '-//Baikal Calendar//EN'
+
+def unfold_lines(stream: Iterable) -> Iterator[str]:
+    """RFC 5545 lines of a text or binary stream, with continuation lines joined"""
+    current = None
+    for raw in stream:
+        line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+        line = line.rstrip('\r\n')
+        if line[:1] in (' ', '\t') and current is not None:
+            current += line[1:]
+            continue
+        if current:
+            yield current
+        current = line
+    if current:
+        yield current
+
+def fold_line(line: str, limit: int = 75) -> str:
+    """Fold a content line at limit octets without splitting UTF-8 characters"""
+    encoded = line.encode('utf-8')
+    if len(encoded) <= limit:
+        return line + '\r\n'
+    parts, start = [], 0
+    while start < len(encoded):
+        end = min(start + (limit if not parts else limit - 1), len(encoded))
+        while end < len(encoded) and (encoded[end] & 0xC0) == 0x80:
+            end -= 1  # Do not cut inside a multi-byte character
+        parts.append(encoded[start:end].decode('utf-8'))
+        start = end
+    return '\r\n '.join(parts) + '\r\n'
+
+NAME_END = re.compile(r'[;:]')
+
+def _name(line: str) -> str:
+    return NAME_END.split(line, maxsplit=1)[0].upper()
+
+def _value(line: str) -> str:
+    return line.split(':', 1)[1] if ':' in line else ''
+
+class CalendarSplitter:
+    """
+    Splits an iCalendar stream into standalone calendar objects, one UID at a time.
+    RFC 5545 does not order the components of a recurring event, so uid_counts (from a
+    count_uids pass over the same file) tells when every component of a UID has been read.
+    Only VTIMEZONE definitions and the groups not yet complete are held in memory.
+    """
+
+    def __init__(self, lines: Iterable[str], uid_counts: Dict[Optional[str], int]):
+        self.lines = lines
+        self.uid_counts = uid_counts
+        self.timezones: Dict[str, List[str]] = {}
+        self.header: List[str] = []
+        self.components = 0  # components read so far
+
+    def __iter__(self) -> Iterator[Tuple[str, str, int]]:
+        """Yield (uid, object data, number of components in it)"""
+        pending: Dict[str, List[List[str]]] = {}
+        stack: List[str] = []
+        component: Optional[List[str]] = None
+
+        for line in self.lines:
+            name = _name(line)
+            if name == 'BEGIN':
+                stack.append(_value(line).upper())
+            if len(stack) == 2 and component is None and name == 'BEGIN':
+                component = []
+            if component is not None:
+                component.append(line)
+            elif len(stack) == 1 and name not in ('BEGIN', 'END'):
+                # Calendar level properties, kept for the objects we build
+                if name in ('CALSCALE', 'X-WR-TIMEZONE') and line not in self.header:
+                    self.header.append(line)
+            if name == 'END' and stack:
+                kind = stack.pop()
+                if len(stack) == 1 and component is not None:
+                    if kind == 'VTIMEZONE':
+                        if tzid := tzid_of(component):
+                            self.timezones[tzid] = component
+                    elif kind in OBJECT_COMPONENTS:
+                        self.components += 1
+                        uid = next((_value(l) for l in component if _name(l) == 'UID'), None)
+                        if uid is None:
+                            uid = str(uuid.uuid4())  # Not in uid_counts, so it is complete right away
+                            component.insert(1, f"UID:{uid}")
+                        # Overrides of a recurring event share the UID of their master
+                        group = pending.setdefault(uid, [])
+                        group.append(component)
+                        if len(group) >= self.uid_counts.get(uid, 0):
+                            yield self._complete(pending, uid)
+                    component = None
+        # Only left over when the stream changed since it was counted
+        for uid in list(pending):
+            yield self._complete(pending, uid)
+
+    def _complete(self, pending: Dict[str, List[List[str]]], uid: str) -> Tuple[str, str, int]:
+        group = pending.pop(uid)
+        # The master first, then its overrides
+        group.sort(key=lambda component: any(_name(line) == 'RECURRENCE-ID' for line in component))
+        return uid, self._build(group), len(group)
+
+    def _build(self, group: List[List[str]]) -> str:
+        """A standalone VCALENDAR with the group and the timezones it uses"""
+        tzids = []
+        for component in group:
+            for line in component:
+                for match in TZID_PATTERN.finditer(line.split(':', 1)[0]):
+                    tzid = match.group(1).strip('"')
+                    if tzid not in tzids:
+                        tzids.append(tzid)
+        lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', f"PRODID:{PRODID}"] + self.header
+        for tzid in tzids:
+            lines.extend(self.timezones.get(tzid, []))
+        for component in group:
+            lines.extend(component)
+        lines.append('END:VCALENDAR')
+        return ''.join(fold_line(line) for line in lines)
+
+def count_uids(stream: Iterable) -> Dict[Optional[str], int]:
+    """
+    First pass over a file: the number of object components per UID (None for components
+    without one). Their sum is the number of components an import will process.
+    """
+    counts: Dict[Optional[str], int] = {}
+    depth, kind, uid = 0, None, None
+    for line in unfold_lines(stream):
+        name = _name(line)
+        if name == 'BEGIN':
+            depth += 1
+            if depth == 2:
+                kind, uid = _value(line).upper(), None
+        elif name == 'END':
+            if depth == 2 and kind in OBJECT_COMPONENTS:
+                counts[uid] = counts.get(uid, 0) + 1
+            depth -= 1
+        elif depth >= 2 and name == 'UID' and uid is None:
+            uid = _value(line)  # The first UID of the component, as CalendarSplitter reads it
+    return counts
+
+def blocks_of(data: str) -> Iterator[Tuple[str, List[str]]]:
+    """(component name, unfolded lines) of every top level component of one calendar object"""
+    depth, block = 0, None
+    for line in unfold_lines(data.splitlines()):
+        name = _name(line)
+        if name == 'BEGIN':
+            depth += 1
+            if depth == 2:
+                block = []
+        if block is not None:
+            block.append(line)
+        if name == 'END':
+            depth -= 1
+            if depth == 1 and block is not None:
+                yield _value(block[0]).upper(), block
+                block = None
+
+def tzid_of(block: List[str]) -> Optional[str]:
+    return next((_value(line) for line in block if _name(line) == 'TZID'), None)
+
+# Fields read by the fast path; anything else in the VEVENT is skipped without parsing
+FAST_FIELDS = {'UID', 'SUMMARY', 'DESCRIPTION', 'DTSTART', 'DTEND', 'COLOR'}
+
+DATE_PATTERN = re.compile(r'^(\d{4})(\d{2})(\d{2})$')
+DATETIME_PATTERN = re.compile(r'^(\d{4})(\d{2})(\d{2})T(\d{2})(\d{2})(\d{2})(Z?)$')
+TEXT_ESCAPES = re.compile(r'\\([\\;,nN])')
+
+def _split_property(line: str) -> Tuple[str, Dict[str, str], str]:
+    """NAME;PARAM=VALUE;...:value, honouring quoted parameter values"""
+    head, colon, value = line.partition(':')
+    if '"' in head:
+        # A quoted parameter value may contain ':', find the first one outside quotes
+        in_quotes = False
+        for position, char in enumerate(line):
+            if char == '"':
+                in_quotes = not in_quotes
+            elif char == ':' and not in_quotes:
+                head, colon, value = line[:position], ':', line[position + 1:]
+                break
+        else:
+            colon = ''
+    if not colon:
+        raise ValueError('Missing property value')
+    name, *raw_params = re.findall(r'(?:[^;"]|"[^"]*")+', head)
+    params = {}
+    for param in raw_params:
+        key, _, param_value = param.partition('=')
+        params[key.upper()] = param_value.strip('"')
+    return name.upper(), params, value
+
+def _unescape_text(value: str) -> str:
+    return TEXT_ESCAPES.sub(lambda match: '\n' if match.group(1) in 'nN' else match.group(1), value)
+
+def _date_value(value: str, params: Dict[str, str]) -> Optional[Union[date, datetime]]:
+    """DATE / DATE-TIME with an optional TZID, or None when only icalendar can handle it"""
+    if match := DATE_PATTERN.match(value):
+        if params.get('VALUE', 'DATE').upper() != 'DATE':
+            return None
+        return date(*map(int, match.groups()))
+    match = DATETIME_PATTERN.match(value)
+    if not match or params.get('VALUE', 'DATE-TIME').upper() != 'DATE-TIME':
+        return None
+    parsed = datetime(*map(int, match.groups()[:6]))
+    if match.group(7):
+        return pytz.UTC.localize(parsed)
+    if 'TZID' in params:
+        # Custom VTIMEZONE definitions are left to icalendar
+        if params['TZID'] not in pytz.all_timezones_set:
+            return None
+        return pytz.timezone(params['TZID']).localize(parsed)
+    return parsed  # Floating time
+
+def parse_event_fields(data: str) -> Optional[Dict]:
+    """
+    UID, SUMMARY, DESCRIPTION, DTSTART, DTEND and COLOR of the first VEVENT, read line by line.
+    Returns None whenever the object needs the full icalendar parser (RECURRENCE-ID,
+    unknown timezones, repeated or unusual values ...), so callers can fall back to it.
+    """
+    fields: Dict[str, Tuple[Dict[str, str], str]] = {}
+    depth, in_event = 0, False
+    for line in unfold_lines(data.splitlines()):
+        name = _name(line)
+        if name == 'BEGIN':
+            depth += 1
+            if not in_event and depth == 2 and line[6:].strip().upper() == 'VEVENT':
+                in_event = True
+            continue
+        if name == 'END':
+            depth -= 1
+            if in_event and depth == 1:
+                break
+            continue
+        if not in_event or depth != 2:
+            continue
+        if name == 'RECURRENCE-ID':
+            return None
+        if name in FAST_FIELDS:
+            if name in fields:
+                return None  # Repeated property, icalendar turns it into a list
+            name, params, value = _split_property(line)
+            fields[name] = (params, value)
+    else:
+        return None  # No complete VEVENT
+
+    if 'DTSTART' not in fields:
+        return None
+    start = _date_value(fields['DTSTART'][1], fields['DTSTART'][0])
+    end = _date_value(fields['DTEND'][1], fields['DTEND'][0]) if 'DTEND' in fields else start
+    if start is None or end is None or isinstance(start, datetime) != isinstance(end, datetime):
+        return None
+
+    text = lambda name, default: _unescape_text(fields[name][1]) if name in fields else default
+    return {
+        'uid': text('UID', ''),
+        'summary': text('SUMMARY', ''),
+        'description': text('DESCRIPTION', ''),
+        'color': text('COLOR', 'blue'),
+        'start': start,
+        'end': end
+    }
@@ -0,0 +1,222 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import json
+import logging
+import os
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from ..config.config import Config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Job ids are generated by us; anything else in a URL is rejected before touching the disk
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+class Job:
+    """
+    A long running task (import ...) and its progress.
+    The state is written to the data directory, so any worker can report it.
+    """
+
+    def __init__(self, kind: str, owner: str):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.owner = owner
+        self.status = 'queued'
+        self.total = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.skipped = 0
+        self.errors: List[Dict] = []
+        self.result: Optional[Dict] = None
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._lock = threading.Lock()
+        self._saved_at = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.failed + self.skipped
+
+    @property
+    def throughput(self) -> Optional[float]:
+        """Items processed per second since the job started"""
+        if not self.started:
+            return None
+        elapsed = (self.finished or time.time()) - self.started
+        return round(self.processed / elapsed, 1) if elapsed > 0 else None
+
+    def add_total(self, count: int = 1) -> None:
+        with self._lock:
+            self.total += count
+        self.save()
+
+    def record(self, succeeded: int = 0, failed: int = 0, skipped: int = 0,
+               item: Optional[str] = None, error: Optional[str] = None) -> None:
+        """Count finished items; only the first JOB_MAX_ERRORS errors are kept"""
+        with self._lock:
+            self.succeeded += succeeded
+            self.failed += failed
+            self.skipped += skipped
+            if error and len(self.errors) < Config.JOB_MAX_ERRORS:
+                self.errors.append({'item': item, 'error': error})
+        self.save()
+
+    def to_json(self) -> Dict:
+        with self._lock:
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'status': self.status,
+                'total': self.total,
+                'processed': self.processed,
+                'succeeded': self.succeeded,
+                'failed': self.failed,
+                'skipped': self.skipped,
+                'errors': list(self.errors),
+                'result': self.result,
+                'throughput': self.throughput,
+                'created': self.created,
+                'started': self.started,
+                'finished': self.finished
+            }
+
+    def save(self, force: bool = False) -> None:
+        """Write the state to disk, at most every JOB_SAVE_INTERVAL seconds unless forced"""
+        now = time.monotonic()
+        with self._lock:
+            if not force and now - self._saved_at < Config.JOB_SAVE_INTERVAL:
+                return
+            self._saved_at = now
+        state = dict(self.to_json(), owner=self.owner)
+        path = _job_path(self.id)
+        try:
+            # Write then rename, so readers never see a half written file
+            with open(f"{path}.tmp", 'w') as f:
+                json.dump(state, f)
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logger.error(f"Failed to save job {self.id}: {str(e)}")
+
+def _job_path(job_id: str, suffix: str = '.json') -> str:
+    return Config.get_path('jobs', f"{job_id}{suffix}")
+
+class JobRegistry:
+    """Runs jobs on a small thread pool and answers status requests from their saved state"""
+
+    def __init__(self, max_workers: int = Config.JOB_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self.running = 0
+
+    def upload_path(self, job: Job) -> str:
+        """Scratch file for the job's input, removed when the job ends"""
+        return _job_path(job.id, '.upload')
+
+    def create(self, kind: str, owner: str) -> Job:
+        self._cleanup()
+        job = Job(kind, owner)
+        job.save(force=True)
+        return job
+
+    def start(self, job: Job, target: Callable[[Job], Optional[Dict]]) -> Job:
+        """Run target(job) in the background; its return value becomes the job result"""
+        self._executor.submit(self._run, job, target)
+        return job
+
+    def start_upload(self, kind: str, owner: str, upload, target: Callable[[Job, str], Optional[Dict]]) -> Job:
+        """
+        Keep an uploaded file (werkzeug FileStorage) on disk and run target(job, path) on it.
+        The file is read after the request has ended and removed when the job does.
+        """
+        job = self.create(kind, owner)
+        upload.save(self.upload_path(job))
+        return self.start(job, lambda job: target(job, self.upload_path(job)))
+
+    def _run(self, job: Job, target: Callable[[Job], Optional[Dict]]) -> None:
+        with self._lock:
+            self.running += 1
+        job.status = 'running'
+        job.started = time.time()
+        job.save(force=True)
+        try:
+            job.result = target(job)
+            job.status = 'completed'
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id} failed: {str(e)}")
+            job.status = 'failed'
+            job.result = {'error': str(e)}
+        finally:
+            job.finished = time.time()
+            job.save(force=True)
+            try:
+                os.remove(self.upload_path(job))
+            except FileNotFoundError:
+                pass
+            with self._lock:
+                self.running -= 1
+
+    def get(self, job_id: str, owner: str) -> Optional[Dict]:
+        """State of a job started by owner, from whichever worker runs it"""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        try:
+            with open(_job_path(job_id)) as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if state.pop('owner', None) != owner:
+            return None
+        return state
+
+    def _cleanup(self) -> None:
+        """Forget finished jobs older than JOB_TTL"""
+        cutoff = time.time() - Config.JOB_TTL
+        directory = os.path.dirname(_job_path('x'))
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'running': self.running}
+
+def run_bounded(job: Job, items: Iterable[Any], upload: Callable[[Any], None],
+                workers: int = Config.IMPORT_WORKERS) -> None:
+    """
+    Call upload(item) for every item on a pool of workers and wait for all of them.
+    At most twice as many items wait as there are uploads running, so a large input is
+    never read far ahead of the uploads. upload records its own outcome on the job;
+    anything it lets escape is counted as one failed item.
+    """
+    def guarded(item: Any) -> None:
+        try:
+            upload(item)
+        except Exception as e:
+            logger.error(f"{job.kind} job {job.id}: upload failed: {str(e)}")
+            job.record(failed=1, error=str(e))
+
+    slots = threading.BoundedSemaphore(workers * 2)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{job.kind}-upload") as executor:
+        for item in items:
+            slots.acquire()
+            future = executor.submit(guarded, item)
+            future.add_done_callback(lambda _: slots.release())
+
+_registry = None
+_registry_lock = threading.Lock()
+
+def get_job_registry() -> JobRegistry:
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = JobRegistry()
+        return _registry
@@ -0,0 +1,148 @@
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+from datetime import datetime
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from ..config.config import Config
+from ..utils.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+class WindowCache:
+    """Recently served or prefetched event ranges per user and calendar, reused for any range inside them"""
+
+    def __init__(self, ttl: float = Config.WINDOW_CACHE_TTL, max_windows: int = Config.WINDOW_CACHE_WINDOWS,
+                 max_owners: int = Config.WINDOW_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_windows = max_windows
+        # owner -> [(expires_at, generation, start, end, events)], newest last
+        self._owners = TTLCache(max_size=max_owners, ttl=ttl)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _live(self, owner: Hashable, generation: int) -> List[Tuple]:
+        """Windows of an owner that have not expired and match the store generation; caller holds the lock"""
+        now = time.monotonic()
+        return [window for window in self._owners.get(owner, [])
+                if window[0] > now and window[1] == generation]
+
+    def _find(self, owner: Hashable, generation: int, start: datetime, end: datetime) -> Optional[List[Dict]]:
+        """Events of the newest live window covering [start, end); caller holds the lock"""
+        for _, _, window_start, window_end, events in reversed(self._live(owner, generation)):
+            if window_start <= start and end <= window_end:
+                return events
+        return None
+
+    def get(self, owner: Hashable, generation: int, start: datetime, end: datetime) -> Optional[List[Dict]]:
+        """Events of a cached window covering [start, end) (possibly more), or None"""
+        with self._lock:
+            events = self._find(owner, generation, start, end)
+            if events is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return events
+
+    def covers(self, owner: Hashable, generation: int, start: datetime, end: datetime) -> bool:
+        with self._lock:
+            return self._find(owner, generation, start, end) is not None
+
+    def put(self, owner: Hashable, generation: int, start: datetime, end: datetime, events: List[Dict]) -> None:
+        with self._lock:
+            windows = self._live(owner, generation)
+            windows.append((time.monotonic() + self.ttl, generation, start, end, events))
+            self._owners.set(owner, windows[-self.max_windows:])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'owners': len(self._owners),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+class Prefetcher:
+    """Runs prefetch tasks in the background, bounded per user and across the worker"""
+
+    def __init__(self, per_user: int = Config.PREFETCH_PER_USER, max_concurrent: int = Config.PREFETCH_MAX_CONCURRENT):
+        self.per_user = per_user
+        self.max_concurrent = max_concurrent
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._running: Dict[Hashable, int] = {}  # user -> running tasks
+        self._pending = set()  # task keys submitted and not finished
+        self.submitted = 0
+        self.skipped = 0
+        self.failed = 0
+
+    def submit(self, user: Hashable, key: Hashable, task: Callable[[], None]) -> bool:
+        """
+        Start task unless the same key is already running or a limit is reached.
+        Prefetching is best effort, so nothing is ever queued behind the limits.
+        """
+        with self._lock:
+            if key in self._pending:
+                return False
+            if (self._running.get(user, 0) >= self.per_user or
+                    sum(self._running.values()) >= self.max_concurrent):
+                self.skipped += 1
+                return False
+            self._running[user] = self._running.get(user, 0) + 1
+            self._pending.add(key)
+            self.submitted += 1
+        self._executor.submit(self._run, user, key, task)
+        return True
+
+    def _run(self, user: Hashable, key: Hashable, task: Callable[[], None]) -> None:
+        try:
+            task()
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.warning(f"Prefetch {key} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._pending.discard(key)
+                self._running[user] -= 1
+                if not self._running[user]:
+                    del self._running[user]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'running': sum(self._running.values()),
+                'submitted': self.submitted,
+                'skipped': self.skipped,
+                'failed': self.failed,
+                'perUser': self.per_user,
+                'maxConcurrent': self.max_concurrent
+            }
+
+_window_cache = None
+_prefetcher = None
+_lock = threading.Lock()
+
+def get_window_cache() -> WindowCache:
+    global _window_cache
+    with _lock:
+        if _window_cache is None:
+            _window_cache = WindowCache()
+        return _window_cache
+
+def get_prefetcher() -> Prefetcher:
+    global _prefetcher
+    with _lock:
+        if _prefetcher is None:
+            _prefetcher = Prefetcher()
+        return _prefetcher
+
+def prefetch_stats() -> Dict:
+    return {
+        'windows': get_window_cache().stats(),
+        'tasks': get_prefetcher().stats()
+    }
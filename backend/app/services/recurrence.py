@@ -0,0 +1,182 @@
+from typing import Dict, List, NamedTuple, Tuple, Union
+from datetime import date, datetime, time, timedelta
+import hashlib
+import logging
+import icalendar
+import pytz
+from dateutil.rrule import rruleset, rrulestr
+from ..config.config import Config
+from ..utils.cache import TTLCache
+from ..utils.time_range import overlaps, to_utc
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Hard limit on instances generated for one object and window (protects against runaway rules)
+MAX_OCCURRENCES = 5000
+
+class Occurrence(NamedTuple):
+    """One instance of a recurring event, with start/end already normalised like _event_to_json"""
+    start: Union[datetime, date]
+    end: Union[datetime, date]
+    all_day: bool
+    component: icalendar.Event  # the master VEVENT, or the RECURRENCE-ID override
+    recurrence_id: Union[datetime, date]
+    transparent: bool  # decided by the component the instance comes from, not by the whole object
+
+# (object URL, content hash, window) -> list of occurrences
+_occurrence_cache = TTLCache(max_size=Config.OCCURRENCE_CACHE_SIZE, ttl=Config.OCCURRENCE_CACHE_TTL)
+
+def occurrence_cache_stats() -> Dict:
+    return _occurrence_cache.stats()
+
+def _wall_time(value: Union[datetime, date], tz) -> datetime:
+    """Naive local wall time of a DTSTART-like value in the master's timezone"""
+    if isinstance(value, datetime):
+        if value.tzinfo is not None and tz is not None:
+            return value.astimezone(tz).replace(tzinfo=None)
+        return value.replace(tzinfo=None)
+    return datetime.combine(value, time())
+
+def _localize(naive: datetime, tz) -> datetime:
+    """Attach the master's timezone to a naive wall time, respecting DST"""
+    if tz is None:
+        return naive  # Floating time
+    if hasattr(tz, 'localize'):
+        return tz.normalize(tz.localize(naive))
+    return naive.replace(tzinfo=tz)
+
+def _date_values(component: icalendar.Event, name: str) -> List[Union[datetime, date]]:
+    """All values of a multi-valued date property such as RDATE or EXDATE"""
+    prop = component.get(name)
+    if prop is None:
+        return []
+    values = []
+    for item in (prop if isinstance(prop, list) else [prop]):
+        for dt in getattr(item, 'dts', []):
+            value = dt.dt
+            # PERIOD values are (start, end/duration) tuples; the start is the instance
+            values.append(value[0] if isinstance(value, tuple) else value)
+    return values
+
+def _rule_strings(master: icalendar.Event, tz, all_day: bool) -> List[str]:
+    """RRULE lines with UNTIL rewritten into the same naive wall time as DTSTART"""
+    rules = master.get('RRULE')
+    if rules is None:
+        return []
+    strings = []
+    for rule in (rules if isinstance(rules, list) else [rules]):
+        rule = icalendar.vRecur(rule)
+        if 'UNTIL' in rule:
+            until = rule['UNTIL'][0]
+            until = _wall_time(until, tz)
+            if all_day or not isinstance(rule['UNTIL'][0], datetime):
+                # An all-day UNTIL includes the whole day
+                until = datetime.combine(until.date(), time.max.replace(microsecond=0))
+            rule['UNTIL'] = [until]
+        strings.append(rule.to_ical().decode('utf-8'))
+    return strings
+
+def _duration(component: icalendar.Event, start: Union[datetime, date]) -> timedelta:
+    if component.get('dtend') is not None:
+        return component.get('dtend').dt - start
+    if component.get('duration') is not None:
+        return component.get('duration').dt
+    return timedelta(days=1) if not isinstance(start, datetime) else timedelta(0)
+
+def is_transparent(component: icalendar.Event) -> bool:
+    """TRANSP:TRANSPARENT or STATUS:CANCELLED, the component does not block time"""
+    return (str(component.get('transp', '')).upper() == 'TRANSPARENT'
+            or str(component.get('status', '')).upper() == 'CANCELLED')
+
+def _normalise(start: Union[datetime, date], end: Union[datetime, date]) -> Tuple[Union[datetime, date], Union[datetime, date], bool]:
+    if isinstance(start, datetime):
+        return start.astimezone(pytz.UTC), end.astimezone(pytz.UTC), False
+    return start, end, True
+
+def expand(data: str, window_start: datetime, window_end: datetime) -> List[Occurrence]:
+    """
+    Expand the recurring VEVENTs of one calendar object into the instances overlapping
+    [window_start, window_end). Handles RRULE, RDATE, EXDATE and RECURRENCE-ID overrides.
+    """
+    vcal = icalendar.Calendar.from_ical(data)
+    events = [comp for comp in vcal.walk() if comp.name == 'VEVENT']
+    masters = [e for e in events if e.get('recurrence-id') is None]
+    overrides = [e for e in events if e.get('recurrence-id') is not None]
+    occurrences = []
+
+    for master in masters:
+        dtstart = master.get('dtstart').dt
+        all_day = not isinstance(dtstart, datetime)
+        tz = dtstart.tzinfo if not all_day else None
+        duration = _duration(master, dtstart)
+        transparent = is_transparent(master)
+        start_wall = _wall_time(dtstart, tz)
+
+        # Overrides of this master, keyed by the wall time of the instance they replace
+        replaced = {}
+        for override in overrides:
+            if str(override.get('uid')) == str(master.get('uid')):
+                replaced[_wall_time(override.get('recurrence-id').dt, tz)] = override
+
+        rules = rruleset()
+        rule_strings = _rule_strings(master, tz, all_day)
+        for rule in rule_strings:
+            rules.rrule(rrulestr(rule, dtstart=start_wall))
+        if not rule_strings:
+            rules.rdate(start_wall)
+        for value in _date_values(master, 'RDATE'):
+            rules.rdate(_wall_time(value, tz))
+        for value in _date_values(master, 'EXDATE'):
+            rules.exdate(_wall_time(value, tz))
+
+        # Search a slightly wider wall-clock window; exact filtering happens in UTC below
+        margin = duration + timedelta(days=1)
+        search_start = _wall_time(window_start, tz) - margin
+        search_end = _wall_time(window_end, tz) + timedelta(days=1)
+
+        for count, wall in enumerate(rules.xafter(search_start, inc=True)):
+            if wall > search_end:
+                break
+            if count >= MAX_OCCURRENCES:
+                logger.warning(f"Stopped expanding {master.get('uid')} after {MAX_OCCURRENCES} instances")
+                break
+            if wall in replaced:
+                continue  # Handled with the overrides below
+            start = wall.date() if all_day else _localize(wall, tz)
+            end = start + duration
+            if overlaps(to_utc(start), to_utc(end), window_start, window_end):
+                occurrences.append(Occurrence(*_normalise(start, end), master, start, transparent))
+
+        for wall, override in replaced.items():
+            if str(override.get('status', '')).upper() == 'CANCELLED':
+                continue
+            start = override.get('dtstart').dt
+            end = start + _duration(override, start)
+            if overlaps(to_utc(start), to_utc(end), window_start, window_end):
+                occurrences.append(Occurrence(*_normalise(start, end), override, override.get('recurrence-id').dt,
+                                              is_transparent(override)))
+
+    # Overrides without a master in this object (e.g. a single invited instance)
+    master_uids = {str(master.get('uid')) for master in masters}
+    for override in overrides:
+        if str(override.get('uid')) in master_uids:
+            continue
+        start = override.get('dtstart').dt
+        end = start + _duration(override, start)
+        if overlaps(to_utc(start), to_utc(end), window_start, window_end):
+            occurrences.append(Occurrence(*_normalise(start, end), override, override.get('recurrence-id').dt,
+                                          is_transparent(override)))
+
+    occurrences.sort(key=lambda occurrence: to_utc(occurrence.start))
+    return occurrences
+
+def expand_cached(object_url: str, data: str, window_start: datetime, window_end: datetime) -> List[Occurrence]:
+    """expand() with a bounded cache per (object, window)"""
+    digest = hashlib.sha1(data.encode('utf-8') if isinstance(data, str) else data).hexdigest()
+    key = (object_url, digest, window_start, window_end)
+    if (occurrences := _occurrence_cache.get(key)) is not None:
+        return occurrences
+    occurrences = expand(data, window_start, window_end)
+    _occurrence_cache.set(key, occurrences)
+    return occurrences
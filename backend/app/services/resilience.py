@@ -0,0 +1,219 @@
+from typing import Callable, Dict, Mapping, Optional
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+import requests
+from requests.exceptions import ConnectTimeout, ConnectionError, ReadTimeout, SSLError, Timeout
+from ..config.config import Config
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.DEBUG)
+
+# Methods that can safely be sent again once the server may have seen them
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS', 'PROPFIND', 'REPORT', 'PUT', 'DELETE'}
+
+# A write guarded by a precondition fails when it is replayed after being applied: a create
+# (If-None-Match: *) finds the object it made, an update (If-Match) finds its own new ETag
+CONDITIONAL_HEADERS = ('If-Match', 'If-None-Match')
+
+# When the API request being served has to be answered (time.monotonic()); every upstream
+# call it makes, retries included, shares this one budget
+_request_deadline: ContextVar[Optional[float]] = ContextVar('upstream_request_deadline', default=None)
+
+# Gateway errors mean Baikal (or its proxy) is temporarily unavailable
+RETRYABLE_STATUSES = {502, 503, 504}
+
+class CircuitOpenError(ConnectionError):
+    """Raised without contacting the server while its circuit breaker is open"""
+
+class DeadlineExceededError(Timeout):
+    """Raised without contacting the server once the API request has used up its upstream time"""
+
+def set_request_deadline(seconds: Optional[float]) -> None:
+    """Start the upstream time budget of the API request served by this thread, or end it (None)"""
+    _request_deadline.set(None if seconds is None else time.monotonic() + seconds)
+
+def bind_deadline(fn: Callable) -> Callable:
+    """fn wrapped to run under the caller's request deadline, for work handed to a thread pool"""
+    deadline = _request_deadline.get()
+    if deadline is None:
+        return fn
+    def run(*args, **kwargs):
+        token = _request_deadline.set(deadline)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _request_deadline.reset(token)
+    return run
+
+def is_idempotent(method: str, headers: Optional[Mapping] = None) -> bool:
+    """Whether a request can be sent again after the server may have applied it"""
+    method = method.upper()
+    if method in ('PUT', 'DELETE') and headers and any(name in headers for name in CONDITIONAL_HEADERS):
+        return False
+    return method in IDEMPOTENT_METHODS
+
+def is_retryable_error(error: Exception, idempotent: bool) -> bool:
+    """Classify an exception raised while talking to Baikal"""
+    if isinstance(error, SSLError):
+        # Certificate problems do not fix themselves
+        return False
+    if isinstance(error, ConnectTimeout):
+        # Nothing reached the server, any request can be retried
+        return True
+    if isinstance(error, (ConnectionError, ReadTimeout)):
+        return idempotent
+    return False
+
+def is_upstream_failure(error: Exception) -> bool:
+    """Errors that say something about the health of the server, and so count for the breaker"""
+    return isinstance(error, (ConnectionError, ReadTimeout)) and not isinstance(error, SSLError)
+
+def backoff_delay(attempt: int, base: float = Config.UPSTREAM_BACKOFF, cap: float = 8.0) -> float:
+    """Exponential backoff with full jitter"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class CircuitBreaker:
+    """Per-upstream breaker: closed -> open after repeated failures -> half-open probe -> closed"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, name: str, failure_threshold: int = Config.BREAKER_FAILURES,
+                 reset_timeout: float = Config.BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError instead of letting a request through to a failing server"""
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    self.rejected += 1
+                    raise CircuitOpenError(
+                        f"Baikal server {self.name} is unavailable, retrying in {int(remaining) + 1} seconds"
+                    )
+                # Cool-down over: let a single probe request through
+                self._state = self.HALF_OPEN
+                self._probing = False
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(f"Baikal server {self.name} is being probed, try again shortly")
+                self._probing = True
+
+    @property
+    def is_open(self) -> bool:
+        with self._lock:
+            return self._state == self.OPEN
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit for {self.name} closed")
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    logger.error(f"Circuit for {self.name} opened after {self._failures} failures")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def state(self) -> Dict:
+        with self._lock:
+            info = {
+                'state': self._state,
+                'failures': self._failures,
+                'rejected': self.rejected
+            }
+            if self._state == self.OPEN:
+                info['retryIn'] = max(round(self.reset_timeout - (time.monotonic() - self._opened_at), 1), 0)
+            return info
+
+def call_with_retry(breaker: CircuitBreaker, method: str, send: Callable[[float], requests.Response],
+                    retries: int = Config.UPSTREAM_RETRIES, deadline: float = Config.UPSTREAM_DEADLINE,
+                    idempotent: Optional[bool] = None) -> requests.Response:
+    """
+    Run send(remaining_seconds) with retries, backoff and the breaker.
+    Retries stop at the deadline of this call or of the API request being served, whichever
+    comes first, so a dead server never holds a worker (backoff sleeps included) past either.
+    idempotent defaults to what the method allows; pass is_idempotent(method, headers) so
+    conditional writes are not replayed once they may have reached the server.
+    """
+    method = method.upper()
+    if idempotent is None:
+        idempotent = is_idempotent(method)
+    give_up_at = time.monotonic() + deadline
+    if (request_give_up_at := _request_deadline.get()) is not None:
+        give_up_at = min(give_up_at, request_give_up_at)
+    attempt = 0
+    while True:
+        remaining = give_up_at - time.monotonic()
+        if remaining <= 0:
+            raise DeadlineExceededError(f"No time left for {method} to {breaker.name} within this request")
+        breaker.before_call()
+        remaining = give_up_at - time.monotonic()
+        error: Optional[Exception] = None
+        response = None
+        try:
+            response = send(remaining)
+        except Exception as e:
+            error = e
+
+        if error is None and response.status_code not in RETRYABLE_STATUSES:
+            breaker.record_success()
+            return response
+
+        if error is not None and not is_upstream_failure(error):
+            # Not a server health problem (bad certificate, invalid request ...)
+            breaker.record_success()
+            raise error
+
+        breaker.record_failure()
+        retryable = is_retryable_error(error, idempotent) if error is not None else idempotent
+        delay = backoff_delay(attempt)
+        out_of_time = time.monotonic() + delay >= give_up_at
+        if not retryable or attempt >= retries or out_of_time or breaker.is_open:
+            if error is not None:
+                raise error
+            return response
+
+        reason = str(error) if error is not None else f"HTTP {response.status_code}"
+        logger.warning(f"{method} to {breaker.name} failed ({reason}), retry {attempt + 1}/{retries} in {delay:.2f}s")
+        if response is not None:
+            response.close()
+        time.sleep(delay)
+        attempt += 1
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker for an upstream host"""
+    with _breakers_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name)
+        return _breakers[name]
+
+def breaker_states() -> Dict:
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.state() for name, breaker in breakers.items()}
@@ -1,3 +1,4 @@
+from typing import BinaryIO, Iterable, Iterator
 import vobject
 from datetime import datetime
 import uuid
@@ -35,6 +36,86 @@ class VCardService:
         vcard.add('rev').value = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
         return vcard
     
+    def apply_json(self, vcard: vobject.vCard, data: dict) -> bool:
+        """
+        Change the properties of an existing vCard whose JSON field differs from data.
+        Editing a field changes the first property of its kind, the one to_json shows; further
+        values (a second EMAIL ...) are not part of the JSON and are kept. Clearing a field
+        removes every property of its kind. Everything else (photos, custom properties ...)
+        is kept; returns True if anything changed.
+        """
+        current = self.to_json(vcard)
+        edited = {field for field, value in data.items()
+                  if field in current and field != 'id' and (value or '') != current[field]}
+        if not edited:
+            return False
+        
+        first = data.get('firstName', current['firstName']) or ''
+        last = data.get('lastName', current['lastName']) or ''
+        if edited & {'firstName', 'lastName'}:
+            if not hasattr(vcard, 'n'):
+                vcard.add('n').value = vobject.vcard.Name()
+            vcard.n.value.given = first
+            vcard.n.value.family = last
+        if 'displayName' in edited or not hasattr(vcard, 'fn'):
+            if not hasattr(vcard, 'fn'):
+                vcard.add('fn')
+            vcard.fn.value = data.get('displayName') or f"{first} {last}".strip()
+        if 'organization' in edited:
+            if data['organization']:
+                if not hasattr(vcard, 'org'):
+                    vcard.add('org').value = ['']
+                vcard.org.value = [data['organization']] + list(vcard.org.value[1:])
+            else:
+                self._remove_all(vcard, 'org')
+        
+        # Simple values: the first property of each kind is the one shown and edited
+        for field, name in (('email', 'email'), ('phone', 'tel'), ('notes', 'note')):
+            if field not in edited:
+                continue
+            if data[field]:
+                if not hasattr(vcard, name):
+                    vcard.add(name)
+                getattr(vcard, name).value = data[field]
+            else:
+                self._remove_all(vcard, name)
+        if 'address' in edited:
+            if data['address']:
+                if not hasattr(vcard, 'adr'):
+                    vcard.add('adr').value = vobject.vcard.Address()
+                vcard.adr.value.street = data['address']
+            else:
+                self._remove_all(vcard, 'adr')
+        
+        if not hasattr(vcard, 'rev'):
+            vcard.add('rev')
+        vcard.rev.value = datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')
+        return True
+    
+    @staticmethod
+    def _remove_all(vcard: vobject.vCard, name: str) -> None:
+        for prop in list(vcard.contents.get(name, [])):
+            vcard.remove(prop)
+    
+    def iter_vcards(self, stream: Iterable) -> Iterator[str]:
+        """Raw text of each vCard in a text or binary stream, read one card at a time"""
+        card = None
+        for raw in stream:
+            line = raw.decode('utf-8', errors='replace') if isinstance(raw, bytes) else raw
+            line = line.rstrip('\r\n')
+            marker = line.strip().upper()
+            if marker == 'BEGIN:VCARD':
+                card = [line]
+            elif card is not None:
+                card.append(line)
+                if marker == 'END:VCARD':
+                    yield '\r\n'.join(card) + '\r\n'
+                    card = None
+    
+    def count_vcards(self, stream: BinaryIO) -> int:
+        """Cheap first pass over a file to know how many cards an import will process"""
+        return sum(1 for raw in stream if raw.strip().upper() == b'BEGIN:VCARD')
+    
     def parse_vcards(self, data: str) -> list:
         """Parse vCard data into a list of vCard objects"""
         return list(vobject.readComponents(data))
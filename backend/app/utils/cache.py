@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+_MISSING = object()
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a time-to-live"""
+
+    def __init__(self, max_size: int = 128, ttl: float = 300, sliding: bool = False,
+                 max_weight: Optional[int] = None, weigher: Optional[Callable[[Any], int]] = None):
+        # max_size: number of entries kept before the least recently used one is evicted
+        # ttl: default lifetime of an entry in seconds
+        # sliding: when True every read pushes the expiry forward (idle timeout)
+        # max_weight / weigher: optional budget (e.g. bytes) shared by all entries
+        self.max_size = max_size
+        self.ttl = ttl
+        self.sliding = sliding
+        self.max_weight = max_weight
+        self.weigher = weigher
+        self.weight = 0
+        self._entries = OrderedDict()  # key -> (expires_at, ttl, value)
+        self._weights = {}  # key -> weight, only used with a weigher
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return a cached value, or default if it is missing or expired"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            expires_at, ttl, value = entry
+            if expires_at <= now:
+                self._discard(key)
+                self.misses += 1
+                return default
+            if self.sliding:
+                self._entries[key] = (now + ttl, ttl, value)
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a value, optionally with its own time-to-live"""
+        ttl = self.ttl if ttl is None else ttl
+        weight = self.weigher(value) if self.weigher else 0
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (time.monotonic() + ttl, ttl, value)
+            if self.weigher:
+                self._weights[key] = weight
+                self.weight += weight
+            # Evict least recently used entries once the cache is full
+            while self._entries and (len(self._entries) > self.max_size or
+                                     (self.max_weight is not None and self.weight > self.max_weight)):
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _discard(self, key: Hashable) -> Any:
+        """Remove an entry and its weight; the caller holds the lock"""
+        entry = self._entries.pop(key, _MISSING)
+        self.weight -= self._weights.pop(key, 0)
+        return entry
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove an entry and return its value"""
+        with self._lock:
+            entry = self._discard(key)
+            return default if entry is _MISSING else entry[2]
+
+    def pop_if(self, key: Hashable, value: Any) -> bool:
+        """Remove an entry only while it still holds this very value (compared by identity)"""
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING or entry[2] is not value:
+                return False
+            self._discard(key)
+            return True
+
+    def clear(self) -> None:
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def stats(self) -> Dict:
+        """Counters used to size the cache"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hitRate': round(self.hits / lookups, 3) if lookups else None
+            }
+            if self.weigher:
+                stats.update({'weight': self.weight, 'maxWeight': self.max_weight})
+            return stats
@@ -0,0 +1,37 @@
+from typing import Optional
+import hashlib
+from flask import Response
+
+# Revalidated on every view; the browser may keep the body but must ask before reusing it
+CACHE_CONTROL = 'private, no-cache'
+
+def make_etag(*parts) -> str:
+    """Strong ETag over everything the response body depends on"""
+    digest = hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8'))
+    return f'"{digest.hexdigest()[:32]}"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match evaluation (RFC 9110, weak comparison)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    wanted = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if (candidate[2:] if candidate.startswith('W/') else candidate) == wanted:
+            return True
+    return False
+
+def not_modified(etag: str) -> Response:
+    response = Response(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
+
+def with_etag(response: Response, etag: Optional[str]) -> Response:
+    """Attach the validator to a full response"""
+    if etag:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = CACHE_CONTROL
+    return response
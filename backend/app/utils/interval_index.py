@@ -0,0 +1,108 @@
+import threading
+from datetime import datetime
+from operator import itemgetter
+from typing import Any, Dict, Hashable, List, Set, Tuple
+from .time_range import overlaps
+
+class IntervalIndex:
+    """
+    Thread-safe index of [start, end) intervals for overlap queries.
+    Intervals are kept in an implicit augmented tree: a list sorted by start (built with one
+    sort), where each midpoint also records the latest end below it. A query skips every
+    subtree that ends before the window or starts after it, so it costs O(log n) per
+    interval found rather than a scan of the list.
+    Changes since the last build are held in an overlay and scanned directly; the tree is
+    rebuilt on the next query once the overlay outgrows rebuild_ratio of the index.
+    """
+
+    def __init__(self, rebuild_ratio: float = 1 / 16, min_rebuild: int = 64):
+        self.rebuild_ratio = rebuild_ratio
+        self.min_rebuild = min_rebuild
+        self._items: Dict[Hashable, Tuple[datetime, datetime, Any]] = {}  # key -> (start, end, value)
+        # The built tree: parallel lists sorted by start, and the latest end below each midpoint
+        self._keys: List[Hashable] = []
+        self._starts: List[datetime] = []
+        self._ends: List[datetime] = []
+        self._max_ends: List[datetime] = []
+        self._built: Set[Hashable] = set()
+        # Overlay: keys added or replaced since the build, and built entries no longer current
+        self._added: Set[Hashable] = set()
+        self._stale: Set[Hashable] = set()
+        self._lock = threading.Lock()
+
+    def add(self, key: Hashable, start: datetime, end: datetime, value: Any) -> None:
+        """Insert or replace the interval stored under key"""
+        with self._lock:
+            self._items[key] = (start, end, value)
+            self._added.add(key)
+            if key in self._built:
+                self._stale.add(key)
+
+    def discard(self, key: Hashable) -> None:
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self._added.discard(key)
+                if key in self._built:
+                    self._stale.add(key)
+
+    def search(self, start: datetime, end: datetime) -> List[Any]:
+        """Values of every interval overlapping [start, end), ordered by start"""
+        with self._lock:
+            if len(self._added) + len(self._stale) > max(self.min_rebuild, len(self._items) * self.rebuild_ratio):
+                self._build()
+            found: List[Tuple[datetime, Any]] = []
+            self._collect(0, len(self._keys), start, end, found)
+            extra = [(item[0], item[2]) for item in map(self._items.__getitem__, self._added)
+                     if overlaps(item[0], item[1], start, end)]
+        if extra:
+            found.extend(extra)
+            found.sort(key=itemgetter(0))
+        return [value for _, value in found]
+
+    def _collect(self, low: int, high: int, start: datetime, end: datetime, found: List) -> None:
+        """In-order walk of the subtree over positions [low, high); the caller holds the lock"""
+        while low < high:
+            middle = (low + high) // 2
+            # Nothing below ends late enough (a zero-length interval may end exactly at start)
+            if self._max_ends[middle] < start:
+                return
+            self._collect(low, middle, start, end, found)
+            # The midpoint and everything after it start too late
+            if self._starts[middle] >= end:
+                return
+            key = self._keys[middle]
+            if overlaps(self._starts[middle], self._ends[middle], start, end) and key not in self._stale:
+                found.append((self._starts[middle], self._items[key][2]))
+            low = middle + 1
+
+    def _build(self) -> None:
+        """Sort the current intervals once and record the latest end below each midpoint"""
+        ordered = sorted(self._items.items(), key=lambda entry: entry[1][0])
+        self._keys = [key for key, _ in ordered]
+        self._starts = [item[0] for _, item in ordered]
+        self._ends = [item[1] for _, item in ordered]
+        self._max_ends = list(self._ends)
+        if ordered:
+            self._fill_max_ends(0, len(ordered))
+        self._built = set(self._keys)
+        self._added.clear()
+        self._stale.clear()
+
+    def _fill_max_ends(self, low: int, high: int) -> datetime:
+        middle = (low + high) // 2
+        latest = self._ends[middle]
+        if low < middle:
+            latest = max(latest, self._fill_max_ends(low, middle))
+        if middle + 1 < high:
+            latest = max(latest, self._fill_max_ends(middle + 1, high))
+        self._max_ends[middle] = latest
+        return latest
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._build()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
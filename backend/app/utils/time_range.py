@@ -0,0 +1,25 @@
+from typing import Union
+from datetime import date, datetime, time
+import pytz
+
+def to_utc(value: Union[str, datetime, date]) -> datetime:
+    """
+    Comparable aware UTC datetime for an event boundary: an ISO string from _event_to_json,
+    or a date/datetime from icalendar. Dates count from midnight UTC; naive datetimes are
+    converted like _event_to_json converts floating times.
+    """
+    if isinstance(value, str):
+        value = date.fromisoformat(value) if len(value) == 10 else datetime.fromisoformat(value)
+    if not isinstance(value, datetime):
+        return pytz.UTC.localize(datetime.combine(value, time()))
+    return value.astimezone(pytz.UTC)
+
+def overlaps(start: datetime, end: datetime, window_start: datetime, window_end: datetime) -> bool:
+    """
+    Same overlap rule as a CalDAV time-range filter (RFC 4791, 9.9): an interval overlaps
+    [window_start, window_end) when it starts before the window ends and ends after it starts;
+    a zero-length interval overlaps when its start lies inside the window.
+    """
+    if end <= start:
+        return window_start <= start < window_end
+    return start < window_end and end > window_start
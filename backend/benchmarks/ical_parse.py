@@ -0,0 +1,67 @@
+"""
+Event parsing benchmark: the line based fast path against icalendar.Calendar.from_ical.
+
+Only timing; that both agree is checked by the differential corpus in
+tests/test_event_parse.py.
+
+Run from the backend directory:
+    python -m benchmarks.ical_parse
+"""
+import random
+import time
+
+import icalendar
+from app.services.ical_stream import parse_event_fields
+from tests.conftest import BERLIN, vcalendar, vevent
+
+SIZES = (1_000, 10_000)
+
+def reference(data: str):
+    """The fields _event_to_json reads, the way it reads them with icalendar"""
+    vevent = next(comp for comp in icalendar.Calendar.from_ical(data).walk() if comp.name == 'VEVENT')
+    end = vevent.get('dtend', vevent.get('dtstart'))
+    return (str(vevent.get('summary', '')), str(vevent.get('description', '')),
+            str(vevent.get('color', 'blue')), vevent.get('dtstart').dt, end.dt)
+
+def generated(count: int, seed: int = 3):
+    """Realistic single events as written by common clients"""
+    rng = random.Random(seed)
+    zones = ['Europe/Berlin', 'America/New_York', 'Asia/Tokyo']
+    samples = []
+    for i in range(count):
+        day = f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}"
+        kind = rng.random()
+        if kind < 0.5:
+            times = [f'DTSTART:{day}T{rng.randint(0, 22):02d}0000Z', f'DTEND:{day}T{rng.randint(0, 22):02d}3000Z']
+        elif kind < 0.8:
+            zone = rng.choice(zones)
+            times = [f'DTSTART;TZID={zone}:{day}T090000', f'DTEND;TZID={zone}:{day}T100000']
+        else:
+            times = [f'DTSTART;VALUE=DATE:{day}', f'DTEND;VALUE=DATE:{day}']
+        event = vevent(f'gen-{i}@example.com', *times,
+                       f'SUMMARY:Meeting {i}\\, room {rng.randint(1, 40)}',
+                       'DESCRIPTION:' + 'Agenda item\\n' * rng.randint(0, 6),
+                       'SEQUENCE:0', 'STATUS:CONFIRMED', 'TRANSP:OPAQUE',
+                       'BEGIN:VALARM', 'ACTION:DISPLAY', 'TRIGGER:-PT10M', 'END:VALARM')
+        samples.append(vcalendar(BERLIN, event) if 'Europe/Berlin' in times[0] else vcalendar(event))
+    return samples
+
+def bench(count: int) -> None:
+    samples = generated(count)
+
+    began = time.perf_counter()
+    for data in samples:
+        reference(data)
+    slow = time.perf_counter() - began
+
+    began = time.perf_counter()
+    for data in samples:
+        parse_event_fields(data)
+    quick = time.perf_counter() - began
+
+    print(f"{count:>6} events | icalendar {slow / count * 1e6:7.1f} us/event | "
+          f"fast path {quick / count * 1e6:6.1f} us/event | {slow / quick:4.1f}x")
+
+if __name__ == '__main__':
+    for size in SIZES:
+        bench(size)
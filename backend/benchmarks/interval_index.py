@@ -0,0 +1,81 @@
+"""
+Range query benchmark: IntervalIndex against a linear scan of every event.
+
+Run from the backend directory:
+    python -m benchmarks.interval_index
+"""
+import random
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from app.utils.interval_index import IntervalIndex
+from app.utils.time_range import overlaps
+
+SIZES = (1_000, 10_000, 100_000)
+QUERIES = 200
+SPAN_DAYS = 5 * 365  # events spread over five years
+
+def make_events(count: int, seed: int = 42):
+    """Mostly short timed events, some all-day ones and a few multi-month ones"""
+    rng = random.Random(seed)
+    origin = pytz.UTC.localize(datetime(2020, 1, 1))
+    events = []
+    for i in range(count):
+        start = origin + timedelta(minutes=15 * rng.randrange(SPAN_DAYS * 96))
+        kind = rng.random()
+        if kind < 0.8:
+            end = start + timedelta(minutes=30 * rng.randint(1, 8))
+        elif kind < 0.99:
+            start = start.replace(hour=0, minute=0)
+            end = start + timedelta(days=rng.randint(1, 3))
+        else:
+            end = start + timedelta(days=rng.randint(40, 200))
+        events.append((f"/calendars/bench/default/{i}.ics", start, end))
+    return events, origin
+
+def windows(origin: datetime, seed: int = 7):
+    """Month-sized windows, like a calendar month view"""
+    rng = random.Random(seed)
+    for _ in range(QUERIES):
+        start = origin + timedelta(days=rng.randrange(SPAN_DAYS))
+        yield start, start + timedelta(days=31)
+
+def bench(count: int) -> None:
+    events, origin = make_events(count)
+
+    began = time.perf_counter()
+    index = IntervalIndex()
+    for key, start, end in events:
+        index.add(key, start, end, key)
+    index.search(origin, origin)  # the tree is sorted and built on the first query
+    build = time.perf_counter() - began
+
+    queries = list(windows(origin))
+    began = time.perf_counter()
+    indexed = [index.search(start, end) for start, end in queries]
+    index_time = time.perf_counter() - began
+
+    began = time.perf_counter()
+    scanned = [[key for key, s, e in events if overlaps(s, e, start, end)] for start, end in queries]
+    scan_time = time.perf_counter() - began
+
+    assert [sorted(a) for a in indexed] == [sorted(b) for b in scanned], 'index and scan disagree'
+
+    # Incremental maintenance: move 1% of the events, as a sync with a few changes would,
+    # then query again (which rebuilds the tree once the changes outgrow the overlay)
+    moved = events[::100]
+    began = time.perf_counter()
+    for key, start, end in moved:
+        index.add(key, start + timedelta(days=1), end + timedelta(days=1), key)
+    index.search(*queries[0])
+    update = (time.perf_counter() - began) / max(len(moved), 1)
+
+    matches = sum(len(result) for result in indexed) / len(queries)
+    print(f"{count:>7} events | build {build * 1000:8.1f} ms | update {update * 1e6:7.1f} us/event | "
+          f"query {index_time / len(queries) * 1e6:8.1f} us | scan {scan_time / len(queries) * 1e6:9.1f} us | "
+          f"{matches:.0f} matches/query")
+
+if __name__ == '__main__':
+    for size in SIZES:
+        bench(size)
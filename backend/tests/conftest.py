@@ -0,0 +1,35 @@
+"""Shared iCalendar templates and store setup for the calendar tests (and the benchmarks)"""
+from typing import List, Optional
+
+from app.services.calendar import CalendarService, EventIndex
+from app.services.dav_store import CollectionStore
+from app.services.ical_stream import fold_line
+
+BERLIN = [
+    'BEGIN:VTIMEZONE', 'TZID:Europe/Berlin',
+    'BEGIN:DAYLIGHT', 'TZOFFSETFROM:+0100', 'TZOFFSETTO:+0200', 'DTSTART:19700329T020000',
+    'RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU', 'END:DAYLIGHT',
+    'BEGIN:STANDARD', 'TZOFFSETFROM:+0200', 'TZOFFSETTO:+0100', 'DTSTART:19701025T030000',
+    'RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU', 'END:STANDARD',
+    'END:VTIMEZONE'
+]
+
+def vcalendar(*components: List[str]) -> str:
+    """A VCALENDAR holding the given components (lists of content lines), folded like a client would"""
+    lines = ['BEGIN:VCALENDAR', 'VERSION:2.0', 'PRODID:-//test//EN']
+    for component in components:
+        lines += component
+    return ''.join(fold_line(line) for line in lines + ['END:VCALENDAR'])
+
+def vevent(uid: Optional[str], *lines: str) -> List[str]:
+    """A VEVENT with a DTSTAMP, and a UID unless uid is None"""
+    return ['BEGIN:VEVENT', *([f'UID:{uid}'] if uid else []), 'DTSTAMP:20240101T000000Z', *lines, 'END:VEVENT']
+
+def calendar_object(uid: str, *vevents: List[str], timezone: List[str] = ()) -> str:
+    """One calendar object: every VEVENT (master, overrides) shares uid"""
+    return vcalendar(*([timezone] if timezone else []), *(vevent(uid, *lines) for lines in vevents))
+
+def event_store(url: str, service: Optional[CalendarService] = None) -> CollectionStore:
+    """An empty calendar store parsing and indexing objects the way the calendar service does"""
+    service = service or CalendarService()
+    return CollectionStore(url, service._event_parser(url), EventIndex())
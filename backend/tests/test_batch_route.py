@@ -0,0 +1,47 @@
+"""Request validation of the batch events endpoint"""
+import pytest
+from flask import Flask
+
+from app.routes import calendar as calendar_routes
+
+
+@pytest.fixture
+def client(monkeypatch):
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = 'test'
+    app.register_blueprint(calendar_routes.bp)
+    calls = []
+    monkeypatch.setattr(calendar_routes.calendar_service, 'batch_events',
+                        lambda user_data, calendar_id, operations: calls.append(operations) or [])
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['user_id'] = 'test'
+        session['user_data'] = {'user_id': 'test'}
+    client.calls = calls
+    return client
+
+
+@pytest.mark.parametrize('body', [[{'op': 'delete', 'id': 'a'}], 'operations', 42])
+def test_body_that_is_not_an_object_is_rejected(client, body):
+    response = client.post('/api/calendar/events/batch?calendarId=cal', json=body)
+    assert response.status_code == 400
+    assert client.calls == []
+
+
+@pytest.mark.parametrize('operations', [{'op': 'delete', 'id': 'a'}, 'delete', 3])
+def test_operations_that_are_not_a_list_are_rejected(client, operations):
+    response = client.post('/api/calendar/events/batch?calendarId=cal', json={'operations': operations})
+    assert response.status_code == 400
+    assert client.calls == []
+
+
+def test_missing_operations_are_rejected(client):
+    response = client.post('/api/calendar/events/batch?calendarId=cal', json={})
+    assert response.status_code == 400
+
+
+def test_operation_list_reaches_the_service(client):
+    operations = [{'op': 'delete', 'id': 'a'}]
+    response = client.post('/api/calendar/events/batch', json={'calendarId': 'cal', 'operations': operations})
+    assert response.status_code == 200
+    assert client.calls == [operations]
@@ -0,0 +1,112 @@
+"""Verified client cache: one verification per user at a time, no lock left behind"""
+import threading
+import time
+
+import caldav
+import pytest
+from app.services import baikal_client
+from app.services.baikal_client import ClientRegistry
+
+class FakeVerifier:
+    """Stands in for BaikalClient; usernames starting with 'bad' fail verification"""
+    verifications = 0
+
+    def verify_connection(self, settings):
+        FakeVerifier.verifications += 1
+        time.sleep(0.05)
+        if settings['username'].startswith('bad'):
+            return False, 'Invalid credentials'
+        self.settings = settings
+        return True, None
+
+    def get_client(self):
+        return True, type('Client', (), {})()
+
+@pytest.fixture(autouse=True)
+def fake_verifier(monkeypatch):
+    FakeVerifier.verifications = 0
+    monkeypatch.setattr(baikal_client, 'BaikalClient', FakeVerifier)
+
+def settings(username):
+    return {'serverUrl': 'http://baikal.test/', 'username': username, 'password': 'secret'}
+
+def test_concurrent_logins_verify_once():
+    registry = ClientRegistry()
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(registry.get_client(settings('alice'))))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert FakeVerifier.verifications == 1
+    assert len({id(client) for client in clients}) == 1
+    assert registry._locks == {}
+
+def test_locks_do_not_outlive_verification():
+    registry = ClientRegistry(max_size=2)
+    for i in range(10):
+        registry.get_client(settings(f'user{i}'))
+        with pytest.raises(ValueError):
+            registry.get_client(settings(f'bad{i}'))
+    assert len(registry._clients) == 2
+    assert registry._locks == {}
+
+def test_stale_client_does_not_evict_its_replacement():
+    registry = ClientRegistry()
+    old = registry.get_client(settings('alice'))
+    registry.invalidate(settings('alice'))
+    new = registry.get_client(settings('alice'))
+    old.on_auth_error()
+    assert registry.get_client(settings('alice')) is new
+    new.on_auth_error()
+    assert registry.get_client(settings('alice')) is not new
+    assert FakeVerifier.verifications == 3
+
+class FakeResponse:
+    reason = 'Refused'
+
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+def fake_client(status_code):
+    evictions = []
+    session = type('Session', (), {'request': lambda self, *args, **kwargs: FakeResponse(status_code)})()
+    client = type('Client', (), {'session': session, 'auth': None, 'timeout': None, 'ssl_verify_cert': True,
+                                 'ssl_cert': None, 'on_auth_error': lambda self: evictions.append(1)})()
+    return client, evictions
+
+def test_rejected_credentials_evict_the_client():
+    client, evictions = fake_client(401)
+    with pytest.raises(caldav.lib.error.AuthorizationError):
+        baikal_client.dav_request(client, 'PROPFIND', 'http://baikal.test/book/')
+    assert evictions == [1]
+
+@pytest.mark.parametrize('method', ['PROPFIND', 'PUT', 'DELETE'])
+def test_forbidden_request_keeps_the_client(method):
+    client, evictions = fake_client(403)
+    with pytest.raises(baikal_client.PermissionDeniedError):
+        baikal_client.dav_request(client, method, 'http://baikal.test/book/card.vcf')
+    assert evictions == []
+
+def test_forbidden_report_is_left_to_the_caller():
+    client, evictions = fake_client(403)
+    assert baikal_client.dav_request(client, 'REPORT', 'http://baikal.test/book/').status_code == 403
+    assert evictions == []
+
+@pytest.mark.parametrize('status, error', [(401, caldav.lib.error.AuthorizationError),
+                                           (403, baikal_client.PermissionDeniedError)])
+def test_caldav_requests_only_evict_on_401(monkeypatch, status, error):
+    def refuse(self, url, method='GET', body='', headers={}):
+        baikal_client._remember_status(FakeResponse(status))
+        raise caldav.lib.error.AuthorizationError(url=url, reason='Refused')
+    monkeypatch.setattr(caldav.DAVClient, 'request', refuse)
+    client = baikal_client.BaikalDAVClient(url='http://baikal.test/', username='alice', password='secret')
+    evictions = []
+    client.on_auth_error = lambda: evictions.append(1)
+    with pytest.raises(error):
+        client.request('http://baikal.test/calendars/alice/')
+    assert evictions == ([1] if status == 401 else [])
@@ -0,0 +1,187 @@
+"""Contact search and paging from the local address book store"""
+import caldav
+import pytest
+from app.services import addressbook
+from app.services.addressbook import AddressBookService, ContactIndex
+from app.services.dav_store import CollectionStore
+
+BOOK_URL = 'http://baikal.test/book/'
+USER = {'user_id': 'test', 'baikal_credentials': {'serverUrl': 'http://baikal.test', 'username': 'test',
+                                                  'password': 'test', 'addressBookPath': '/book/'}}
+
+def vcard(uid: str, given: str, family: str, email: str = '') -> str:
+    lines = ['BEGIN:VCARD', 'VERSION:3.0', f'UID:{uid}', f'N:{family};{given};;;', f'FN:{given} {family}']
+    if email:
+        lines.append(f'EMAIL:{email}')
+    return '\r\n'.join(lines + ['END:VCARD', ''])
+
+@pytest.fixture
+def service(monkeypatch):
+    service = AddressBookService()
+    store = CollectionStore(BOOK_URL, service._contact_parser(BOOK_URL), ContactIndex())
+    service.store = store
+    service.syncs = []
+    service.queries = []
+    service.server = {}  # url -> vCard, what an addressbook-query can return
+
+    def query(client, url, term, properties):
+        service.queries.append(term)
+        for card_url, data in service.server.items():
+            if term.casefold() in data.casefold():
+                yield card_url, '"1"', data
+
+    def sync(client):
+        service.syncs.append(client)
+        store.merge((url, '"1"', data) for url, data in service.server.items())
+        store.loaded = True
+
+    monkeypatch.setattr(service, '_get_client', lambda user_data: 'client')
+    monkeypatch.setattr(service, '_get_store', lambda user_data, book_url: store)
+    monkeypatch.setattr(store, 'sync', sync)
+    monkeypatch.setattr(addressbook, 'addressbook_query', query)
+    monkeypatch.setattr(addressbook, 'get_collection_state', lambda client, url: {'ctag': '1', 'syncToken': None})
+    service.server.update({
+        BOOK_URL + 'ann.vcf': vcard('ann', 'Ann', 'Smith', 'ann@example.com'),
+        BOOK_URL + 'bob.vcf': vcard('bob', 'Bob', 'Smith', 'bob@example.com'),
+        BOOK_URL + 'anna.vcf': vcard('anna', 'Anna', 'Jones'),
+    })
+    return service
+
+def names(page):
+    return [contact['displayName'] for contact in page['contacts']]
+
+def test_cold_search_merges_server_matches_then_applies_every_term(service):
+    page = service.get_contacts(USER, BOOK_URL, q='ann smith')
+    # The longest term goes to the server, the index then filters on both
+    assert service.queries == ['smith']
+    assert names(page) == ['Ann Smith']
+    assert service.syncs == []
+    # Only the cards the server matched were downloaded; the store is still not a full copy
+    assert sorted(service.store.objects) == [BOOK_URL + 'ann.vcf', BOOK_URL + 'bob.vcf']
+    assert not service.store.loaded
+
+def test_repeated_cold_search_does_not_parse_merged_cards_again(service):
+    service.get_contacts(USER, BOOK_URL, q='smith')
+    fetched = service.store.fetched
+    service.get_contacts(USER, BOOK_URL, q='smith')
+    assert service.store.fetched == fetched
+
+def test_failed_server_search_falls_back_to_a_sync(service, monkeypatch):
+    def unsupported(client, url, term, properties):
+        raise caldav.lib.error.ReportError('addressbook-query not supported')
+    monkeypatch.setattr(addressbook, 'addressbook_query', unsupported)
+    page = service.get_contacts(USER, BOOK_URL, q='ann')
+    assert service.syncs == ['client']
+    assert names(page) == ['Ann Smith', 'Anna Jones']
+
+def test_warm_store_searches_locally(service):
+    service.get_contacts(USER, BOOK_URL)
+    page = service.get_contacts(USER, BOOK_URL, q='smith')
+    assert service.queries == []
+    assert names(page) == ['Ann Smith', 'Bob Smith']
+
+def test_cold_search_etag_never_matches_the_synced_answer(service):
+    query = {'q': 'smith'}
+    cold = service.contacts_etag(USER, BOOK_URL, query)
+    service.get_contacts(USER, BOOK_URL, q='smith')
+    assert service.contacts_etag(USER, BOOK_URL, query) == cold
+    service.get_contacts(USER, BOOK_URL)
+    assert service.contacts_etag(USER, BOOK_URL, query) != cold
+
+def test_listing_etag_does_not_depend_on_the_store_being_warm(service):
+    cold = service.contacts_etag(USER, BOOK_URL, {})
+    service.get_contacts(USER, BOOK_URL)
+    assert service.contacts_etag(USER, BOOK_URL, {}) == cold
+
+def indexed(*people):
+    """ContactIndex over (given, family) pairs, with card URLs in the given order"""
+    index = ContactIndex()
+    for number, (given, family) in enumerate(people):
+        index.add(f'{BOOK_URL}{number:03}.vcf', {'id': f'uid-{number}', 'displayName': f'{given} {family}'.strip(),
+                                                 'firstName': given, 'lastName': family})
+    return index
+
+def walk(index, sort, descending, limit, query=None):
+    """Every page in turn, passing each cursor through its encoded form"""
+    pages, after = [], None
+    while True:
+        records, last, total = index.page(query, sort, descending, after, limit)
+        pages.append([record['displayName'] for record in records])
+        if last is None:
+            return pages, total
+        cursor = addressbook._encode_cursor(('-' if descending else '') + sort, last)
+        after = addressbook._decode_cursor(cursor, ('-' if descending else '') + sort)
+
+PEOPLE = [('Joanna', 'Berg'), ('Ann', 'Smith'), ('anna', 'Able'), ('Bob', 'Smith'), ('Zoe', ''),
+          ('Ann', 'Smith'), ('', 'Nobody'), ('Andrew', 'Annan')]
+
+@pytest.mark.parametrize('limit', [1, 2, 3, 8, 50])
+def test_pages_cover_every_contact_once_in_both_directions(limit):
+    index = indexed(*PEOPLE)
+    ascending, total = walk(index, 'firstName', False, limit)
+    descending, _ = walk(index, 'firstName', True, limit)
+    flat = [name for page in ascending for name in page]
+    assert total == len(PEOPLE)
+    assert all(len(page) <= limit for page in ascending + descending)
+    assert flat == ['Andrew Annan', 'Ann Smith', 'Ann Smith', 'anna Able', 'Bob Smith', 'Joanna Berg', 'Zoe',
+                    'Nobody']  # case-insensitive, empty values last
+    assert [name for page in descending for name in page] == flat[::-1]
+
+def test_pages_of_a_search_follow_the_cursor():
+    index = indexed(*PEOPLE)
+    pages, total = walk(index, 'lastName', False, 1, 'smith')
+    # Equal sort values are ordered by card URL, so the cursor never skips or repeats one
+    assert pages == [['Ann Smith'], ['Bob Smith'], ['Ann Smith']]
+    assert total == 3
+
+def test_short_terms_match_word_prefixes_only():
+    index = indexed(*PEOPLE)
+    def found(query):
+        return sorted(record['displayName'] for record in index.page(query, 'displayName', False, None, 50)[0])
+    # Under three characters a term must start a word: "an" does not find Joanna
+    assert found('an') == ['Andrew Annan', 'Ann Smith', 'Ann Smith', 'anna Able']
+    # From three characters on it matches anywhere
+    assert found('ann') == ['Andrew Annan', 'Ann Smith', 'Ann Smith', 'Joanna Berg', 'anna Able']
+    assert found('ANNA') == ['Andrew Annan', 'Joanna Berg', 'anna Able']
+    # Every term must match
+    assert found('an sm') == ['Ann Smith', 'Ann Smith']
+    assert found('zz') == []
+
+def test_index_follows_changes():
+    index = indexed(('Ann', 'Smith'))
+    url = BOOK_URL + '000.vcf'
+    index.add(url, {'id': 'uid-0', 'displayName': 'Joanna Berg', 'firstName': 'Joanna', 'lastName': 'Berg'})
+    assert index.page('smith', 'displayName', False, None, 10)[0] == []
+    assert [r['displayName'] for r in index.page('oan', 'displayName', False, None, 10)[0]] == ['Joanna Berg']
+    assert index.lookup('uid-0') == [url]
+    index.discard(url)
+    assert index.page(None, 'displayName', False, None, 10) == ([], None, 0)
+    assert index.lookup('uid-0') == []
+
+@pytest.mark.parametrize('cursor', ['not base64!', 'bm90IGpzb24=', addressbook._encode_cursor('firstName', (False, 1, 2))])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(addressbook.InvalidContactQueryError, match='Invalid cursor'):
+        addressbook._decode_cursor(cursor, 'firstName')
+
+def test_cursor_of_another_sort_order_is_rejected():
+    cursor = addressbook._encode_cursor('firstName', (False, 'ann', BOOK_URL + '000.vcf'))
+    assert addressbook._decode_cursor(cursor, 'firstName') == (False, 'ann', BOOK_URL + '000.vcf')
+    with pytest.raises(addressbook.InvalidContactQueryError, match='different sort order'):
+        addressbook._decode_cursor(cursor, '-firstName')
+
+def test_get_contacts_pages_with_next_cursor(service):
+    service.server.update({BOOK_URL + f'{n}.vcf': vcard(f'p{n}', f'Person{n}', 'Test') for n in range(5)})
+    for sort in ('firstName', '-firstName'):
+        seen, cursor = [], None
+        while True:
+            page = service.get_contacts(USER, BOOK_URL, limit=3, cursor=cursor, sort=sort)
+            seen += names(page)
+            assert page['total'] == 8
+            if not (cursor := page['nextCursor']):
+                break
+        expected = ['Ann Smith', 'Anna Jones', 'Bob Smith'] + [f'Person{n} Test' for n in range(5)]
+        assert seen == (expected if sort == 'firstName' else expected[::-1])
+
+def test_get_contacts_rejects_unknown_sort_field(service):
+    with pytest.raises(addressbook.InvalidContactQueryError):
+        service.get_contacts(USER, BOOK_URL, sort='notes')
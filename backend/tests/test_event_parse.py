@@ -0,0 +1,93 @@
+"""
+Event parsing: a calendar object goes through the store parser and comes out as an event,
+and the line based fast path agrees with icalendar on a differential corpus.
+"""
+from datetime import datetime
+
+import icalendar
+import pytest
+import pytz
+from app.services.calendar import CalendarService
+from app.services.ical_stream import parse_event_fields
+from conftest import BERLIN, calendar_object, event_store
+
+CALENDAR_URL = 'http://baikal.test/cal/'
+EVENT_URL = CALENDAR_URL + 'smoke.ics'
+
+EVENT = calendar_object('smoke', ['DTSTART:20240105T090000Z', 'DTEND:20240105T100000Z', 'SUMMARY:Smoke'])
+
+def test_parser_builds_a_record():
+    record = CalendarService()._event_parser(CALENDAR_URL)(EVENT_URL, EVENT)
+    assert record is not None
+    assert record['event']['title'] == 'Smoke'
+    assert record['event']['start'] == '2024-01-05T09:00:00+00:00'
+    assert record['start'] == datetime(2024, 1, 5, 9, tzinfo=pytz.UTC)
+    assert not record['recurring'] and not record['transparent']
+
+def test_stored_event_is_indexed():
+    # CollectionStore.put keeps unparseable objects with a None record, so a parser
+    # error would otherwise only show up as an empty calendar
+    store = event_store(CALENDAR_URL)
+    record = store.put(EVENT_URL, '"1"', EVENT)
+    assert record is not None
+    singles, recurring = store.index.query(datetime(2024, 1, 5, tzinfo=pytz.UTC), datetime(2024, 1, 6, tzinfo=pytz.UTC))
+    assert [single['event']['title'] for single in singles] == ['Smoke'] and recurring == []
+
+def matched(uid, *lines, timezone=()):
+    """A sample the fast path must parse exactly like icalendar"""
+    return pytest.param(calendar_object(uid, lines, timezone=timezone), False, id=uid)
+
+def declined(uid, *lines, timezone=()):
+    """A sample the fast path must leave to icalendar"""
+    return pytest.param(calendar_object(uid, lines, timezone=timezone), True, id=uid)
+
+# Hand written edge cases
+CORPUS = [
+    matched('utc', 'DTSTART:20240105T090000Z', 'DTEND:20240105T100000Z', 'SUMMARY:Plain UTC'),
+    matched('allday', 'DTSTART;VALUE=DATE:20240105', 'DTEND;VALUE=DATE:20240106', 'SUMMARY:All day'),
+    matched('bare-date', 'DTSTART:20240105', 'SUMMARY:Date without VALUE, no DTEND'),
+    matched('tz', 'DTSTART;TZID=Europe/Berlin:20240705T090000', 'DTEND;TZID=Europe/Berlin:20240705T100000',
+            'SUMMARY:Berlin summer', timezone=BERLIN),
+    matched('tz-quoted', 'DTSTART;TZID="America/New_York":20240310T023000',
+            'DTEND;TZID="America/New_York":20240310T033000', 'SUMMARY:Quoted TZID in a DST gap'),
+    declined('custom-tz', 'DTSTART;TZID=My Office:20240105T090000', 'DTEND;TZID=My Office:20240105T100000',
+             'SUMMARY:Custom timezone', timezone=[line.replace('Europe/Berlin', 'My Office') for line in BERLIN]),
+    matched('floating', 'DTSTART:20240105T090000', 'DTEND:20240105T100000', 'SUMMARY:Floating'),
+    matched('escapes', 'DTSTART:20240105T090000Z', 'SUMMARY:Comma\\, semicolon\\; backslash\\\\ newline\\nend',
+            'DESCRIPTION:Line one\\NLine two'),
+    matched('folded', 'DTSTART:20240105T090000Z', 'SUMMARY:' + 'Long summary with ünïcödé text ' * 8,
+            'DESCRIPTION:' + 'x' * 300),
+    matched('params', 'DTSTART:20240105T090000Z', 'SUMMARY;LANGUAGE=en;X-ALT="a:b;c":Quoted: colon', 'COLOR:red'),
+    matched('alarm', 'DTSTART:20240105T090000Z', 'SUMMARY:With alarm',
+            'BEGIN:VALARM', 'ACTION:DISPLAY', 'DESCRIPTION:Alarm text', 'TRIGGER:-PT15M', 'END:VALARM'),
+    declined('override', 'RECURRENCE-ID:20240106T090000Z', 'DTSTART:20240106T100000Z', 'SUMMARY:Override'),
+    declined('duplicate', 'DTSTART:20240105T090000Z', 'SUMMARY:First', 'SUMMARY:Second'),
+    declined('mixed', 'DTSTART;VALUE=DATE:20240105', 'DTEND:20240106T000000Z', 'SUMMARY:Date start, time end'),
+    declined('period', 'DTSTART;VALUE=PERIOD:20240105T090000Z/PT1H', 'SUMMARY:Odd value type'),
+    matched('lower', 'dtstart:20240105T090000Z', 'summary:lower case names'),
+    matched('rrule', 'DTSTART:20240105T090000Z', 'DTEND:20240105T093000Z', 'RRULE:FREQ=WEEKLY;COUNT=3',
+            'SUMMARY:Recurring master'),
+]
+
+def normalise(title, description, color, start, end):
+    if isinstance(start, datetime):
+        start, end = start.astimezone(pytz.UTC), end.astimezone(pytz.UTC)
+    return title, description, color, start.isoformat(), end.isoformat()
+
+def reference(data: str):
+    """The fields _event_to_json reads, the way it reads them with icalendar"""
+    vevent = next(comp for comp in icalendar.Calendar.from_ical(data).walk() if comp.name == 'VEVENT')
+    start = vevent.get('dtstart').dt
+    end = vevent.get('dtend', vevent.get('dtstart')).dt
+    return normalise(str(vevent.get('summary', '')), str(vevent.get('description', '')),
+                     str(vevent.get('color', 'blue')), start, end)
+
+@pytest.mark.parametrize('data, declines', CORPUS)
+def test_fast_path_matches_icalendar_or_declines(data, declines):
+    fields = parse_event_fields(data)
+    if declines:
+        assert fields is None
+        return
+    assert fields is not None
+    assert normalise(fields['summary'], fields['description'], fields['color'],
+                     fields['start'], fields['end']) == reference(data)
@@ -0,0 +1,30 @@
+"""Served event ranges must never outlive a change the store has synced"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytz
+from app.services.calendar import CalendarService
+from conftest import calendar_object, event_store
+
+CALENDAR_URL = 'http://baikal.test/windows/'
+EVENT_URL = CALENDAR_URL + 'edited.ics'
+START = datetime(2024, 7, 1, tzinfo=pytz.UTC)
+END = datetime(2024, 7, 3, tzinfo=pytz.UTC)
+
+def event(summary: str) -> str:
+    return calendar_object('edited', ['DTSTART:20240702T090000Z', 'DTEND:20240702T100000Z', f'SUMMARY:{summary}'])
+
+def test_edit_by_another_client_is_not_hidden_by_a_window(monkeypatch):
+    service = CalendarService()
+    store = event_store(CALENDAR_URL, service)
+    upstream = {'summary': 'Before'}
+    # Stands in for a sync against Baikal: applies whatever the server holds now
+    monkeypatch.setattr(store, 'sync', lambda client: store.put(EVENT_URL, upstream['summary'], event(upstream['summary'])))
+    monkeypatch.setattr(service, '_get_store', lambda user_data, calendar: store)
+    monkeypatch.setattr(service, '_prefetch_adjacent', lambda *args: None)
+    user_data = {'baikal_credentials': {'serverUrl': 'http://baikal.test/', 'username': 'windows'}}
+    calendar = SimpleNamespace(url=CALENDAR_URL, client=None)
+
+    assert [e['title'] for e in service._calendar_events(user_data, calendar, START, END)] == ['Before']
+    upstream['summary'] = 'After'
+    assert [e['title'] for e in service._calendar_events(user_data, calendar, START, END)] == ['After']
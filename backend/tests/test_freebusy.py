@@ -0,0 +1,39 @@
+"""Free/busy from the local store: transparency is decided per component, not per object"""
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytz
+from app.services.calendar import CalendarService
+from conftest import calendar_object, event_store
+
+CALENDAR_URL = 'http://baikal.test/busy/'
+UTC = pytz.UTC
+
+def busy(*vevents):
+    service = CalendarService()
+    store = event_store(CALENDAR_URL, service)
+    store.put(CALENDAR_URL + 'series.ics', '"1"', calendar_object('series', *vevents))
+    calendar = SimpleNamespace(url=CALENDAR_URL, client=None)
+    periods = service._store_busy({}, calendar, store, datetime(2024, 1, 1, tzinfo=UTC), datetime(2024, 2, 1, tzinfo=UTC))
+    return sorted(start.day for start, _ in periods)
+
+WEEKLY = ['DTSTART:20240101T090000Z', 'DTEND:20240101T100000Z', 'RRULE:FREQ=WEEKLY;COUNT=4', 'SUMMARY:Weekly']
+
+def test_cancelled_override_only_frees_its_instance():
+    cancelled = ['RECURRENCE-ID:20240108T090000Z', 'DTSTART:20240108T090000Z', 'DTEND:20240108T100000Z',
+                 'STATUS:CANCELLED']
+    assert busy(WEEKLY, cancelled) == [1, 15, 22]
+
+def test_transparent_override_only_frees_its_instance():
+    transparent = ['RECURRENCE-ID:20240115T090000Z', 'DTSTART:20240115T090000Z', 'DTEND:20240115T100000Z',
+                   'TRANSP:TRANSPARENT']
+    assert busy(WEEKLY, transparent) == [1, 8, 22]
+
+def test_opaque_override_of_a_transparent_series_blocks_time():
+    opaque = ['RECURRENCE-ID:20240115T090000Z', 'DTSTART:20240115T110000Z', 'DTEND:20240115T120000Z',
+              'TRANSP:OPAQUE']
+    assert busy(WEEKLY + ['TRANSP:TRANSPARENT'], opaque) == [15]
+
+def test_transparent_single_event():
+    assert busy(['DTSTART:20240103T090000Z', 'DTEND:20240103T100000Z', 'TRANSP:TRANSPARENT']) == []
+    assert busy(['DTSTART:20240103T090000Z', 'DTEND:20240103T100000Z']) == [3]
@@ -0,0 +1,35 @@
+"""Import splitting: every component of a UID ends up in one object, wherever it is in the file"""
+import io
+
+from app.services.ical_stream import CalendarSplitter, count_uids, unfold_lines
+from conftest import BERLIN, vcalendar, vevent
+
+def ics(*components) -> bytes:
+    return vcalendar(*components).encode('utf-8')
+
+MASTER = vevent('series', 'DTSTART;TZID=Europe/Berlin:20240101T090000', 'RRULE:FREQ=DAILY;COUNT=5', 'SUMMARY:Master')
+OVERRIDE = vevent('series', 'RECURRENCE-ID;TZID=Europe/Berlin:20240103T090000',
+                  'DTSTART;TZID=Europe/Berlin:20240103T100000', 'SUMMARY:Moved')
+OTHER = vevent('other', 'DTSTART:20240105T090000Z', 'SUMMARY:Other')
+
+def split(data: bytes):
+    counts = count_uids(io.BytesIO(data))
+    return counts, list(CalendarSplitter(unfold_lines(io.BytesIO(data)), counts))
+
+def test_override_before_its_master():
+    counts, objects = split(ics(BERLIN, OVERRIDE, OTHER, MASTER))
+    assert counts == {'series': 2, 'other': 1}
+    assert [(uid, components) for uid, _, components in objects] == [('other', 1), ('series', 2)]
+    data = objects[1][1]
+    # One object, master first, with the timezone both use
+    assert data.index('SUMMARY:Master') < data.index('SUMMARY:Moved')
+    assert 'TZID:Europe/Berlin' in data
+
+def test_adjacent_groups_are_yielded_as_soon_as_complete():
+    _, objects = split(ics(MASTER, OVERRIDE, OTHER))
+    assert [uid for uid, _, _ in objects] == ['series', 'other']
+
+def test_components_without_uid_stay_separate():
+    counts, objects = split(ics(vevent(None, 'DTSTART:20240105T090000Z'), vevent(None, 'DTSTART:20240106T090000Z')))
+    assert counts == {None: 2}
+    assert len({uid for uid, _, _ in objects}) == 2 and all(f'UID:{uid}' in data for uid, data, _ in objects)
@@ -0,0 +1,65 @@
+"""IntervalIndex against a linear scan, through builds, overlay changes and removals"""
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+import pytz
+from app.utils.interval_index import IntervalIndex
+from app.utils.time_range import overlaps, to_utc
+
+ORIGIN = pytz.UTC.localize(datetime(2024, 1, 1))
+
+def random_interval(rng):
+    start = ORIGIN + timedelta(minutes=15 * rng.randrange(365 * 96))
+    kind = rng.random()
+    if kind < 0.1:
+        return start, start  # zero-length
+    if kind < 0.95:
+        return start, start + timedelta(minutes=30 * rng.randint(1, 8))
+    return start, start + timedelta(days=rng.randint(40, 200))
+
+def scan(intervals, start, end):
+    return sorted(key for key, (s, e) in intervals.items() if overlaps(s, e, start, end))
+
+@pytest.mark.parametrize('seed', range(5))
+def test_search_matches_a_linear_scan(seed):
+    rng = random.Random(seed)
+    index = IntervalIndex(min_rebuild=16)
+    intervals = {}
+    for step in range(3000):
+        key = f"event-{rng.randrange(800)}"
+        if rng.random() < 0.2:
+            index.discard(key)
+            intervals.pop(key, None)
+        else:
+            intervals[key] = random_interval(rng)
+            index.add(key, *intervals[key], key)
+        if step % 50 == 0:
+            start = ORIGIN + timedelta(days=rng.randrange(365))
+            end = start + timedelta(days=rng.choice([1, 7, 31]))
+            found = index.search(start, end)
+            assert sorted(found) == scan(intervals, start, end)
+            starts = [intervals[key][0] for key in found]
+            assert starts == sorted(starts)
+    assert len(index) == len(intervals)
+
+def test_zero_length_interval_at_window_start():
+    index = IntervalIndex(min_rebuild=0)
+    index.add('point', ORIGIN, ORIGIN, 'point')
+    index.add('before', ORIGIN - timedelta(hours=1), ORIGIN, 'before')
+    assert index.search(ORIGIN, ORIGIN + timedelta(hours=1)) == ['point']
+    assert index.search(ORIGIN - timedelta(hours=1), ORIGIN) == ['before']
+
+def test_clear_empties_the_index():
+    index = IntervalIndex()
+    index.add('a', ORIGIN, ORIGIN + timedelta(hours=1), 'a')
+    index.clear()
+    assert len(index) == 0
+    assert index.search(ORIGIN, ORIGIN + timedelta(days=1)) == []
+
+def test_to_utc_accepts_event_json_and_icalendar_values():
+    berlin = pytz.timezone('Europe/Berlin')
+    assert to_utc('2024-03-01') == ORIGIN + timedelta(days=60)
+    assert to_utc(date(2024, 3, 1)) == ORIGIN + timedelta(days=60)
+    assert to_utc('2024-01-01T10:00:00+01:00') == ORIGIN + timedelta(hours=9)
+    assert to_utc(berlin.localize(datetime(2024, 1, 1, 10))) == ORIGIN + timedelta(hours=9)
@@ -0,0 +1,49 @@
+"""Bounded upload loop shared by the calendar and contact imports"""
+import threading
+import time
+
+import pytest
+from app.config.config import Config
+from app.services.jobs import Job, run_bounded
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'DATA_PATH', str(tmp_path))
+    return Job('test-import', 'owner')
+
+def test_reading_stays_bounded_ahead_of_uploads(job):
+    lock = threading.Lock()
+    state = {'read': 0, 'done': 0, 'running': 0, 'max_running': 0, 'max_ahead': 0}
+
+    def items():
+        for item in range(40):
+            with lock:
+                state['read'] += 1
+                state['max_ahead'] = max(state['max_ahead'], state['read'] - state['done'])
+            yield item
+
+    def upload(item):
+        with lock:
+            state['running'] += 1
+            state['max_running'] = max(state['max_running'], state['running'])
+        time.sleep(0.002)
+        with lock:
+            state['running'] -= 1
+            state['done'] += 1
+        job.record(succeeded=1)
+
+    run_bounded(job, items(), upload, workers=2)
+    assert job.succeeded == 40
+    assert state['max_running'] <= 2
+    # Twice the workers waiting, plus the item just read
+    assert state['max_ahead'] <= 2 * 2 + 1
+
+def test_escaping_errors_count_as_failures(job):
+    def upload(item):
+        if item % 2:
+            raise RuntimeError(f'boom {item}')
+        job.record(succeeded=1)
+
+    run_bounded(job, range(6), upload, workers=3)
+    assert (job.succeeded, job.failed) == (3, 3)
+    assert all(error['error'].startswith('boom') for error in job.errors)
@@ -0,0 +1,133 @@
+"""
+Local recurrence expansion against server-side expansion.
+
+Every case has the answer Radicale's CalDAV expand gave for it recorded under
+tests/fixtures/recurrence/, so the comparison runs offline. Set BAIKAL_TEST_CALENDAR
+(a scratch calendar URL) together with BAIKAL_TEST_USERNAME and BAIKAL_TEST_PASSWORD
+to also compare against a live server, and BAIKAL_TEST_RECORD=1 to record its answers:
+    BAIKAL_TEST_CALENDAR=http://localhost/dav.php/calendars/test/scratch/ python -m pytest tests/test_recurrence.py
+"""
+import os
+from datetime import datetime
+from pathlib import Path
+
+import caldav
+import icalendar
+import pytest
+import pytz
+from app.services.recurrence import expand
+from conftest import BERLIN, calendar_object
+
+RECORDED = Path(__file__).parent / 'fixtures' / 'recurrence'
+
+def case(uid, window, expected, *vevents, timezone=()):
+    return pytest.param(calendar_object(uid, *vevents, timezone=timezone), window, expected, id=uid)
+
+def timed(*pairs):
+    return [(f'{start}:00+00:00', f'{end}:00+00:00') for start, end in pairs]
+
+CASES = [
+    # 09:00 Berlin is 08:00Z until the switch to summer time on 31 March, 07:00Z after it
+    case('weekly-berlin-dst', ('20240301T000000Z', '20240501T000000Z'),
+         timed(('2024-03-10T08:00', '2024-03-10T09:00'), ('2024-03-17T08:00', '2024-03-17T09:00'),
+               ('2024-03-24T08:00', '2024-03-24T09:00'), ('2024-03-31T07:00', '2024-03-31T08:00'),
+               ('2024-04-07T07:00', '2024-04-07T08:00'), ('2024-04-14T07:00', '2024-04-14T08:00')),
+         ['DTSTART;TZID=Europe/Berlin:20240310T090000', 'DTEND;TZID=Europe/Berlin:20240310T100000',
+          'RRULE:FREQ=WEEKLY;COUNT=6', 'SUMMARY:Weekly'], timezone=BERLIN),
+    # UNTIL is the last instance in UTC, after the switch back to winter time
+    case('weekly-berlin-until', ('20241001T000000Z', '20241201T000000Z'),
+         timed(('2024-10-13T07:00', '2024-10-13T08:00'), ('2024-10-20T07:00', '2024-10-20T08:00'),
+               ('2024-10-27T08:00', '2024-10-27T09:00'), ('2024-11-03T08:00', '2024-11-03T09:00')),
+         ['DTSTART;TZID=Europe/Berlin:20241013T090000', 'DTEND;TZID=Europe/Berlin:20241013T100000',
+          'RRULE:FREQ=WEEKLY;UNTIL=20241103T080000Z', 'SUMMARY:Weekly until'], timezone=BERLIN),
+    # Months without a 31st are skipped and do not count
+    case('allday-monthly-count', ('20240101T000000Z', '20241231T000000Z'),
+         [('2024-01-31', '2024-02-01'), ('2024-03-31', '2024-04-01'),
+          ('2024-05-31', '2024-06-01'), ('2024-07-31', '2024-08-01')],
+         ['DTSTART;VALUE=DATE:20240131', 'DTEND;VALUE=DATE:20240201', 'RRULE:FREQ=MONTHLY;COUNT=4',
+          'SUMMARY:Month end']),
+    case('allday-monthly-until', ('20240101T000000Z', '20241231T000000Z'),
+         [('2024-01-01', '2024-01-02'), ('2024-02-01', '2024-02-02'),
+          ('2024-03-01', '2024-03-02'), ('2024-04-01', '2024-04-02')],
+         ['DTSTART;VALUE=DATE:20240101', 'DTEND;VALUE=DATE:20240102', 'RRULE:FREQ=MONTHLY;UNTIL=20240401',
+          'SUMMARY:First of the month']),
+    # The instance starting before the window still overlaps it
+    case('utc-duration', ('20240107T000000Z', '20240109T000000Z'),
+         timed(('2024-01-06T23:00', '2024-01-07T01:00'), ('2024-01-07T23:00', '2024-01-08T01:00'),
+               ('2024-01-08T23:00', '2024-01-09T01:00')),
+         ['DTSTART:20240105T230000Z', 'DURATION:PT2H', 'RRULE:FREQ=DAILY;COUNT=5', 'SUMMARY:Night shift']),
+    case('exdate', ('20240101T000000Z', '20240301T000000Z'),
+         timed(('2024-01-01T12:00', '2024-01-01T13:00'), ('2024-01-15T12:00', '2024-01-15T13:00'),
+               ('2024-01-29T12:00', '2024-01-29T13:00')),
+         ['DTSTART:20240101T120000Z', 'DTEND:20240101T130000Z', 'RRULE:FREQ=WEEKLY;COUNT=5',
+          'EXDATE:20240108T120000Z,20240122T120000Z', 'SUMMARY:Lunch']),
+    case('moved-override', ('20240101T000000Z', '20240110T000000Z'),
+         timed(('2024-01-01T09:00', '2024-01-01T10:00'), ('2024-01-02T15:00', '2024-01-02T16:00'),
+               ('2024-01-03T09:00', '2024-01-03T10:00'), ('2024-01-04T09:00', '2024-01-04T10:00')),
+         ['DTSTART:20240101T090000Z', 'DTEND:20240101T100000Z', 'RRULE:FREQ=DAILY;COUNT=4', 'SUMMARY:Standup'],
+         ['RECURRENCE-ID:20240102T090000Z', 'DTSTART:20240102T150000Z', 'DTEND:20240102T160000Z',
+          'SUMMARY:Standup moved']),
+    # The server returns the cancelled instance with STATUS:CANCELLED; it is not shown, so not expanded
+    case('cancelled-override', ('20240101T000000Z', '20240110T000000Z'),
+         timed(('2024-01-01T09:00', '2024-01-01T10:00'), ('2024-01-02T09:00', '2024-01-02T10:00'),
+               ('2024-01-04T09:00', '2024-01-04T10:00')),
+         ['DTSTART:20240101T090000Z', 'DTEND:20240101T100000Z', 'RRULE:FREQ=DAILY;COUNT=4', 'SUMMARY:Standup'],
+         ['RECURRENCE-ID:20240103T090000Z', 'DTSTART:20240103T090000Z', 'DTEND:20240103T100000Z',
+          'STATUS:CANCELLED', 'SUMMARY:Standup']),
+]
+
+def utc(value: str) -> datetime:
+    return pytz.UTC.localize(datetime.strptime(value, '%Y%m%dT%H%M%SZ'))
+
+def normalise(start, end):
+    if isinstance(start, datetime):
+        return start.astimezone(pytz.UTC).isoformat(), end.astimezone(pytz.UTC).isoformat()
+    return start.isoformat(), end.isoformat()
+
+def local_instances(data, window):
+    return sorted(normalise(occurrence.start, occurrence.end) for occurrence in expand(data, *map(utc, window)))
+
+def server_instances(uid: str, objects) -> list:
+    """Instances of uid in an expanded calendar-query answer, leaving out cancelled ones"""
+    instances = []
+    for data in objects:
+        for vevent in icalendar.Calendar.from_ical(data).walk('VEVENT'):
+            if str(vevent['uid']) != uid or str(vevent.get('status', '')).upper() == 'CANCELLED':
+                continue
+            start = vevent['dtstart'].dt
+            end = vevent['dtend'].dt if 'dtend' in vevent else start + vevent['duration'].dt
+            instances.append(normalise(start, end))
+    return sorted(instances)
+
+def recorded(uid: str) -> list:
+    """The calendar objects the server answered with, stored one after another"""
+    data = (RECORDED / f'{uid}.ics').read_bytes()
+    return [calendar.to_ical() for calendar in icalendar.Calendar.from_ical(data, multiple=True)]
+
+def uid_of(data: str) -> str:
+    return str(icalendar.Calendar.from_ical(data).walk('VEVENT')[0]['uid'])
+
+@pytest.mark.parametrize('data, window, expected', CASES)
+def test_matches_recorded_server_expansion(data, window, expected):
+    assert local_instances(data, window) == server_instances(uid_of(data), recorded(uid_of(data))) == expected
+
+LIVE_CALENDAR = os.getenv('BAIKAL_TEST_CALENDAR')
+
+@pytest.mark.skipif(not LIVE_CALENDAR, reason='BAIKAL_TEST_CALENDAR is not set')
+@pytest.mark.parametrize('data, window, expected', CASES)
+def test_matches_live_server_expansion(data, window, expected):
+    uid = uid_of(data)
+    client = caldav.DAVClient(url=LIVE_CALENDAR, username=os.getenv('BAIKAL_TEST_USERNAME'),
+                              password=os.getenv('BAIKAL_TEST_PASSWORD'))
+    calendar = client.calendar(url=LIVE_CALENDAR)
+    event = calendar.save_event(data)
+    try:
+        objects = [instance.data for instance in
+                   calendar.date_search(start=utc(window[0]), end=utc(window[1]), expand=True)]
+        if os.getenv('BAIKAL_TEST_RECORD'):
+            RECORDED.mkdir(parents=True, exist_ok=True)
+            (RECORDED / f'{uid}.ics').write_text(''.join(data for data in objects if f'UID:{uid}' in data),
+                                                 encoding='utf-8', newline='')
+        assert local_instances(data, window) == server_instances(uid, objects)
+    finally:
+        event.delete()
@@ -0,0 +1,103 @@
+"""Upstream retries: which requests are replayed, and the time budget they share"""
+import threading
+
+import pytest
+from requests.exceptions import ConnectTimeout, ReadTimeout
+from requests.structures import CaseInsensitiveDict
+from app.services import resilience
+from app.services.resilience import (
+    CircuitBreaker, DeadlineExceededError, bind_deadline, call_with_retry, is_idempotent, set_request_deadline
+)
+
+class Response:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+    def close(self):
+        pass
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake monotonic clock; sleeping advances it instead of blocking"""
+    clock = {'now': 1000.0, 'slept': []}
+    monkeypatch.setattr(resilience.time, 'monotonic', lambda: clock['now'])
+    def sleep(seconds):
+        clock['slept'].append(seconds)
+        clock['now'] += seconds
+    monkeypatch.setattr(resilience.time, 'sleep', sleep)
+    monkeypatch.setattr(resilience, 'backoff_delay', lambda attempt: 1.0)
+    yield clock
+    set_request_deadline(None)
+
+def failing(*errors, then=200, clock=None):
+    """send() that raises the given errors in turn, then answers with status then; failures take a second"""
+    calls = []
+    def send(remaining):
+        calls.append(remaining)
+        if len(calls) <= len(errors):
+            if clock is not None:
+                clock['now'] += 1
+            raise errors[len(calls) - 1]
+        return Response(then)
+    return send, calls
+
+def breaker():
+    return CircuitBreaker('http://baikal.test', failure_threshold=100)
+
+@pytest.mark.parametrize('headers', [{'If-None-Match': '*'}, {'if-match': '"1"'}])
+def test_conditional_write_is_not_replayed_once_sent(clock, headers):
+    send, calls = failing(ReadTimeout('read timed out'))
+    with pytest.raises(ReadTimeout):
+        call_with_retry(breaker(), 'PUT', send, retries=2, deadline=60,
+                        idempotent=is_idempotent('PUT', CaseInsensitiveDict(headers)))
+    assert len(calls) == 1
+
+def test_conditional_write_is_not_replayed_after_a_gateway_error(clock):
+    send, calls = failing(then=504)
+    response = call_with_retry(breaker(), 'PUT', send, retries=2, deadline=60,
+                               idempotent=is_idempotent('PUT', {'If-None-Match': '*'}))
+    assert response.status_code == 504
+    assert len(calls) == 1
+
+def test_conditional_write_is_retried_when_it_never_connected(clock):
+    send, calls = failing(ConnectTimeout('connect timed out'))
+    response = call_with_retry(breaker(), 'PUT', send, retries=2, deadline=60,
+                               idempotent=is_idempotent('PUT', {'If-None-Match': '*'}))
+    assert response.status_code == 200
+    assert len(calls) == 2
+
+def test_plain_reads_and_writes_are_retried(clock):
+    for method in ('PROPFIND', 'PUT'):
+        send, calls = failing(ReadTimeout('read timed out'))
+        assert call_with_retry(breaker(), method, send, retries=2, deadline=60).status_code == 200
+        assert len(calls) == 2
+    assert is_idempotent('GET', {'If-None-Match': '"1"'})
+    assert not is_idempotent('POST')
+
+def test_calls_share_the_request_deadline(clock):
+    set_request_deadline(5)
+    send, calls = failing(ReadTimeout('slow'), ReadTimeout('slow'), clock=clock)
+    clock['now'] += 2
+    # The call alone would allow 60s, the request only has 3s left: one retry fits, a second does not
+    with pytest.raises(ReadTimeout):
+        call_with_retry(breaker(), 'GET', send, retries=5, deadline=60)
+    assert calls == [3.0, 1.0]
+    assert clock['slept'] == [1.0]
+    # The budget is spent, later calls of the same request fail without reaching the server
+    send, calls = failing()
+    with pytest.raises(DeadlineExceededError):
+        call_with_retry(breaker(), 'GET', send, retries=5, deadline=60)
+    assert calls == []
+
+def test_deadline_follows_work_handed_to_a_thread(clock):
+    set_request_deadline(5)
+    seen = []
+    def work():
+        seen.append(resilience._request_deadline.get())
+    thread = threading.Thread(target=bind_deadline(work))
+    thread.start()
+    thread.join()
+    unbound = threading.Thread(target=work)
+    unbound.start()
+    unbound.join()
+    assert seen == [1005.0, None]
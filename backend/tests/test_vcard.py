@@ -0,0 +1,35 @@
+"""In-place contact edits: only edited properties change"""
+import vobject
+from app.services.vcard import VCardService
+
+CARD = '\r\n'.join([
+    'BEGIN:VCARD', 'VERSION:3.0', 'UID:two-mails', 'FN:Ada Lovelace', 'N:Lovelace;Ada;;;',
+    'EMAIL;TYPE=WORK:ada@work.example', 'EMAIL;TYPE=HOME:ada@home.example',
+    'TEL:111', 'TEL:222', 'NOTE:first', 'NOTE:second', 'X-CUSTOM:kept', 'END:VCARD', ''
+])
+
+def edit(**changes):
+    vcard = vobject.readOne(CARD)
+    service = VCardService()
+    changed = service.apply_json(vcard, dict(service.to_json(vcard), **changes))
+    return changed, vobject.readOne(vcard.serialize())
+
+def values(vcard, name):
+    return [prop.value for prop in vcard.contents.get(name, [])]
+
+def test_clearing_removes_every_value():
+    changed, vcard = edit(email='', phone='', notes='')
+    assert changed
+    assert values(vcard, 'email') == [] and values(vcard, 'tel') == [] and values(vcard, 'note') == []
+    assert VCardService().to_json(vcard)['email'] == ''
+    assert values(vcard, 'x-custom') == ['kept']
+
+def test_editing_changes_the_shown_value_and_keeps_the_others():
+    changed, vcard = edit(email='ada@new.example')
+    assert changed
+    assert values(vcard, 'email') == ['ada@new.example', 'ada@home.example']
+    assert values(vcard, 'tel') == ['111', '222']
+
+def test_unchanged_data_is_not_written():
+    changed, _ = edit()
+    assert not changed
@@ -1,6 +1,7 @@
 import { defineStore } from 'pinia'
 import { ref, computed } from 'vue'
 import axios from 'axios'
+import { clearConditionalCache } from '@/utils/conditionalGet'
 
 export const useAuthStore = defineStore('auth', {
   state: () => ({
@@ -73,6 +74,7 @@ export const useAuthStore = defineStore('auth', {
         this.settings = null
         this.serverSettings = null
         localStorage.removeItem('serverSettings')
+        clearConditionalCache()
         this.stopActivityMonitor()
       }
     },
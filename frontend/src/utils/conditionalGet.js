@@ -0,0 +1,39 @@
+import axios from 'axios'
+
+// Last response body and ETag per request, so unchanged lists are not downloaded again
+const validated = new Map()
+const MAX_ENTRIES = 50
+
+const cacheKey = (url, params) => `${url}?${new URLSearchParams(params || {}).toString()}`
+
+/**
+ * GET that sends If-None-Match with the ETag of the previous answer and reuses
+ * its body when the server replies 304 Not Modified.
+ */
+export async function conditionalGet(url, config = {}) {
+  const key = cacheKey(url, config.params)
+  const cached = validated.get(key)
+  const response = await axios.get(url, {
+    ...config,
+    headers: { ...(config.headers || {}), ...(cached ? { 'If-None-Match': cached.etag } : {}) },
+    validateStatus: status => (status >= 200 && status < 300) || status === 304
+  })
+
+  if (response.status === 304 && cached) {
+    return { ...response, status: 200, data: cached.data }
+  }
+
+  validated.delete(key)
+  const etag = response.headers?.etag
+  if (etag) {
+    validated.set(key, { etag, data: response.data })
+    if (validated.size > MAX_ENTRIES) {
+      validated.delete(validated.keys().next().value)
+    }
+  }
+  return response
+}
+
+export function clearConditionalCache() {
+  validated.clear()
+}